@@ -0,0 +1,363 @@
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Lowest to highest; an equipment unit is reported at its most severe open rule
+SEVERITIES = ("info", "warning", "critical")
+
+# (ts epoch ms, equipment_id, rule, severity, "open" | "closed", value)
+Transition = Tuple[int, str, str, str, str, float]
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    """
+    One threshold on one field, e.g. ``failure_probability > 0.4``.
+
+    The rule opens after ``raise_after`` consecutive readings beyond
+    ``threshold`` and closes after ``clear_after`` consecutive readings back
+    past ``clear`` (defaults to ``threshold``). A ``clear`` level on the safe
+    side of the threshold is the hysteresis band that keeps a reading
+    hovering at the limit from flapping the alert.
+    """
+
+    name: str
+    field: str
+    op: str
+    threshold: float
+    severity: str = "warning"
+    message: str = ""
+    clear: float | None = None
+    raise_after: int = 1
+    clear_after: int = 1
+
+    def __post_init__(self) -> None:
+        if self.op not in (">", "<"):
+            raise ValueError(f"{self.name}: op must be '>' or '<', got {self.op!r}")
+        if self.severity not in SEVERITIES:
+            raise ValueError(f"{self.name}: severity must be one of {SEVERITIES}")
+        if self.raise_after < 1 or self.clear_after < 1:
+            raise ValueError(f"{self.name}: raise_after and clear_after must be at least 1")
+        clear = self.threshold if self.clear is None else self.clear
+        if (clear > self.threshold) if self.op == ">" else (clear < self.threshold):
+            raise ValueError(f"{self.name}: clear level must be on the safe side of the threshold")
+
+
+# The thresholds /api/alerts used before rules were configurable, with a
+# hysteresis band and three calm readings before an alert closes
+DEFAULT_RULES: Tuple[AlertRule, ...] = (
+    AlertRule("failure_risk_critical", "failure_probability", ">", 0.6, "critical",
+              "Failure probability critical", clear=0.55, clear_after=3),
+    AlertRule("low_health_critical", "health_score", "<", 40.0, "critical",
+              "Health score critical", clear=45.0, clear_after=3),
+    AlertRule("failure_risk", "failure_probability", ">", 0.4, "warning",
+              "High failure probability detected", clear=0.35, clear_after=3),
+    AlertRule("low_health", "health_score", "<", 60.0, "warning",
+              "Low health score", clear=65.0, clear_after=3),
+)
+
+
+def parse_rules(text: str) -> Tuple[AlertRule, ...]:
+    """Rules from a JSON list of objects with AlertRule's fields."""
+    items = json.loads(text)
+    if isinstance(items, dict):
+        items = items.get("rules", [])
+    rules = tuple(AlertRule(**item) for item in items)
+    names = [r.name for r in rules]
+    if len(set(names)) != len(names):
+        raise ValueError("Alert rule names must be unique")
+    return rules
+
+
+def _epoch_ms(timestamps: Any, n: int) -> np.ndarray:
+    ts = np.asarray(timestamps)
+    if ts.dtype.kind in "iu":
+        ts = ts.astype(np.int64)
+    else:
+        ts = ts.astype("datetime64[ms]").astype(np.int64)
+    return np.broadcast_to(ts, (n,))
+
+
+class AlertEngine:
+    """
+    Evaluates every rule for a whole fleet tick in one vectorized pass.
+
+    Each equipment unit owns a slot in parallel NumPy arrays holding, per
+    rule, whether the alert is open, the run of consecutive readings
+    towards the next state change and when it opened. ``evaluate`` turns
+    the readings into one (units, rules) comparison, so its cost is a few
+    array operations whatever the fleet size, and only units whose state
+    changes produce Python objects (the returned transitions). Readings at
+    or before a unit's last evaluated timestamp are ignored, so scoring the
+    same tick for several requests raises nothing twice; NaN readings
+    leave a rule's state and run untouched.
+
+    ``open_alerts`` reports each unit once, at its most severe open rule.
+    """
+
+    def __init__(self, rules: Sequence[AlertRule] = DEFAULT_RULES, capacity: int = 1024) -> None:
+        if not rules:
+            raise ValueError("At least one alert rule is required")
+        self.rules = tuple(rules)
+        self.fields = sorted({r.field for r in self.rules})
+        self._field_of_rule = np.array([self.fields.index(r.field) for r in self.rules])
+        # Compare sign * value against sign * level so ">" and "<" share one test
+        self._sign = np.array([1.0 if r.op == ">" else -1.0 for r in self.rules])
+        self._raise_level = self._sign * [r.threshold for r in self.rules]
+        self._clear_level = self._sign * [r.threshold if r.clear is None else r.clear for r in self.rules]
+        self._raise_after = np.array([r.raise_after for r in self.rules], dtype=np.int32)
+        self._clear_after = np.array([r.clear_after for r in self.rules], dtype=np.int32)
+        self._rank = np.array([SEVERITIES.index(r.severity) for r in self.rules])
+
+        self._lock = threading.Lock()
+        self._index: Dict[Any, int] = {}
+        self._units: List[Any] = []
+        self._cached_ids: Any = None
+        self._cached_slots: Tuple[np.ndarray, bool] | None = None
+        n_rules = len(self.rules)
+        self.open = np.zeros((capacity, n_rules), dtype=bool)
+        self.run = np.zeros((capacity, n_rules), dtype=np.int32)
+        # What the next state change needs, per cell: the signed level a
+        # reading must exceed (the threshold while closed, the clear level
+        # while open) and how many readings in a row
+        self.level = np.tile(self._raise_level, (capacity, 1))
+        self.need = np.tile(self._raise_after, (capacity, 1))
+        self.opened_ts = np.zeros((capacity, n_rules), dtype=np.int64)
+        self.last_ts = np.full(capacity, np.iinfo(np.int64).min, dtype=np.int64)
+        self.last_values = np.full((capacity, len(self.fields)), np.nan)
+
+        self.evaluations = 0
+        self.rows_evaluated = 0
+        self.rows_stale = 0
+        self.opened = 0
+        self.closed = 0
+
+    def __len__(self) -> int:
+        return len(self._units)
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.last_ts)
+        while capacity < needed:
+            capacity *= 2
+        fills = {
+            "last_ts": np.iinfo(np.int64).min,
+            "last_values": np.nan,
+            "level": self._raise_level,
+            "need": self._raise_after,
+        }
+        for name in ("open", "run", "level", "need", "opened_ts", "last_ts", "last_values"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:] = fills.get(name, 0)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def _slots(self, equipment_ids: Iterable) -> Tuple[np.ndarray, bool]:
+        # (slot per row, whether every unit appears once). The app passes the
+        # simulator's fixed id list every tick, so its lookup is reused
+        cached = self._cached_slots
+        if equipment_ids is self._cached_ids and cached is not None and len(cached[0]) == len(equipment_ids):
+            return cached
+        codes, uniques = pd.factorize(np.asarray(equipment_ids, dtype=object))
+        slots = np.empty(len(uniques), dtype=np.int64)
+        for k, unit in enumerate(uniques):
+            slot = self._index.get(unit)
+            if slot is None:
+                slot = self._index[unit] = len(self._units)
+                self._units.append(unit)
+            slots[k] = slot
+        if len(self._units) > len(self.last_ts):
+            self._grow(len(self._units))
+        out = (slots[codes], len(uniques) == len(codes))
+        if isinstance(equipment_ids, (list, tuple)):
+            self._cached_ids, self._cached_slots = equipment_ids, out
+        return out
+
+    def evaluate(self, equipment_ids: Iterable, values: Dict[str, Any], timestamps: Any) -> List[Transition]:
+        """
+        Apply one reading per row and return the alerts that opened or closed.
+
+        ``values`` maps each rule field to an array aligned with
+        ``equipment_ids`` (a DataFrame works too); ``timestamps`` is one
+        timestamp for the whole batch or one per row, as epoch ms or
+        anything NumPy reads as datetime64. Rows of one unit must be in
+        time order.
+        """
+        x = np.column_stack([np.asarray(values[f], dtype=np.float64) for f in self.fields])
+        with self._lock:
+            slots, distinct = self._slots(equipment_ids)
+            ts = _epoch_ms(timestamps, len(slots))
+            self.evaluations += 1
+            if not distinct:
+                # Repeated units are applied in time order, one reading per unit each pass
+                transitions: List[Transition] = []
+                order = np.lexsort((ts, slots))
+                sorted_slots = slots[order]
+                starts = np.flatnonzero(np.r_[True, sorted_slots[1:] != sorted_slots[:-1]])
+                rank = np.empty(len(slots), dtype=np.int64)
+                rank[order] = np.arange(len(slots)) - np.repeat(starts, np.diff(np.r_[starts, len(slots)]))
+                for r in range(int(rank.max()) + 1):
+                    rows = np.flatnonzero(rank == r)
+                    transitions += self._apply(slots[rows], x[rows], ts[rows])
+                return transitions
+            return self._apply(slots, x, ts)
+
+    def _apply(self, slots: np.ndarray, x: np.ndarray, ts: np.ndarray) -> List[Transition]:
+        # Called with the lock held; every slot appears at most once
+        fresh = ts > self.last_ts[slots]
+        self.rows_stale += int(len(slots) - fresh.sum())
+        if not fresh.all():
+            slots, x, ts = slots[fresh], x[fresh], ts[fresh]
+        self.rows_evaluated += len(slots)
+        if not len(slots):
+            return []
+        # A whole tick of the fixed id list maps to consecutive slots; slicing
+        # the state arrays avoids a gather and scatter per array
+        at: Any = slots
+        if slots[-1] - slots[0] == len(slots) - 1 and (len(slots) < 2 or (np.diff(slots) == 1).all()):
+            at = slice(int(slots[0]), int(slots[-1]) + 1)
+        self.last_ts[at] = ts
+        self.last_values[at] = x
+
+        v = x[:, self._field_of_rule] * self._sign  # (rows, rules)
+        is_open = self.open[at]
+        # A closed rule moves towards opening on a reading beyond its level,
+        # an open one towards closing on a reading that is not; a reading
+        # that does neither restarts the run and NaN leaves it as it was
+        towards = (v > self.level[at]) ^ is_open
+        nan = np.isnan(v)
+        if nan.any():
+            towards &= ~nan
+            run = np.where(towards, self.run[at] + 1, self.run[at] * nan)
+        else:
+            run = (self.run[at] + 1) * towards
+        flip = run >= self.need[at]
+        if not flip.any():
+            self.run[at] = run
+            return []
+        cells = np.flatnonzero(flip)
+        rows, rules = np.divmod(cells, len(self.rules))
+        run.flat[cells] = 0
+        self.run[at] = run
+        opening = ~is_open.flat[cells]
+        units = slots[rows]
+        self.open[units, rules] = opening
+        self.level[units, rules] = np.where(opening, self._clear_level[rules], self._raise_level[rules])
+        self.need[units, rules] = np.where(opening, self._clear_after[rules], self._raise_after[rules])
+        self.opened_ts[units[opening], rules[opening]] = ts[rows[opening]]
+        self.opened += int(opening.sum())
+        self.closed += int(len(rows) - opening.sum())
+
+        values = (v[rows, rules] * self._sign[rules]).tolist()
+        return [
+            (
+                int(ts[row]),
+                self._units[slots[row]],
+                self.rules[rule].name,
+                self.rules[rule].severity,
+                "open" if is_opening else "closed",
+                value,
+            )
+            for row, rule, is_opening, value in zip(rows.tolist(), rules.tolist(), opening.tolist(), values)
+        ]
+
+    def restore(self, transitions: Iterable[Tuple[Any, ...]]) -> int:
+        """
+        Reopen alerts from persisted (ts, equipment_id, rule, ...) rows, e.g.
+        ``database.get_open_alert_transitions()`` after a restart, so an alert
+        that was still open is not raised a second time. Returns rules reopened.
+        """
+        by_name = {r.name: k for k, r in enumerate(self.rules)}
+        rows = [(t[0], t[1], by_name[t[2]]) for t in transitions if t[2] in by_name]
+        if not rows:
+            return 0
+        with self._lock:
+            slots, _ = self._slots([unit for _, unit, _ in rows])
+            rules = np.array([rule for _, _, rule in rows])
+            self.open[slots, rules] = True
+            self.run[slots, rules] = 0
+            self.level[slots, rules] = self._clear_level[rules]
+            self.need[slots, rules] = self._clear_after[rules]
+            self.opened_ts[slots, rules] = [int(ts) for ts, _, _ in rows]
+        return len(rows)
+
+    def open_alerts(self) -> List[Dict[str, Any]]:
+        """One alert per unit with an open rule, at its most severe rule, in first-seen unit order."""
+        with self._lock:
+            n = len(self._units)
+            is_open = self.open[:n]
+            units = np.flatnonzero(is_open.any(axis=1))
+            if not len(units):
+                return []
+            is_open = is_open[units]
+            # Highest severity wins; ties go to the rule listed first
+            top = np.argmax(np.where(is_open, self._rank, -1), axis=1)
+            since = np.where(is_open, self.opened_ts[units], np.iinfo(np.int64).max).min(axis=1)
+            last_ts = self.last_ts[units]
+            values = self.last_values[units]
+            unit_ids = [self._units[u] for u in units.tolist()]
+        seen = last_ts > np.iinfo(np.int64).min
+        stamps = np.datetime_as_string(np.where(seen, last_ts, since).astype("datetime64[ms]"), unit="ms").tolist()
+        since_stamps = np.datetime_as_string(since.astype("datetime64[ms]"), unit="ms").tolist()
+        rows = values.round(6).tolist()
+        for k in np.flatnonzero(np.isnan(values).any(axis=1)).tolist():
+            rows[k] = [None if v != v else v for v in rows[k]]
+        # Units sharing a set of open rules share its name list
+        patterns = (is_open @ (1 << np.arange(len(self.rules)))).tolist()
+        names = {p: [r.name for i, r in enumerate(self.rules) if p >> i & 1] for p in set(patterns)}
+        out = []
+        for unit, rule, pattern, row, stamp, opened in zip(
+            unit_ids, top.tolist(), patterns, rows, stamps, since_stamps
+        ):
+            rule = self.rules[rule]
+            alert = {
+                "equipment_id": unit,
+                "severity": rule.severity,
+                "message": rule.message or rule.name,
+                "rules": list(names[pattern]),
+            }
+            alert.update(zip(self.fields, row))
+            alert["timestamp"] = stamp
+            alert["since"] = opened
+            out.append(alert)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n = len(self._units)
+            open_rules = self.open[:n].sum(axis=0)
+            return {
+                "units": n,
+                "rules": len(self.rules),
+                "open_units": int(self.open[:n].any(axis=1).sum()),
+                "open": {r.name: int(c) for r, c in zip(self.rules, open_rules)},
+                "evaluations": self.evaluations,
+                "rows_evaluated": self.rows_evaluated,
+                "rows_stale": self.rows_stale,
+                "opened": self.opened,
+                "closed": self.closed,
+            }
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """The active rules as JSON-ready dicts (the ALERT_RULES format)."""
+        return [asdict(r) for r in self.rules]
+
+
+def create_engine_from_env() -> AlertEngine:
+    """
+    Build the alert engine from ALERT_RULES: a path to a JSON file or the
+    JSON itself, a list of AlertRule fields per rule. Unset keeps DEFAULT_RULES.
+    """
+    text = os.environ.get("ALERT_RULES", "").strip()
+    if not text:
+        return AlertEngine(DEFAULT_RULES)
+    if not text.startswith(("[", "{")):
+        with open(text, encoding="utf-8") as fh:
+            text = fh.read()
+    return AlertEngine(parse_rules(text))
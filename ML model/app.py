@@ -1,33 +1,75 @@
 from flask import Flask, jsonify, render_template, request
 from typing import List, Dict, Any
 from datetime import datetime 
+import itertools
+from collections import deque
 import os
+import threading
 import numpy as np
 
-from predictive_model import (
-    load_trained_model,
-    train_model,
-    generate_data,
-    predict_failure,
+from predictive_model import FEATURE_COLUMNS, predict_failure, predict_failure_arrays
+from database import (
+    EXPORT_FORMATS,
+    HISTORICAL_METHODS,
+    ROLLUP_RESOLUTIONS,
+    init_db,
+    insert_reading,
+    insert_predictions,
+    get_historical,
+    get_historical_columns,
+    export_csv_chunks,
+    export_columnar_chunks,
+    get_fleet_kpis,
+    get_rollups,
+    get_data_version,
+    get_manager,
+    configure_segments,
+    get_alert_transitions,
+    get_open_alert_transitions,
+    insert_alert_transitions,
 )
-from database import init_db, insert_reading, insert_predictions, get_historical, cleanup_old, export_csv
+from alerts import create_engine_from_env
+from encoding import RESPONSE_LAYOUTS, FastJSONProvider, create_compressor_from_env, encode_columns, negotiate
+from features import RollingFeatures
+from inference import create_executor_from_env
+from ingest import create_writer_from_env
+from live import TooManySubscribers, create_feed_from_env
+from metrics import REGISTRY, create_profiler_from_env, instrument_app, stage
+from model_loader import create_loader_from_env
+from prediction_cache import create_cache_from_env
+from response_cache import create_response_cache_from_env
+from retention import create_job_from_env
+from segments import create_store_from_env
+from simulator import chunk_frame, create_simulator_from_env
+from state import create_state_from_env
 from flask import Response
 
 
+HISTORICAL_MAX_POINTS = int(os.environ.get("HISTORICAL_MAX_POINTS", "2000"))
+# How long a model-backed request waits for a model that is still loading
+MODEL_WAIT_SECONDS = float(os.environ.get("MODEL_WAIT_SECONDS", "5"))
+PREDICTION_KEYS = [
+    "equipment_id",
+    "timestamp",
+    "temperature",
+    "vibration",
+    "pressure",
+    "current",
+    "failure_probability",
+    "health_score",
+]
+
+
 def create_app() -> Flask:
     app = Flask(__name__)
+    # jsonify through orjson when it is installed
+    app.json = FastJSONProvider(app)
 
-    # Load or create the ML model at startup
-    model_path = os.path.join("data", "model.pkl")
-    try:
-        if not os.path.exists(model_path):
-            train_model(save_path=model_path)
-        trained_model = load_trained_model(model_path)
-        app.config["TRAINED_MODEL"] = trained_model
-    except Exception as exc:
-        # Fallback: create a dummy model in memory so routes still respond
-        trained_model = train_model()
-        app.config["TRAINED_MODEL"] = trained_model
+    # Load or create the ML model off the request path; routes that need it
+    # answer 503 until it is ready (MODEL_LOAD=eager restores blocking startup)
+    model_loader = create_loader_from_env(os.path.join("data", "model.pkl"))
+    app.config["MODEL_LOADER"] = model_loader
+    model_loader.start()
 
     # Initialize database
     try:
@@ -35,6 +77,306 @@ def create_app() -> Flask:
     except Exception:
         pass
 
+    # Columnar copy of the raw history that serves /api/historical and
+    # /api/export (None unless HISTORY_BACKEND=segments)
+    segment_store = create_store_from_env()
+    app.config["SEGMENT_STORE"] = segment_store
+    if segment_store is not None:
+        configure_segments(segment_store)
+        segment_store.start()
+
+    # Background group-commit writer (None when INGEST_ASYNC=0)
+    writer = create_writer_from_env()
+    app.config["INGEST_WRITER"] = writer
+
+    # Scheduled retention replaces per-request cleanup_old (None when RETENTION_ENABLED=0)
+    retention = create_job_from_env()
+    app.config["RETENTION_JOB"] = retention
+    if retention is not None:
+        retention.start()
+
+    # Latest state per equipment, seeded from SQLite and updated on ingestion
+    fleet_state = create_state_from_env()
+    app.config["FLEET_STATE"] = fleet_state
+
+    # Concurrent predictions share one micro-batched predict (None when INFER_BATCHING=0)
+    executor = create_executor_from_env()
+    app.config["INFERENCE_EXECUTOR"] = executor
+
+    # Readings that repeat within the quantization step skip the model
+    # (None unless PREDICTION_CACHE_SIZE is set)
+    prediction_cache = create_cache_from_env()
+    app.config["PREDICTION_CACHE"] = prediction_cache
+    score_arrays = executor.predict if executor is not None else predict_failure_arrays
+
+    # Per-equipment rolling statistics for models trained with them (see
+    # features.py), updated in O(1) per unit from every simulator tick
+    rolling: List[RollingFeatures] = []
+    rolling_lock = threading.Lock()
+
+    def rolling_engine(trained) -> RollingFeatures:
+        with rolling_lock:
+            if not rolling or rolling[0].spec != trained.rolling:
+                rolling[:] = [RollingFeatures(**trained.rolling)]
+            return rolling[0]
+
+    def model_inputs(trained, frame):
+        if not trained.rolling:
+            return frame[FEATURE_COLUMNS]
+        # Ticks already fed by score_ticks are skipped by timestamp
+        ts_ms = np.asarray(frame["timestamp"], dtype="datetime64[ms]").astype(np.int64)
+        with stage("rolling_features"):
+            return rolling_engine(trained).frame(frame["equipment_id"], frame[FEATURE_COLUMNS], ts_ms)
+
+    def score_frame(trained, frame):
+        X = model_inputs(trained, frame)
+        if executor is None and prediction_cache is None:
+            return predict_failure(trained, X)
+        result = X.copy()
+        if prediction_cache is not None:
+            scores = prediction_cache.predict(trained, result, score_arrays)
+        else:
+            scores = score_arrays(trained, result)
+        result["failure_probability"], result["health_score"] = scores
+        return result
+
+    def model_not_ready():
+        body = {"error": "model not ready", "model": model_loader.stats()}
+        return jsonify(body), 503, {"Retry-After": "5"}
+
+    # Threshold rules with hysteresis over every simulator tick (ALERT_RULES);
+    # alerts still open before a restart are picked up from the transition log
+    alert_engine = create_engine_from_env()
+    app.config["ALERT_ENGINE"] = alert_engine
+
+    # Stateful synthetic fleet behind the sensor and prediction endpoints
+    simulator = create_simulator_from_env()
+    app.config["SIMULATOR"] = simulator
+    try:
+        # As of the tick the simulator resumes from: a shared simulator replays
+        # the current period, and alerts opened during it are raised again
+        alert_engine.restore(get_open_alert_transitions(int(simulator.now.astype(np.int64))))
+    except Exception:
+        pass
+
+    # Every tick the simulator takes, not only the ones a request scores:
+    # each unit's rolling window covers the contiguous series it was trained
+    # on, and alert runs count every reading, so workers sharing SIM_SEED
+    # record the same transitions. The hook runs under the simulator lock and
+    # only queues the chunk; score_ticks feeds the queue in order once sync()
+    # has returned and the model is loaded, so ticks taken before that wait
+    pending_ticks: deque = deque()
+    ticks_lock = threading.Lock()
+    # (model, timestamp, failure_probability, health_score) of the newest scored tick
+    last_scores: List[Any] = [None]
+
+    simulator.on_advance = pending_ticks.append
+
+    def score_ticks() -> None:
+        trained = model_loader.get()
+        if trained is None:
+            return
+        with ticks_lock:
+            while pending_ticks:
+                chunk = pending_ticks.popleft()
+                try:
+                    frame = chunk_frame(chunk, simulator.equipment_ids)
+                    ts_ms = frame["timestamp"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+                    X = frame[FEATURE_COLUMNS]
+                    if trained.rolling:
+                        X = rolling_engine(trained).frame(frame["equipment_id"], X, ts_ms)
+                    frame["failure_probability"], frame["health_score"] = score_arrays(trained, X)
+                    # The fixed id list for a single tick keeps the engine's slot lookup cached
+                    ids = simulator.equipment_ids if len(chunk["timestamp"]) == 1 else frame["equipment_id"].tolist()
+                    transitions = alert_engine.evaluate(ids, frame, ts_ms)
+                    tail = frame.iloc[-len(simulator.equipment_ids):]
+                    last_scores[0] = (
+                        trained,
+                        np.datetime_as_string(chunk["timestamp"][-1], unit="ms"),
+                        tail["failure_probability"].to_numpy(),
+                        tail["health_score"].to_numpy(),
+                    )
+                    if transitions:
+                        store_alert_transitions(transitions)
+                except Exception:
+                    pass
+
+    def latest_frame():
+        # Catch the simulator up to wall-clock time; one row per unit
+        with stage("simulate"):
+            simulator.sync()
+            frame = chunk_frame(simulator.latest(), simulator.equipment_ids)
+            frame["timestamp"] = np.datetime_as_string(frame["timestamp"].to_numpy(), unit="ms")
+        with stage("score_ticks"):
+            score_ticks()
+        return frame
+
+    def sensor_reading(equipment_id: str) -> Dict[str, Any]:
+        column = simulator.index(equipment_id)
+        with stage("simulate"):
+            simulator.sync()
+            latest = simulator.latest()
+        with stage("score_ticks"):
+            score_ticks()
+        return {
+            "equipment_id": equipment_id,
+            "timestamp": np.datetime_as_string(latest["timestamp"][0], unit="ms"),
+            "temperature": float(latest["temperature"][0, column]),
+            "vibration": float(latest["vibration"][0, column]),
+            "pressure": float(latest["pressure"][0, column]),
+            "current": float(latest["current"][0, column]),
+        }
+
+    def score_fleet(trained):
+        # Score the current tick of every simulated unit, reusing score_ticks'
+        # scores unless another request has moved the simulator on since
+        frame = latest_frame()
+        scored = last_scores[0]
+        if scored is not None and scored[0] is trained and scored[1] == frame["timestamp"].iat[0]:
+            result = frame
+            result["failure_probability"], result["health_score"] = scored[2], scored[3]
+            return result
+        result = score_frame(trained, frame)
+        result["equipment_id"] = frame["equipment_id"]
+        result["timestamp"] = frame["timestamp"]
+        return result
+
+    def prediction_records(result) -> List[Dict[str, Any]]:
+        with stage("to_records"):
+            return result[PREDICTION_KEYS].to_dict(orient="records")
+
+    def prediction_columns(result) -> Dict[str, np.ndarray]:
+        columns = {key: result[key].to_numpy() for key in PREDICTION_KEYS}
+        columns["timestamp"] = np.asarray(columns["timestamp"], dtype="datetime64[ms]").astype(np.int64)
+        return columns
+
+    def response_format():
+        # ?layout=columns, or a binary format by Accept; None for an unknown layout
+        layout = request.args.get("layout", "rows")
+        if layout not in RESPONSE_LAYOUTS:
+            return None
+        return negotiate(request.accept_mimetypes, layout)
+
+    def columnar_response(body: Dict[str, Any], fmt: str) -> Response:
+        with stage("serialize"):
+            data, mimetype = encode_columns(body, fmt)
+        response = Response(data, mimetype=mimetype)
+        response.vary.add("Accept")
+        return response
+
+    def alert_records() -> List[Dict[str, Any]]:
+        # score_ticks has already evaluated every tick up to the current one
+        return alert_engine.open_alerts()
+
+    def live_events() -> List[Any]:
+        # One simulation step, one scoring pass and one write per tick, however
+        # many dashboards are connected to /api/stream
+        reading = sensor_reading(simulator.equipment_ids[0])
+        try:
+            store_reading(reading)
+        except Exception:
+            pass
+        events: List[Any] = [("sensor-data", reading)]
+        trained = model_loader.get()
+        if trained is not None:
+            result = score_fleet(trained)
+            records = prediction_records(result)
+            try:
+                store_predictions(records)
+            except Exception:
+                pass
+            events.append(("predictions", {"predictions": records}))
+            events.append(("alerts", {"alerts": alert_records()}))
+        return events
+
+    # Live dashboard stream; ticks with the simulator unless LIVE_TICK_SECONDS is set
+    live_feed = create_feed_from_env(live_events, simulator.tick / np.timedelta64(1, "s"))
+    app.config["LIVE_FEED"] = live_feed
+
+    # Per-stage histograms and component stats on /metrics; slow requests are
+    # profiled when SLOW_REQUEST_PROFILE_MS is set
+    instrument_app(app, REGISTRY, create_profiler_from_env())
+    REGISTRY.add_collector("app_db_connections", lambda: get_manager().stats())
+    REGISTRY.add_collector("app_model", model_loader.stats)
+    REGISTRY.add_collector("app_fleet", lambda: {"units": len(fleet_state)})
+    if writer is not None:
+        REGISTRY.add_collector("app_ingest", writer.stats)
+    if retention is not None:
+        REGISTRY.add_collector("app_retention", retention.stats)
+    if segment_store is not None:
+        REGISTRY.add_collector("app_segments", segment_store.stats)
+    if executor is not None:
+        REGISTRY.add_collector("app_inference", executor.stats)
+    if prediction_cache is not None:
+        REGISTRY.add_collector("app_prediction_cache", prediction_cache.stats)
+    REGISTRY.add_collector("app_live", live_feed.stats)
+    REGISTRY.add_collector("app_alerts", alert_engine.stats)
+    REGISTRY.add_collector("app_rolling_features", lambda: rolling[0].stats() if rolling else {"units": 0})
+
+    # gzip/brotli per Accept-Encoding, timed inside the request histograms
+    # (None when RESPONSE_COMPRESSION=0)
+    compressor = create_compressor_from_env()
+    app.config["RESPONSE_COMPRESSOR"] = compressor
+    if compressor is not None:
+        compressor.install(app)
+        REGISTRY.add_collector("app_compression", compressor.stats)
+
+    # ETag/304 and cached bodies for /api/historical and /api/export, keyed
+    # on the data version that every write bumps (None when RESPONSE_CACHE=0)
+    response_cache = create_response_cache_from_env(get_data_version)
+    app.config["RESPONSE_CACHE"] = response_cache
+    if response_cache is not None:
+        REGISTRY.add_collector("app_response_cache", response_cache.stats)
+
+    def cached(key: str, build):
+        if response_cache is None:
+            return build()
+        return response_cache.respond(key, build, compressor)
+
+    # Newest tick stored per key (one unit's readings, the fleet's
+    # predictions): polls within a tick are answered without another write
+    stored_ticks: Dict[str, str] = {}
+    stored_lock = threading.Lock()
+
+    def new_tick(key: str, timestamp: str) -> bool:
+        with stored_lock:
+            if stored_ticks.get(key, "") >= timestamp:
+                return False
+            stored_ticks[key] = timestamp
+            return True
+
+    def store_reading(payload: Dict[str, Any]) -> None:
+        if not new_tick(f"reading:{payload['equipment_id']}", payload["timestamp"]):
+            return
+        row = (
+            payload["timestamp"],
+            payload["temperature"],
+            payload["vibration"],
+            payload["pressure"],
+            payload["current"],
+            payload["equipment_id"],
+        )
+        fleet_state.update_reading(row[5], *row[:5])
+        if writer is not None:
+            writer.submit_reading(*row)
+        else:
+            insert_reading(*row)
+
+    def store_predictions(records: List[Dict[str, Any]]) -> None:
+        if not records or not new_tick("predictions", records[0]["timestamp"]):
+            return
+        fleet_state.update_predictions(records)
+        if writer is not None:
+            writer.submit_predictions(records)
+        else:
+            insert_predictions(records)
+
+    def store_alert_transitions(transitions) -> None:
+        if writer is not None:
+            writer.submit_alert_transitions(transitions)
+        else:
+            insert_alert_transitions(transitions)
+
     # Global CORS headers
     @app.after_request
     def add_cors_headers(response):
@@ -52,116 +394,177 @@ def create_app() -> Flask:
     @app.route("/")
     def dashboard():
         try:
-            # Simple KPI placeholders; these might come from DB in real app
-            total = 120
-            healthy = 95
-            at_risk = 18
-            critical = 7
-            return render_template(
-                "dashboard.html",
-                total=total,
-                healthy=healthy,
-                at_risk=at_risk,
-                critical=critical,
-            )
+            # Answered from the hourly rollups, not a scan of predictions
+            return render_template("dashboard.html", **get_fleet_kpis())
         except Exception as exc:
             return jsonify({"error": str(exc)}), 500
 
     @app.route("/api/sensor-data")
     def api_sensor_data():
         try:
-            # Generate a single recent reading from the synthetic generator
-            df = generate_data(num_points=20, days=1)
-            row = df.iloc[-1]
-            payload = {
-                "timestamp": row["timestamp"].isoformat(),
-                "temperature": float(row["temperature"]),
-                "vibration": float(row["vibration"]),
-                "pressure": float(row["pressure"]),
-                "current": float(row["current"]),
-            }
+            # Latest simulated reading for one unit
+            equipment_id = request.args.get("equipment_id", simulator.equipment_ids[0])
             try:
-                insert_reading(
-                    payload["timestamp"],
-                    payload["temperature"],
-                    payload["vibration"],
-                    payload["pressure"],
-                    payload["current"],
-                )
-                cleanup_old(90)
+                payload = sensor_reading(equipment_id)
+            except KeyError:
+                return jsonify({"error": f"unknown equipment_id: {equipment_id}"}), 404
+            try:
+                with stage("db_write"):
+                    store_reading(payload)
             except Exception:
                 pass
-            return jsonify(payload)
+            with stage("serialize"):
+                return jsonify(payload)
         except Exception as exc:
             return jsonify({"error": str(exc)}), 500
 
     @app.route("/api/predictions")
     def api_predictions():
         try:
-            trained = app.config.get("TRAINED_MODEL")
-            # Simulate 15 equipment readings right now
-            df = generate_data(num_points=15, days=1)
-            X = df[["temperature", "vibration", "pressure", "current"]]
-            result = predict_failure(trained, X)
-            result["equipment_id"] = [f"EQ-{i:03d}" for i in range(1, len(result) + 1)]
-            result["timestamp"] = datetime.utcnow().isoformat()
-            records: List[Dict[str, Any]] = result[
-                [
-                    "equipment_id",
-                    "timestamp",
-                    "temperature",
-                    "vibration",
-                    "pressure",
-                    "current",
-                    "failure_probability",
-                    "health_score",
-                ]
-            ].to_dict(orient="records")
+            fmt = response_format()
+            if fmt is None:
+                return jsonify({"error": f"Unsupported layout: {request.args['layout']}"}), 400
+            trained = model_loader.get(MODEL_WAIT_SECONDS)
+            if trained is None:
+                return model_not_ready()
+            result = score_fleet(trained)
+            records = prediction_records(result)
             try:
-                insert_predictions(records)
-                cleanup_old(90)
+                with stage("db_write"):
+                    store_predictions(records)
             except Exception:
                 pass
-            return jsonify({"predictions": records})
+            if fmt != "rows":
+                return columnar_response({"predictions": prediction_columns(result)}, fmt)
+            with stage("serialize"):
+                response = jsonify({"predictions": records})
+            response.vary.add("Accept")
+            return response
         except Exception as exc:
             return jsonify({"error": str(exc)}), 500
 
     @app.route("/api/alerts")
     def api_alerts():
         try:
-            # Use predictions to derive alerts (e.g., health_score < 60 or failure_prob > 0.4)
-            trained = app.config.get("TRAINED_MODEL")
-            df = generate_data(num_points=20, days=1)
-            X = df[["temperature", "vibration", "pressure", "current"]]
-            result = predict_failure(trained, X)
-            result["equipment_id"] = [f"EQ-{i:03d}" for i in range(1, len(result) + 1)]
-            alerts_df = result[(result["health_score"] < 60) | (result["failure_probability"] > 0.4)]
-            alerts = [
-                {
-                    "equipment_id": r["equipment_id"],
-                    "severity": "critical" if r["health_score"] < 40 or r["failure_probability"] > 0.6 else "warning",
-                    "message": "High failure probability detected",
-                    "health_score": float(r["health_score"]),
-                    "failure_probability": float(r["failure_probability"]),
-                    "timestamp": datetime.utcnow().isoformat(),
-                }
-                for _, r in alerts_df.iterrows()
-            ]
-            return jsonify({"alerts": alerts})
+            trained = model_loader.get(MODEL_WAIT_SECONDS)
+            if trained is None:
+                return model_not_ready()
+            score_fleet(trained)
+            alerts = alert_records()
+            with stage("serialize"):
+                return jsonify({"alerts": alerts})
         except Exception as exc:
             return jsonify({"error": str(exc)}), 500
 
+    @app.route("/api/alerts/history")
+    def api_alerts_history():
+        try:
+            # Opened/closed transitions, newest first
+            days = int(request.args.get("days", 7))
+            limit = min(int(request.args.get("limit", 1000)), 10000)
+            equipment_id = request.args.get("equipment_id")
+            with stage("db_read"):
+                transitions = get_alert_transitions(days, equipment_id, limit)
+            return jsonify({"transitions": transitions, "rules": alert_engine.describe()})
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 500
+
+    @app.route("/api/stream")
+    def api_stream():
+        # Server-Sent Events: sensor-data, predictions and alerts once per tick
+        try:
+            subscriber = live_feed.subscribe()
+        except TooManySubscribers as exc:
+            return jsonify({"error": str(exc)}), 503, {"Retry-After": "30"}
+        return Response(
+            live_feed.stream(subscriber),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
     # Health endpoint remains
     @app.get("/api/health")
     def health():
-        return jsonify({"status": "ok", "time": datetime.utcnow().isoformat()})
+        body: Dict[str, Any] = {"status": "ok", "time": datetime.utcnow().isoformat()}
+        body["model"] = model_loader.stats()
+        if writer is not None:
+            body["ingest"] = writer.stats()
+        if retention is not None:
+            body["retention"] = retention.stats()
+        body["fleet_units"] = len(fleet_state)
+        return jsonify(body)
+
+    # Readiness probe: 503 until the model has loaded
+    @app.get("/api/ready")
+    def ready():
+        if not model_loader.ready:
+            return model_not_ready()
+        return jsonify({"status": "ready", "model": model_loader.stats()})
+
+    @app.route("/api/fleet")
+    def api_fleet():
+        # Served from memory; never touches SQLite
+        with stage("state_read"):
+            body = {"counts": fleet_state.counts(), "equipment": fleet_state.snapshot()}
+        with stage("serialize"):
+            return jsonify(body)
+
+    @app.route("/api/fleet/<equipment_id>")
+    def api_fleet_unit(equipment_id: str):
+        unit = fleet_state.get(equipment_id)
+        if unit is None:
+            return jsonify({"error": f"Unknown equipment: {equipment_id}"}), 404
+        return jsonify(unit)
+
+    @app.route("/api/kpis")
+    def api_kpis():
+        try:
+            with stage("db_read"):
+                kpis = get_fleet_kpis()
+            return jsonify(kpis)
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 500
+
+    @app.route("/api/rollups/<resolution>/<int:days>")
+    def api_rollups(resolution: str, days: int):
+        try:
+            if resolution not in ROLLUP_RESOLUTIONS:
+                return jsonify({"error": f"Unsupported resolution: {resolution}"}), 400
+            days = max(1, min(days, 3650))
+            with stage("db_read"):
+                buckets = get_rollups(resolution, days, request.args.get("equipment_id"))
+            with stage("serialize"):
+                return jsonify({"resolution": resolution, "buckets": buckets})
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 500
 
     @app.route("/api/historical/<int:days>")
     def api_historical(days: int):
         try:
             days = max(1, min(days, 90))
-            data = get_historical(days)
-            return jsonify(data)
+            # Bounded by default; max_points=0 returns every raw row
+            max_points = request.args.get("max_points", HISTORICAL_MAX_POINTS, type=int)
+            method = request.args.get("method", "lttb")
+            if method not in HISTORICAL_METHODS:
+                return jsonify({"error": f"Unsupported method: {method}"}), 400
+            fmt = response_format()
+            if fmt is None:
+                return jsonify({"error": f"Unsupported layout: {request.args['layout']}"}), 400
+            max_points = max(0, max_points or 0)
+
+            def build():
+                if fmt != "rows":
+                    with stage("db_read"):
+                        data = get_historical_columns(days, max_points=max_points, method=method)
+                    return columnar_response(data, fmt)
+                with stage("db_read"):
+                    data = get_historical(days, max_points=max_points, method=method)
+                with stage("serialize"):
+                    response = jsonify(data)
+                response.vary.add("Accept")
+                return response
+
+            return cached(f"historical|{days}|{max_points}|{method}|{fmt}", build)
         except Exception as exc:
             return jsonify({"error": str(exc)}), 500
 
@@ -169,15 +572,29 @@ def create_app() -> Flask:
     def api_export(days: int):
         try:
             days = max(1, min(days, 90))
-            csv_data = export_csv(days)
-            filename = f"export_{days}d.csv"
-            return Response(
-                csv_data,
-                mimetype="text/csv",
-                headers={
-                    "Content-Disposition": f"attachment; filename={filename}"
-                },
-            )
+            fmt = request.args.get("format", "csv").lower()
+            if fmt not in EXPORT_FORMATS:
+                return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+            mimetype, ext = EXPORT_FORMATS[fmt]
+
+            def build():
+                if fmt == "csv":
+                    body = export_csv_chunks(days)
+                else:
+                    body = export_columnar_chunks(days, fmt)
+                    # Fail before streaming starts if pyarrow is missing
+                    first = next(body)
+                    body = itertools.chain([first], body)
+                filename = f"export_{days}d.{ext}"
+                return Response(
+                    body,
+                    mimetype=mimetype,
+                    headers={
+                        "Content-Disposition": f"attachment; filename={filename}"
+                    },
+                )
+
+            return cached(f"export|{days}|{fmt}", build)
         except Exception as exc:
             return jsonify({"error": str(exc)}), 500
 
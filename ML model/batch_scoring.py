@@ -0,0 +1,247 @@
+import codecs
+import csv
+import heapq
+import io
+import json
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from metrics import stage
+from predictive_model import FEATURE_COLUMNS, predict_failure_arrays
+
+
+BATCH_FORMATS = ("json", "ndjson", "csv")
+_MIMETYPES = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/x-jsonlines": "ndjson",
+    "text/csv": "csv",
+    "application/csv": "csv",
+}
+
+WARNING_ABOVE = 0.4
+CRITICAL_ABOVE = 0.7
+
+
+def detect_format(mimetype: str | None, override: str | None = None) -> str:
+    """Input format from an explicit ``?format=`` value or the request mimetype (default ndjson)."""
+    if override:
+        if override not in BATCH_FORMATS:
+            raise ValueError(f"Unsupported format: {override}")
+        return override
+    return _MIMETYPES.get((mimetype or "").lower(), "ndjson")
+
+
+def _text_chunks(stream, size: int = 1 << 16) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        block = stream.read(size)
+        if not block:
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            return
+        text = decoder.decode(block) if isinstance(block, bytes) else block
+        if text:
+            yield text
+
+
+def iter_ndjson(stream) -> Iterator[Any]:
+    """One parsed value per non-blank line; a line that fails to parse yields its ValueError."""
+    buffer = ""
+    for text in _text_chunks(stream):
+        buffer += text
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if buffer.strip():
+        yield _parse_line(buffer)
+
+
+def _parse_line(line: str) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        return exc
+
+
+def iter_json_array(stream) -> Iterator[Any]:
+    """
+    Elements of a top-level JSON array, decoded incrementally so the whole
+    body is never held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    # What the grammar allows next: "[" to open, then a value or "]", and
+    # after each value "," or "]"; a "," must be followed by a value
+    expect = "open"
+    chunks = _text_chunks(stream)
+    exhausted = False
+    while True:
+        # Skip whitespace
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer) or exhausted:
+                break
+            buffer, pos = "", 0
+            try:
+                buffer = next(chunks)
+            except StopIteration:
+                exhausted = True
+        if pos >= len(buffer):
+            if expect != "open":
+                raise ValueError("Unterminated JSON array")
+            return
+        char = buffer[pos]
+        if expect == "open":
+            if char != "[":
+                raise ValueError("Expected a JSON array")
+            expect = "first"
+            pos += 1
+            continue
+        if expect == "separator":
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' at {char!r} in JSON array")
+            expect = "value"
+            pos += 1
+            continue
+        if char == "]" and expect == "first":
+            return
+        if char in ",]":
+            raise ValueError(f"Expected a value at {char!r} in JSON array")
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if exhausted:
+                raise
+            # Element spans the chunk boundary: read more and retry
+            try:
+                buffer = buffer[pos:] + next(chunks)
+            except StopIteration:
+                exhausted = True
+                buffer = buffer[pos:]
+            pos = 0
+            continue
+        if not exhausted and (end == len(buffer) or buffer[end] not in " \t\r\n,]"):
+            # A number cut at the chunk boundary ("-1." of "-1.5e3") decodes
+            # early; only trust a value that is followed by a separator
+            try:
+                buffer = buffer[pos:] + next(chunks)
+                pos = 0
+                continue
+            except StopIteration:
+                exhausted = True
+        yield value
+        expect = "separator"
+        pos = end
+
+
+def iter_csv(stream) -> Iterator[Dict[str, str]]:
+    """Rows of a CSV body with a header line, as dicts."""
+    text = stream if isinstance(stream, io.TextIOBase) else io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    yield from csv.DictReader(text)
+
+
+def iter_records(stream, fmt: str) -> Iterator[Any]:
+    if fmt == "json":
+        return iter_json_array(stream)
+    if fmt == "csv":
+        return iter_csv(stream)
+    return iter_ndjson(stream)
+
+
+def _status(failure_prob: float) -> str:
+    if failure_prob >= CRITICAL_ABOVE:
+        return "critical"
+    return "warning" if failure_prob >= WARNING_ABOVE else "healthy"
+
+
+class BatchScorer:
+    """
+    Scores a stream of readings in chunks of ``chunk_rows`` and renders NDJSON.
+
+    Each chunk is converted to one float32 array and scored with a single
+    ``predict_failure_arrays`` call. Rows that cannot be read (missing or
+    non-numeric features) produce an error line with their 1-based row
+    number instead of failing the batch. ``lines`` ends with a summary line
+    carrying rows/sec; the running totals are also in ``stats``.
+    """
+
+    def __init__(self, model, chunk_rows: int = 10_000) -> None:
+        self.model = model
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    def _chunks(self, records: Iterable[Any]) -> Iterator[Tuple[List[Tuple[int, Any]], List[Tuple[int, str]]]]:
+        good: List[Tuple[int, Any]] = []
+        bad: List[Tuple[int, str]] = []
+        for n, record in enumerate(records, start=1):
+            if isinstance(record, dict):
+                good.append((n, record))
+            else:
+                bad.append((n, str(record) if isinstance(record, Exception) else "Expected a JSON object"))
+            if len(good) + len(bad) >= self.chunk_rows:
+                yield good, bad
+                good, bad = [], []
+        if good or bad:
+            yield good, bad
+
+    def _score_chunk(self, good: List[Tuple[int, Any]], bad: List[Tuple[int, str]]) -> List[str]:
+        X = np.empty((len(good), len(FEATURE_COLUMNS)), dtype=np.float32)
+        keep = np.ones(len(good), dtype=bool)
+        with stage("parse"):
+            for i, (n, record) in enumerate(good):
+                try:
+                    X[i] = [float(record[c]) for c in FEATURE_COLUMNS]
+                except (KeyError, TypeError, ValueError) as exc:
+                    keep[i] = False
+                    bad.append((n, f"Invalid reading: {exc!r}"))
+        rows = [pair for pair, ok in zip(good, keep) if ok]
+        scored: List[Tuple[int, str]] = []
+        if rows:
+            failure_prob, health_score = predict_failure_arrays(self.model, X[keep])
+            with stage("serialize"):
+                for (n, record), p, h in zip(rows, failure_prob.tolist(), health_score.tolist()):
+                    scored.append((n, (
+                        '{"row":%d,"equipment_id":%s,"timestamp":%s,"failure_probability":%.6g,'
+                        '"health_score":%.6g,"status":"%s"}\n'
+                        % (n, json.dumps(record.get("equipment_id")), json.dumps(record.get("timestamp")),
+                           p, h, _status(p))
+                    )))
+        errors = [(n, json.dumps({"row": n, "error": message}) + "\n") for n, message in sorted(bad)]
+        self.rows += len(rows)
+        self.errors += len(bad)
+        # Both lists are in row order; merge so output follows the input
+        return [line for _, line in heapq.merge(scored, errors)]
+
+    def lines(self, records: Iterable[Any]) -> Iterator[str]:
+        started = time.perf_counter()
+        try:
+            for good, bad in self._chunks(records):
+                yield "".join(self._score_chunk(good, bad))
+        except ValueError as exc:
+            # Malformed body (e.g. not a JSON array): report and stop
+            self.errors += 1
+            yield json.dumps({"error": str(exc)}) + "\n"
+        self.seconds = time.perf_counter() - started
+        yield json.dumps({"summary": self.stats()}) + "\n"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 4),
+            "rows_per_sec": round(self.rows / self.seconds, 1) if self.seconds > 0 else None,
+            "chunk_rows": self.chunk_rows,
+        }
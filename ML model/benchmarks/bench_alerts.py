@@ -0,0 +1,113 @@
+"""
+Alert rules: vectorized evaluation per fleet tick, and what hysteresis does
+to alert churn.
+
+  - tick cost   AlertEngine.evaluate over every unit's latest prediction
+                (DEFAULT_RULES, readings drifting around a per-unit level)
+                after a warm-up tick, and open_alerts on the resulting state,
+                against the iterrows filter /api/alerts used before (up to
+                10k units only)
+  - churn       opens + closes over BENCH_TICKS ticks of noisy predictions
+                hovering around the thresholds, with DEFAULT_RULES and with
+                the same thresholds without a clear band or clear delay
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_alerts.py
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from alerts import DEFAULT_RULES, AlertEngine  # noqa: E402
+
+
+UNITS = [1_000, 10_000, 100_000]
+REPEAT = int(os.environ.get("BENCH_REPEAT", "20"))
+TICKS = int(os.environ.get("BENCH_TICKS", "500"))
+CHURN_UNITS = int(os.environ.get("BENCH_CHURN_UNITS", "1000"))
+TICK_MS = 60_000
+
+
+def _tick(rng: np.random.Generator, level: np.ndarray, noise: float) -> pd.DataFrame:
+    # Each unit drifts around its own failure probability
+    prob = np.clip(level + rng.normal(0.0, noise, len(level)), 0.0, 1.0)
+    return pd.DataFrame({"failure_probability": prob, "health_score": (1.0 - prob) * 100.0})
+
+
+def _iterrows_alerts(result: pd.DataFrame) -> list:
+    # The previous /api/alerts implementation
+    alerts_df = result[(result["health_score"] < 60) | (result["failure_probability"] > 0.4)]
+    return [
+        {
+            "equipment_id": r["equipment_id"],
+            "severity": "critical" if r["health_score"] < 40 or r["failure_probability"] > 0.6 else "warning",
+            "message": "High failure probability detected",
+            "health_score": float(r["health_score"]),
+            "failure_probability": float(r["failure_probability"]),
+            "timestamp": r["timestamp"],
+        }
+        for _, r in alerts_df.iterrows()
+    ]
+
+
+def tick_cost(units: int) -> None:
+    rng = np.random.default_rng(0)
+    ids = [f"EQ-{i:06d}" for i in range(units)]
+    # Mostly healthy fleet with a tail of degrading units
+    level = rng.beta(1.2, 8.0, units)
+    engine = AlertEngine()
+    engine.evaluate(ids, _tick(rng, level, 0.01), 0)
+    ticks = [_tick(rng, level, 0.01) for _ in range(REPEAT)]
+    evaluate, report = [], []
+    for k, frame in enumerate(ticks, start=1):
+        started = time.perf_counter()
+        engine.evaluate(ids, frame, k * TICK_MS)
+        evaluate.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        open_alerts = engine.open_alerts()
+        report.append(time.perf_counter() - started)
+    line = (f"  {units:>7,} units  evaluate {np.median(evaluate) * 1e3:7.2f} ms/tick   "
+            f"open_alerts {np.median(report) * 1e3:7.2f} ms ({len(open_alerts):,} alerts)")
+    if units <= 10_000:
+        frame = ticks[-1].assign(equipment_id=ids, timestamp="2026-01-01T00:00:00.000")
+        started = time.perf_counter()
+        _iterrows_alerts(frame)
+        line += f"   iterrows {(time.perf_counter() - started) * 1e3:8.1f} ms"
+    print(line, flush=True)
+
+
+def churn() -> None:
+    rng = np.random.default_rng(1)
+    ids = [f"EQ-{i:06d}" for i in range(CHURN_UNITS)]
+    level = rng.beta(1.2, 6.0, CHURN_UNITS)
+    bare = AlertEngine([replace(r, clear=None, clear_after=1) for r in DEFAULT_RULES])
+    engines = {"default rules": AlertEngine(), "no hysteresis": bare}
+    counts = {name: 0 for name in engines}
+    for k in range(TICKS):
+        values = _tick(rng, level, 0.03)
+        for name, engine in engines.items():
+            counts[name] += len(engine.evaluate(ids, values, k * TICK_MS))
+    for name, engine in engines.items():
+        print(f"  {name:<14} {counts[name]:>7,} transitions  ({counts[name] / TICKS:6.1f}/tick, "
+              f"{engine.stats()['open_units']} units open at the end)")
+
+
+def main() -> None:
+    print(f"Tick cost ({len(DEFAULT_RULES)} rules, median of {REPEAT} ticks):")
+    for units in UNITS:
+        tick_cost(units)
+    print(f"Churn ({CHURN_UNITS:,} units x {TICKS} ticks, noise sd 0.03 on failure probability):")
+    churn()
+
+
+if __name__ == "__main__":
+    main()
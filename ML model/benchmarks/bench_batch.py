@@ -0,0 +1,103 @@
+"""
+Batch scoring throughput: one reading per call vs BatchScorer over a streamed body.
+
+Scores BENCH_ROWS readings supplied as NDJSON, a JSON array and CSV, and
+reports rows/sec and peak traced memory. The single-reading baseline
+scores 1,000 readings through predict_failure one at a time, as the POST
+/api/predictions route did per HTTP request.
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_batch.py
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from batch_scoring import BatchScorer, iter_records  # noqa: E402
+from predictive_model import FEATURE_COLUMNS, predict_failure, train_model  # noqa: E402
+
+
+N_ROWS = int(os.environ.get("BENCH_ROWS", "200000"))
+CHUNK_ROWS = [1_000, 10_000, 50_000]
+
+
+def _readings(n: int):
+    rng = np.random.default_rng(0)
+    centre = np.array([60.0, 2.0, 12.0, 110.0])
+    scale = np.array([6.0, 0.8, 1.2, 10.0])
+    X = centre + scale * rng.standard_normal((n, 4))
+    return [
+        {"equipment_id": f"EQ-{i % 1000:04d}", "timestamp": "2026-01-01T00:00:00", **dict(zip(FEATURE_COLUMNS, row))}
+        for i, row in enumerate(X.tolist())
+    ]
+
+
+def _bodies(records):
+    ndjson = "\n".join(json.dumps(r) for r in records).encode()
+    array = json.dumps(records).encode()
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=list(records[0]))
+    writer.writeheader()
+    writer.writerows(records)
+    return {"ndjson": ndjson, "json": array, "csv": buf.getvalue().encode()}
+
+
+def _run(model, body: bytes, fmt: str, chunk_rows: int):
+    scorer = BatchScorer(model, chunk_rows=chunk_rows)
+    out_bytes = 0
+    for part in scorer.lines(iter_records(io.BytesIO(body), fmt)):
+        out_bytes += len(part)
+    return scorer, out_bytes
+
+
+def _score(model, body: bytes, fmt: str, chunk_rows: int):
+    start = time.perf_counter()
+    scorer, out_bytes = _run(model, body, fmt, chunk_rows)
+    rate = scorer.rows / (time.perf_counter() - start)
+    # Separate traced pass: tracemalloc slows the scoring loop several-fold
+    tracemalloc.start()
+    _run(model, body, fmt, chunk_rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rate, peak, out_bytes
+
+
+def main() -> None:
+    workdir = tempfile.mkdtemp(prefix="bench_batch_")
+    try:
+        model = train_model(save_path=os.path.join(workdir, "model.pkl"))
+        records = _readings(N_ROWS)
+
+        single = records[:1000]
+        start = time.perf_counter()
+        for r in single:
+            predict_failure(model, [[r[c] for c in FEATURE_COLUMNS]])
+        per_row = (time.perf_counter() - start) / len(single)
+        print(f"one reading per call      {1 / per_row:12,.0f} rows/s")
+
+        bodies = _bodies(records)
+        print(f"{N_ROWS:,} readings")
+        for fmt, body in bodies.items():
+            for chunk_rows in CHUNK_ROWS:
+                rate, peak, out_bytes = _score(model, body, fmt, chunk_rows)
+                print(f"  {fmt:<6} chunk {chunk_rows:>6,}  {rate:12,.0f} rows/s  peak {peak / 2**20:6.1f} MiB "
+                      f"(body {len(body) / 2**20:.0f} MiB, output {out_bytes / 2**20:.0f} MiB)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
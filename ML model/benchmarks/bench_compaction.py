@@ -0,0 +1,90 @@
+"""
+Compact model variants against the default forest.
+
+A forest is trained as train_model does (BENCH_TREES fully grown trees on
+BENCH_TRAIN_ROWS synthetic rows), then compaction.compact_model builds its
+variants from BENCH_ROWS fresh rows, half to fit and half held out. For the
+original and every variant:
+
+  - size        artifact bytes on disk
+  - load        load_trained_model(mmap_mode="r"), as the app's loader runs it
+  - latency     single-row p50/p99 of predict_failure_arrays
+  - batch       BENCH_BATCH rows in one predict_failure_arrays call
+  - accuracy    holdout average precision and its change, and the mean
+                absolute difference from the original's probabilities
+
+followed by the variant load_trained_model picks for a few latency budgets.
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_compaction.py
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from compaction import compact_model  # noqa: E402
+from predictive_model import (  # noqa: E402
+    FEATURE_COLUMNS,
+    generate_data,
+    load_trained_model,
+    predict_failure_arrays,
+    train_model,
+)
+
+
+TRAIN_ROWS = int(os.environ.get("BENCH_TRAIN_ROWS", "20000"))
+TREES = int(os.environ.get("BENCH_TREES", "200"))
+ROWS = int(os.environ.get("BENCH_ROWS", "10000"))
+BATCH = int(os.environ.get("BENCH_BATCH", "10000"))
+BUDGETS = [0.1, 0.25, 0.5, 1.0, 2.0, 5.0]
+
+
+def _batch_ms(path: str, X: np.ndarray) -> float:
+    trained = load_trained_model(path, mmap_mode="r")
+    predict_failure_arrays(trained, X[:BATCH])
+    started = time.perf_counter()
+    predict_failure_arrays(trained, X[:BATCH])
+    return (time.perf_counter() - started) * 1e3
+
+
+def main() -> None:
+    root = tempfile.mkdtemp(prefix="bench_compaction_")
+    try:
+        path = os.path.join(root, "model.pkl")
+        started = time.perf_counter()
+        train_model(generate_data(num_points=TRAIN_ROWS), save_path=path, n_estimators=TREES)
+        print(f"{TREES} trees on {TRAIN_ROWS:,} rows trained in {time.perf_counter() - started:.1f} s")
+        manifest = compact_model(path, rows=ROWS)
+        X = generate_data(num_points=BATCH, random_state=7)[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+        print(f"variants built in {manifest['build_seconds']:.1f} s, measured on {manifest['holdout_rows']:,} "
+              f"holdout rows; batch of {BATCH:,} rows")
+        print(f"  {'variant':<33} {'nodes':>7} {'MiB':>7} {'load ms':>8} {'p50 ms':>7} {'p99 ms':>7} "
+              f"{'batch ms':>8} {'AP':>6} {'dAP':>7} {'|dp|':>6}")
+        for v in manifest["variants"]:
+            nodes = v.get("params", {}).get("nodes")
+            print(f"  {v['name']:<33} {nodes if nodes is not None else '-':>7} {v['size_mib']:7.3f} "
+                  f"{v['load_ms']:8.2f} {v['p50_ms']:7.3f} {v['p99_ms']:7.3f} "
+                  f"{_batch_ms(os.path.join(root, v['file']), X):8.1f} {v['holdout']['average_precision']:6.3f} "
+                  f"{v.get('delta', {}).get('average_precision', 0.0):+7.3f} {v.get('mean_abs_diff', 0.0):6.3f}",
+                  flush=True)
+        picks = []
+        for budget in BUDGETS:
+            trained = load_trained_model(path, mmap_mode="r", latency_budget_ms=budget)
+            variant = ((trained.training or {}).get("compaction") or {}).get("variant", "full")
+            picks.append(f"{budget:g} ms -> {variant}")
+        print("  budget:", ", ".join(picks))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
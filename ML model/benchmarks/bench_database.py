@@ -0,0 +1,94 @@
+"""
+Insert and query throughput of database.py with a fresh connection per call
+(the previous behaviour) versus the per-thread connection manager.
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_database.py
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database  # noqa: E402
+
+
+N_INSERTS = 2_000
+N_QUERIES = 200
+
+
+@contextmanager
+def _connection_per_call():
+    # Mirrors the original get_conn: connect, default pragmas, commit, close.
+    os.makedirs(os.path.dirname(database.DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _prediction(i: int):
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "equipment_id": f"EQ-{i % 100:03d}",
+        "temperature": 60.0,
+        "vibration": 2.0,
+        "pressure": 12.0,
+        "current": 110.0,
+        "failure_probability": 0.1,
+        "health_score": 90.0,
+    }
+
+
+def _run(label: str) -> None:
+    ts = datetime.utcnow().isoformat()
+    start = time.perf_counter()
+    for _ in range(N_INSERTS):
+        database.insert_reading(ts, 60.0, 2.0, 12.0, 110.0)
+    insert_rate = N_INSERTS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(N_INSERTS // 10):
+        database.insert_predictions([_prediction(i * 10 + j) for j in range(10)])
+    batch_rate = (N_INSERTS // 10) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(N_QUERIES):
+        database.get_historical(1)
+    query_rate = N_QUERIES / (time.perf_counter() - start)
+
+    print(f"{label:<22} {insert_rate:>12.0f} {batch_rate:>14.0f} {query_rate:>12.1f}")
+
+
+def main() -> None:
+    print(f"{'mode':<22} {'inserts/s':>12} {'10-row txn/s':>14} {'queries/s':>12}")
+
+    tmp = tempfile.mkdtemp()
+    database.configure(os.path.join(tmp, "before.db"))
+    database.init_db()
+    original = database.get_conn
+    database.get_conn = _connection_per_call
+    try:
+        _run("connection per call")
+    finally:
+        database.get_conn = original
+
+    database.configure(os.path.join(tmp, "after.db"))
+    database.init_db()
+    _run("per-thread + WAL")
+    database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+/api/historical payload size and latency for raw rows versus LTTB and
+bucket downsampling.
+
+Run from the "ML model" directory; BENCH_ROWS sets the predictions row count:
+
+    BENCH_ROWS=500000 python benchmarks/bench_downsample.py
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database  # noqa: E402
+
+
+N_ROWS = int(os.environ.get("BENCH_ROWS", "500000"))
+N_EQUIPMENT = 15
+
+
+def main() -> None:
+    tmp = tempfile.mkdtemp()
+    database.configure(os.path.join(tmp, "history.db"))
+    database.init_db()
+    rng = np.random.default_rng(0)
+    start_ms = database.to_epoch_ms(datetime.now(timezone.utc) - timedelta(days=89))
+    step = 89 * 86_400_000 // N_ROWS
+    vals = rng.normal(size=(N_ROWS, 5)).cumsum(axis=0)
+    with database.get_conn() as conn:
+        conn.executemany(
+            "INSERT INTO predictions (ts, equipment_id, temperature, vibration, pressure, current, "
+            "failure_probability, health_score) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((start_ms + i * step, f"EQ-{i % N_EQUIPMENT:03d}", *map(float, vals[i]), 100.0 - float(vals[i, 4]))
+             for i in range(N_ROWS)),
+        )
+
+    print(f"{N_ROWS:,} prediction rows, {N_EQUIPMENT} units, 90-day window")
+    print(f"{'mode':<22} {'rows':>9} {'json MiB':>9} {'ms':>9}")
+    for label, kwargs in [
+        ("raw", {}),
+        ("lttb max_points=2000", {"max_points": 2000, "method": "lttb"}),
+        ("bucket max_points=2000", {"max_points": 2000, "method": "bucket"}),
+    ]:
+        start = time.perf_counter()
+        data = database.get_historical(90, **kwargs)
+        body = json.dumps(data)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<22} {len(data['predictions']):>9,} {len(body) / 2**20:>9.2f} {elapsed * 1e3:>9.1f}")
+
+    database.close_connections()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+/api/historical response encodings: build time and payload size.
+
+BENCH_ROWS readings and BENCH_ROWS / 4 predictions from BENCH_UNITS units,
+spread over the last BENCH_DAYS days, are loaded into a fresh SQLite
+database and a SegmentStore. For the raw series (max_points=0) and for
+LTTB at 2000 points, through each backend:
+
+  - rows (json)     get_historical + the json module, as jsonify rendered
+                    it before FastJSONProvider
+  - rows (orjson)   get_historical + orjson, as FastJSONProvider renders it
+  - columns         get_historical_columns + columnar JSON
+  - packed          get_historical_columns + packed float32 arrays
+  - arrow           get_historical_columns + an Arrow IPC stream
+
+Times are the best of BENCH_REPEAT runs of query plus encoding; sizes are
+the body as sent and after gzip and brotli at the ResponseCompressor
+defaults, with the compression time. orjson, brotli and pyarrow rows are
+skipped when the module is missing.
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_encoding.py
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database  # noqa: E402
+import encoding  # noqa: E402
+from segments import SENSOR_COLUMNS, SegmentStore  # noqa: E402
+
+
+ROWS = int(os.environ.get("BENCH_ROWS", "500000"))
+UNITS = int(os.environ.get("BENCH_UNITS", "100"))
+DAYS = int(os.environ.get("BENCH_DAYS", "90"))
+REPEAT = int(os.environ.get("BENCH_REPEAT", "3"))
+
+
+def load(store: SegmentStore, now_ms: int) -> None:
+    rng = np.random.default_rng(0)
+    names = [f"EQ-{i:04d}" for i in range(UNITS)]
+    database.configure_segments(store)
+    span = (DAYS - 1) * 86_400_000
+    for kind, n in (("readings", ROWS), ("predictions", ROWS // 4)):
+        ts = now_ms - span + np.arange(n) * (span // n)
+        iso = np.datetime_as_string(ts.astype("datetime64[ms]"), unit="ms").tolist()
+        values = rng.normal([60.0, 2.0, 12.0, 110.0], [5.0, 0.5, 1.0, 10.0], (n, 4)).round(3)
+        ids = [names[k % UNITS] for k in range(n)]
+        if kind == "readings":
+            database.insert_readings(list(zip(iso, *values.T.tolist(), ids)))
+            continue
+        prob = rng.beta(1.2, 8.0, n).round(4)
+        database.insert_predictions([
+            dict(zip(["timestamp", "equipment_id", *SENSOR_COLUMNS, "failure_probability", "health_score"], row))
+            for row in zip(iso, ids, *values.T.tolist(), prob.tolist(), ((1.0 - prob) * 100.0).tolist())
+        ])
+    store.flush()
+    database.configure_segments(None)
+
+
+def _best(fn):
+    times = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - started)
+    return min(times), out
+
+
+def _flask_json(obj) -> bytes:
+    # DefaultJSONProvider's compact output
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=True).encode()
+
+
+def variants(max_points: int):
+    def rows(dump):
+        return lambda: dump(database.get_historical(DAYS, max_points))
+
+    def columns(fmt):
+        return lambda: encoding.encode_columns(database.get_historical_columns(DAYS, max_points), fmt)[0]
+
+    out = [("rows (json)", rows(_flask_json))]
+    if encoding.orjson is not None:
+        options = encoding._JSONIFY_OPTIONS
+        out.append(("rows (orjson)", rows(lambda obj: encoding.orjson.dumps(obj, option=options))))
+    out += [("columns", columns("columns")), ("packed", columns("packed"))]
+    if encoding.HAVE_ARROW:
+        out.append(("arrow", columns("arrow")))
+    return out
+
+
+def report(label: str, max_points: int) -> None:
+    compressor = encoding.ResponseCompressor()
+    print(f"{label}:")
+    baseline = None
+    for name, fn in variants(max_points):
+        build, body = _best(fn)
+        baseline = baseline or build
+        started = time.perf_counter()
+        gz = len(gzip.compress(body, compressor.gzip_level, mtime=0))
+        gz_s = time.perf_counter() - started
+        line = (f"  {name:<14} {build * 1e3:8.1f} ms ({baseline / build:4.1f}x)  {len(body) / 1e6:7.2f} MB  "
+                f"gzip {gz / 1e6:6.2f} MB {gz_s * 1e3:6.1f} ms")
+        if encoding.brotli is not None:
+            started = time.perf_counter()
+            br = len(encoding.brotli.compress(body, quality=compressor.brotli_quality))
+            line += f"  br {br / 1e6:6.2f} MB {(time.perf_counter() - started) * 1e3:6.1f} ms"
+        print(line, flush=True)
+
+
+def main() -> None:
+    root = tempfile.mkdtemp(prefix="bench_encoding_")
+    try:
+        database.configure(os.path.join(root, "app.db"))
+        database.init_db()
+        store = SegmentStore(os.path.join(root, "segments"), flush_rows=1_000_000)
+        load(store, database.to_epoch_ms(datetime.now(timezone.utc)))
+        print(f"{ROWS:,} readings + {ROWS // 4:,} predictions, {UNITS} units over {DAYS} days "
+              f"(best of {REPEAT}, query + encode)")
+        for backend in ("sqlite", "segments"):
+            database.configure_segments(store if backend == "segments" else None)
+            report(f"{backend}, raw (max_points=0)", 0)
+            report(f"{backend}, lttb 2000 points", 2000)
+    finally:
+        database.configure_segments(None)
+        database.close_connections()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Concurrent single-reading predictions: per-request predict vs InferenceExecutor.
+
+BENCH_SECONDS per point, closed loop: each of 1-64 client threads issues one
+single-row prediction, waits for it, and repeats. Reports requests/sec and
+p50/p99 latency for
+
+  - sklearn      predict_proba per request with the estimator's n_jobs=-1
+  - direct       predict_failure_arrays per request (compiled forest)
+  - executor     InferenceExecutor micro-batching (max_batch 64, max_wait 2 ms)
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_executor.py
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from inference import InferenceExecutor  # noqa: E402
+from predictive_model import TrainedModel, predict_failure_arrays, train_model  # noqa: E402
+
+
+CLIENTS = [1, 4, 16, 64]
+SECONDS = float(os.environ.get("BENCH_SECONDS", "2"))
+
+
+def _closed_loop(predict, clients: int, rows: np.ndarray):
+    latencies = [[] for _ in range(clients)]
+    stop = threading.Event()
+
+    def client(i: int) -> None:
+        out = latencies[i]
+        row = rows[i % len(rows)][None, :]
+        while not stop.is_set():
+            start = time.perf_counter()
+            predict(row)
+            out.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(SECONDS)
+    stop.set()
+    for t in threads:
+        t.join()
+    # Calls still running at the stop signal complete (and count) during join
+    elapsed = time.perf_counter() - started
+    all_lat = np.concatenate([np.asarray(l) for l in latencies])
+    return len(all_lat) / elapsed, np.percentile(all_lat, 50), np.percentile(all_lat, 99)
+
+
+def main() -> None:
+    workdir = tempfile.mkdtemp(prefix="bench_executor_")
+    try:
+        trained = train_model(save_path=os.path.join(workdir, "model.pkl"))
+        rows = np.random.default_rng(0).normal([60, 2, 12, 110], [6, 0.8, 1.2, 10], (256, 4)).astype(np.float32)
+        sklearn_only = TrainedModel(model=trained.model, feature_columns=trained.feature_columns, compiled=None)
+        executor = InferenceExecutor(max_batch=64, max_wait=0.002, n_jobs=1)
+        paths = {
+            "sklearn": lambda X: predict_failure_arrays(sklearn_only, X),
+            "direct": lambda X: predict_failure_arrays(trained, X),
+            "executor": lambda X: executor.predict(trained, X),
+        }
+        print(f"{'path':<10}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for clients in CLIENTS:
+            for name, predict in paths.items():
+                rate, p50, p99 = _closed_loop(predict, clients, rows)
+                print(f"{name:<10}{clients:>8}{rate:>10,.0f}{p50 * 1e3:>10.2f}{p99 * 1e3:>10.2f}", flush=True)
+        stats = executor.stats()
+        print(f"executor: {stats['batches']:,} batches, mean {stats['mean_batch_requests']} requests/batch")
+        executor.stop()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
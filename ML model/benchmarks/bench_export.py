@@ -0,0 +1,85 @@
+"""
+Peak Python memory and wall time of the 90-day export: the previous
+materialize-then-join CSV versus the streamed CSV, Parquet and Arrow paths.
+
+Run from the "ML model" directory; BENCH_ROWS sets the predictions row count:
+
+    BENCH_ROWS=500000 python benchmarks/bench_export.py
+"""
+from __future__ import annotations
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database  # noqa: E402
+
+
+N_ROWS = int(os.environ.get("BENCH_ROWS", "500000"))
+
+
+def _materialized_csv() -> int:
+    # The original export_csv: every row as a dict, then one big string.
+    data = database.get_historical(90)
+    buf = StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(database.EXPORT_COLUMNS)
+    for p in data["predictions"]:
+        writer.writerow(["prediction", p["ts"], p["equipment_id"], p["temperature"], p["vibration"],
+                         p["pressure"], p["current"], p["failure_probability"], p["health_score"]])
+    return len(buf.getvalue())
+
+
+def _consume(chunks) -> int:
+    return sum(len(c) for c in chunks)
+
+
+def _measure(label: str, fn) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<16} {elapsed:>8.2f}s {peak / 2**20:>10.1f} MiB {size / 2**20:>10.1f} MiB")
+
+
+def main() -> None:
+    tmp = tempfile.mkdtemp()
+    database.configure(os.path.join(tmp, "export.db"))
+    database.init_db()
+    start_ms = database.to_epoch_ms(datetime.now(timezone.utc) - timedelta(days=89))
+    step = 89 * 86_400_000 // N_ROWS
+    with database.get_conn() as conn:
+        conn.executemany(
+            "INSERT INTO predictions (ts, equipment_id, temperature, vibration, pressure, current, "
+            "failure_probability, health_score) VALUES (?, ?, 60.5, 2.1, 12.2, 110.4, 0.12, 88.0)",
+            ((start_ms + i * step, f"EQ-{i % 1000:04d}") for i in range(N_ROWS)),
+        )
+
+    print(f"{N_ROWS:,} rows")
+    print(f"{'mode':<16} {'time':>9} {'peak heap':>14} {'output':>14}")
+    _measure("materialized csv", _materialized_csv)
+    _measure("streamed csv", lambda: _consume(database.export_csv_chunks(90)))
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("pyarrow not installed; skipping parquet/arrow")
+    else:
+        _measure("streamed parquet", lambda: _consume(database.export_columnar_chunks(90, "parquet")))
+        _measure("streamed arrow", lambda: _consume(database.export_columnar_chunks(90, "arrow")))
+
+    database.close_connections()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Rolling-window features: streaming cost per fleet tick, offline/streaming
+agreement, and what the features are worth to the model.
+
+  - tick cost      one RollingFeatures.update per fleet tick (every unit
+                   gets a reading) after the windows are full, against
+                   recomputing the same rolling mean/std plus EWMA with
+                   pandas over each unit's last BENCH_HISTORY readings
+                   (slope is left out of the pandas side, so it is a lower
+                   bound on recomputation)
+  - agreement      max |streaming - add_rolling_features| over a simulated
+                   history fed to the engine one chunk at a time
+  - accuracy       average precision of a 100-tree forest on the newest 20%
+                   of ticks, trained on the older 80%, with the four
+                   instantaneous readings vs the extended feature set
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_features.py
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from features import DEFAULT_WINDOW, RollingFeatures, add_rolling_features, extended_columns  # noqa: E402
+from predictive_model import FEATURE_COLUMNS, validation_scores  # noqa: E402
+from simulator import FleetSimulator, chunk_frame  # noqa: E402
+
+
+UNITS = [1_000, 10_000, 100_000]
+HISTORY = int(os.environ.get("BENCH_HISTORY", "48"))
+REPEAT = int(os.environ.get("BENCH_REPEAT", "20"))
+ACCURACY_UNITS = int(os.environ.get("BENCH_ACCURACY_UNITS", "200"))
+ACCURACY_TICKS = int(os.environ.get("BENCH_ACCURACY_TICKS", "1000"))
+
+
+def _ts(chunk: dict) -> np.ndarray:
+    return chunk["timestamp"].astype("datetime64[ms]").astype(np.int64)
+
+
+def _tick_rows(chunk: dict, k: int) -> np.ndarray:
+    return np.stack([chunk[c][k] for c in FEATURE_COLUMNS], axis=1)
+
+
+def tick_cost(units: int) -> None:
+    sim = FleetSimulator(n_units=units, tick_seconds=60.0, random_state=0)
+    ids = np.asarray(sim.equipment_ids, dtype=object)
+    engine = RollingFeatures()
+    warm = sim.advance(DEFAULT_WINDOW)
+    ts = _ts(warm)
+    for k in range(DEFAULT_WINDOW):
+        engine.update(ids, _tick_rows(warm, k), np.full(units, ts[k]))
+
+    chunk = sim.advance(REPEAT)
+    ts = _ts(chunk)
+    times = []
+    for k in range(REPEAT):
+        rows = _tick_rows(chunk, k)
+        started = time.perf_counter()
+        engine.update(ids, rows, np.full(units, ts[k]))
+        times.append(time.perf_counter() - started)
+    streaming = np.median(times) * 1e3
+
+    line = f"  {units:>7,} units  streaming {streaming:8.2f} ms/tick  ({streaming * 1e3 / units:.2f} us/unit)"
+    if units <= 10_000:
+        hist = chunk_frame(sim.advance(HISTORY), sim.equipment_ids)
+        runs = []
+        for _ in range(3):
+            started = time.perf_counter()
+            grouped = hist.groupby("equipment_id")[FEATURE_COLUMNS]
+            roll = grouped.rolling(DEFAULT_WINDOW, min_periods=1)
+            roll.mean(), roll.std(ddof=0)
+            grouped.ewm(alpha=2.0 / (DEFAULT_WINDOW + 1), adjust=False).mean()
+            runs.append(time.perf_counter() - started)
+        pandas_ms = min(runs) * 1e3
+        line += f"   pandas recompute {pandas_ms:9.1f} ms/tick  ({pandas_ms / streaming:,.0f}x)"
+    print(line, flush=True)
+
+
+def agreement() -> None:
+    sim = FleetSimulator(n_units=500, tick_seconds=60.0, random_state=1)
+    engine = RollingFeatures()
+    frames, streamed = [], []
+    for _ in range(10):
+        frame = chunk_frame(sim.advance(30), sim.equipment_ids)
+        ts = frame["timestamp"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+        streamed.append(engine.update(frame["equipment_id"], frame, ts))
+        frames.append(frame)
+    started = time.perf_counter()
+    offline = add_rolling_features(pd.concat(frames, ignore_index=True))
+    offline_s = time.perf_counter() - started
+    diff = np.abs(np.vstack(streamed) - offline[extended_columns()].to_numpy()).max()
+    print(f"  {len(offline):,} readings: max |streaming - offline| = {diff:.2e}  "
+          f"(offline {len(offline) / offline_s / 1e6:.2f} M rows/s)")
+
+
+def accuracy() -> None:
+    from sklearn.ensemble import RandomForestClassifier
+
+    sim = FleetSimulator(n_units=ACCURACY_UNITS, tick_seconds=600.0, random_state=2)
+    frame = add_rolling_features(chunk_frame(sim.advance(ACCURACY_TICKS), sim.equipment_ids))
+    cut = frame["timestamp"].quantile(0.8)
+    train, test = frame[frame["timestamp"] <= cut], frame[frame["timestamp"] > cut]
+    for name, columns in (("instantaneous", FEATURE_COLUMNS), ("rolling", extended_columns())):
+        clf = RandomForestClassifier(
+            n_estimators=100, min_samples_leaf=5, n_jobs=-1, random_state=0, class_weight="balanced_subsample"
+        )
+        clf.fit(train[columns], train["failure"])
+        scores = validation_scores(test["failure"].to_numpy(), clf.predict_proba(test[columns])[:, 1])
+        print(f"  {name:<14} {len(columns):>2} features  AP {scores['average_precision']:.3f}  "
+              f"ROC AUC {scores['roc_auc']:.3f}  Brier {scores['brier']:.4f}")
+
+
+def main() -> None:
+    print(f"Tick cost (window {DEFAULT_WINDOW}, pandas over the last {HISTORY} readings per unit):")
+    for units in UNITS:
+        tick_cost(units)
+    print("Agreement:")
+    agreement()
+    print(f"Accuracy ({ACCURACY_UNITS} units x {ACCURACY_TICKS} ticks, newest 20% held out):")
+    accuracy()
+
+
+if __name__ == "__main__":
+    main()
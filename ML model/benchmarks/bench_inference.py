@@ -0,0 +1,71 @@
+"""
+Latency comparison between sklearn's predict_proba and the compiled forest.
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_inference.py
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from predictive_model import (  # noqa: E402
+    COMPILED_MAX_ROWS,
+    FEATURE_COLUMNS,
+    generate_data,
+    predict_failure_arrays,
+    train_model,
+)
+
+
+BATCH_SIZES = [1, 15, 1_000, 100_000]
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    trained = train_model(save_path=os.path.join(tempfile.mkdtemp(), "model.pkl"))
+    clf = trained.model
+    compiled = trained.compiled
+    assert compiled is not None
+
+    pool = generate_data(num_points=max(BATCH_SIZES), days=365, random_state=7)
+    X_all = pool[FEATURE_COLUMNS]
+
+    print(f"trees={compiled.n_trees} nodes={compiled.n_nodes} depth={compiled.depth} "
+          f"compiled_max_rows={COMPILED_MAX_ROWS}")
+    print(f"{'batch':>8} {'sklearn ms':>12} {'compiled ms':>12} {'speedup':>8} "
+          f"{'dispatch ms':>12} {'max |diff|':>11}")
+    for n in BATCH_SIZES:
+        X_df = X_all.iloc[:n]
+        X_np = X_df.to_numpy(dtype=np.float32)
+        repeat = 20 if n <= 1_000 else 3
+
+        expected = clf.predict_proba(X_df)[:, 1]
+        actual = compiled.predict_proba(X_np)
+        diff = float(np.max(np.abs(expected - actual)))
+        assert diff < 1e-9, diff
+
+        t_sk = _best_of(lambda: clf.predict_proba(X_df), repeat)
+        t_cf = _best_of(lambda: compiled.predict_proba(X_np), repeat)
+        t_pf = _best_of(lambda: predict_failure_arrays(trained, X_np), repeat)
+        print(f"{n:>8} {t_sk * 1e3:>12.3f} {t_cf * 1e3:>12.3f} {t_sk / t_cf:>7.1f}x "
+              f"{t_pf * 1e3:>12.3f} {diff:>11.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Per-call latency of synchronous inserts versus the background IngestWriter.
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_ingest.py
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database  # noqa: E402
+from ingest import IngestWriter  # noqa: E402
+
+
+N_CALLS = 5_000
+
+
+def _percentiles(samples) -> str:
+    arr = np.asarray(samples) * 1e6
+    return f"p50={np.percentile(arr, 50):8.1f}us p99={np.percentile(arr, 99):8.1f}us"
+
+
+def main() -> None:
+    tmp = tempfile.mkdtemp()
+    ts = datetime.utcnow().isoformat()
+
+    database.configure(os.path.join(tmp, "sync.db"))
+    database.init_db()
+    samples = []
+    start = time.perf_counter()
+    for _ in range(N_CALLS):
+        t0 = time.perf_counter()
+        database.insert_reading(ts, 60.0, 2.0, 12.0, 110.0)
+        samples.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    print(f"sync insert_reading   {_percentiles(samples)}  {N_CALLS / total:>9.0f} rows/s")
+
+    database.configure(os.path.join(tmp, "async.db"))
+    database.init_db()
+    writer = IngestWriter()
+    samples = []
+    start = time.perf_counter()
+    for _ in range(N_CALLS):
+        t0 = time.perf_counter()
+        writer.submit_reading(ts, 60.0, 2.0, 12.0, 110.0)
+        samples.append(time.perf_counter() - t0)
+    writer.flush()
+    total = time.perf_counter() - start
+    print(f"IngestWriter submit   {_percentiles(samples)}  {N_CALLS / total:>9.0f} rows/s (incl. final flush)")
+    print(writer.stats())
+    writer.stop()
+    database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Prediction cache: hit rate, latency and accuracy cost of quantized memoization.
+
+Scores BENCH_POLLS polls of a BENCH_UNITS fleet, one row per unit per poll,
+with and without PredictionCache, for two reading streams:
+
+  - steady      healthy units whose readings jitter by a fraction of the
+                quantization step between polls (what the field reports)
+  - simulator   FleetSimulator readings, whose AR(1) noise moves every
+                sensor by several steps per tick (worst case)
+
+and at 1x, 2x and 5x the default resolution. Each poll is scored one row per
+call, as POST /api/predictions does. Reports the hit rate, the mean time
+per row and the mean and largest failure_probability difference from the
+uncached model.
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_prediction_cache.py
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from prediction_cache import DEFAULT_RESOLUTION, PredictionCache  # noqa: E402
+from predictive_model import FEATURE_COLUMNS, predict_failure_arrays, train_model  # noqa: E402
+from simulator import FleetSimulator  # noqa: E402
+
+
+UNITS = int(os.environ.get("BENCH_UNITS", "1000"))
+POLLS = int(os.environ.get("BENCH_POLLS", "50"))
+SCALES = [1, 2, 5]
+
+
+def _steady(rng: np.random.Generator) -> np.ndarray:
+    step = np.array([DEFAULT_RESOLUTION[c] for c in FEATURE_COLUMNS])
+    base = np.array([60.0, 2.0, 12.0, 110.0]) + np.array([4.0, 0.4, 0.8, 6.0]) * rng.standard_normal((UNITS, 4))
+    jitter = 0.3 * step * rng.standard_normal((POLLS, UNITS, 4))
+    return (base[None] + jitter).astype(np.float32)
+
+
+def _simulated() -> np.ndarray:
+    chunk = FleetSimulator(n_units=UNITS, random_state=0).advance(POLLS)
+    return np.stack([chunk[c] for c in FEATURE_COLUMNS], axis=2).astype(np.float32)
+
+
+def _run(model, polls: np.ndarray, cache: PredictionCache | None):
+    out = np.empty(polls.shape[:2])
+    start = time.perf_counter()
+    for p, poll in enumerate(polls):
+        for u in range(poll.shape[0]):
+            row = poll[u:u + 1]
+            if cache is None:
+                proba, _ = predict_failure_arrays(model, row)
+            else:
+                proba, _ = cache.predict(model, row)
+            out[p, u] = proba[0]
+    return out, (time.perf_counter() - start) / (polls.shape[0] * polls.shape[1])
+
+
+def main() -> None:
+    workdir = tempfile.mkdtemp(prefix="bench_cache_")
+    try:
+        model = train_model(save_path=os.path.join(workdir, "model.pkl"))
+        rng = np.random.default_rng(0)
+        streams = {"steady": _steady(rng), "simulator": _simulated()}
+        print(f"{UNITS:,} units x {POLLS} polls, one row per call")
+        for name, polls in streams.items():
+            baseline, per_row = _run(model, polls, None)
+            print(f"  {name:<10} uncached           {per_row * 1e6:8.1f} us/row")
+            for scale in SCALES:
+                resolution = {c: v * scale for c, v in DEFAULT_RESOLUTION.items()}
+                cache = PredictionCache(max_entries=100_000, resolution=resolution)
+                scores, per_row = _run(model, polls, cache)
+                stats = cache.stats()
+                print(f"  {name:<10} cache {scale}x resolution  {per_row * 1e6:8.1f} us/row  "
+                      f"hit rate {stats['hit_rate']:6.1%}  entries {stats['entries']:>7,}  "
+                      f"|dp| mean {np.abs(scores - baseline).mean():.4f} max {np.abs(scores - baseline).max():.4f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
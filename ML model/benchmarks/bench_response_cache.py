@@ -0,0 +1,141 @@
+"""
+Response cache: /api/historical and /api/export through the app with a
+browser's Accept-Encoding, cold and warm.
+
+BENCH_ROWS readings and BENCH_ROWS / 4 predictions from BENCH_UNITS units
+over the last BENCH_DAYS days are loaded into a fresh SQLite database. Two
+apps share one RESPONSE_CACHE_DIR, the second without a memory tier (as
+another gunicorn worker sees the first one's entries). For each endpoint,
+the median of BENCH_REPEAT requests with the body read to the end (size
+is the body as sent on a hit):
+
+  - miss      a write has just bumped the data version: query, encode,
+              compress and store
+  - hit       the same request again: body and compressed variant from
+              memory (a streamed export goes out uncompressed on the miss,
+              so its first hit still compresses once)
+  - disk hit  the same request on the second app
+  - 304       If-None-Match with the ETag of the miss
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_response_cache.py
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import app as app_module  # noqa: E402
+import database  # noqa: E402
+from segments import SENSOR_COLUMNS  # noqa: E402
+
+
+ROWS = int(os.environ.get("BENCH_ROWS", "200000"))
+UNITS = int(os.environ.get("BENCH_UNITS", "50"))
+DAYS = int(os.environ.get("BENCH_DAYS", "30"))
+REPEAT = int(os.environ.get("BENCH_REPEAT", "5"))
+ENDPOINTS = [
+    f"/api/historical/{DAYS}",
+    f"/api/historical/{DAYS}?max_points=0&layout=columns",
+    f"/api/export/{DAYS}",
+]
+HEADERS = {"Accept-Encoding": "gzip, deflate, br"}
+
+
+def load(now_ms: int) -> None:
+    rng = np.random.default_rng(0)
+    names = [f"EQ-{i:04d}" for i in range(UNITS)]
+    span = (DAYS - 1) * 86_400_000
+    for kind, n in (("readings", ROWS), ("predictions", ROWS // 4)):
+        ts = now_ms - span + np.arange(n) * (span // n)
+        iso = np.datetime_as_string(ts.astype("datetime64[ms]"), unit="ms").tolist()
+        values = rng.normal([60.0, 2.0, 12.0, 110.0], [5.0, 0.5, 1.0, 10.0], (n, 4)).round(3)
+        ids = [names[k % UNITS] for k in range(n)]
+        if kind == "readings":
+            database.insert_readings(list(zip(iso, *values.T.tolist(), ids)))
+            continue
+        prob = rng.beta(1.2, 8.0, n).round(4)
+        database.insert_predictions([
+            dict(zip(["timestamp", "equipment_id", *SENSOR_COLUMNS, "failure_probability", "health_score"], row))
+            for row in zip(iso, ids, *values.T.tolist(), prob.tolist(), ((1.0 - prob) * 100.0).tolist())
+        ])
+
+
+def _get(client, url: str, headers: dict) -> tuple:
+    started = time.perf_counter()
+    response = client.get(url, headers=headers)
+    size = len(response.get_data())
+    return time.perf_counter() - started, response, size
+
+
+def _write() -> None:
+    now = datetime.now(timezone.utc).isoformat()
+    database.insert_readings([(now, 60.0, 2.0, 12.0, 110.0, "EQ-BENCH")])
+
+
+def measure(client, disk_client, url: str) -> None:
+    miss, hit, disk_hit, not_modified = [], [], [], []
+    size = 0
+    for _ in range(REPEAT):
+        _write()
+        elapsed, response, _ = _get(client, url, HEADERS)
+        miss.append(elapsed)
+        elapsed, _, size = _get(client, url, HEADERS)
+        hit.append(elapsed)
+        disk_hit.append(_get(disk_client, url, HEADERS)[0])
+        etag = response.headers["ETag"]
+        elapsed, response, _ = _get(client, url, {**HEADERS, "If-None-Match": etag})
+        assert response.status_code == 304
+        not_modified.append(elapsed)
+    ms = [statistics.median(t) * 1e3 for t in (miss, hit, disk_hit, not_modified)]
+    print(f"  {url:<46} {size / 1e6:6.2f} MB  miss {ms[0]:8.1f} ms  hit {ms[1]:6.2f} ms ({ms[0] / ms[1]:5.0f}x)  "
+          f"disk hit {ms[2]:6.2f} ms  304 {ms[3]:5.2f} ms", flush=True)
+
+
+def main() -> None:
+    root = tempfile.mkdtemp(prefix="bench_response_cache_")
+    cwd = os.getcwd()
+    os.environ.update({
+        "MODEL_LOAD": "lazy",
+        "INGEST_ASYNC": "0",
+        "RETENTION_ENABLED": "0",
+        "RESPONSE_CACHE_DIR": os.path.join(root, "cache"),
+        # No bucket rollover mid-run, and room for the uncompressed export
+        "RESPONSE_CACHE_TTL": "3600",
+        "RESPONSE_CACHE_MB": "256",
+        "RESPONSE_CACHE_MAX_ENTRY_MB": "64",
+    })
+    try:
+        os.chdir(root)
+        database.configure(os.path.join(root, "app.db"))
+        database.init_db()
+        load(database.to_epoch_ms(datetime.now(timezone.utc)))
+        flask_app = app_module.create_app()
+        os.environ["RESPONSE_CACHE_MB"] = "0"
+        other = app_module.create_app()
+        print(f"{ROWS:,} readings + {ROWS // 4:,} predictions, {UNITS} units over {DAYS} days, "
+              f"Accept-Encoding: gzip, br (median of {REPEAT})")
+        for url in ENDPOINTS:
+            measure(flask_app.test_client(), other.test_client(), url)
+        stats = flask_app.config["RESPONSE_CACHE"].stats()
+        print(f"  first app: {stats['hits']} hits, {stats['misses']} misses, {stats['not_modified']} not modified, "
+              f"{stats['bytes'] / 1e6:.1f} MB in memory; second app: "
+              f"{other.config['RESPONSE_CACHE'].stats()['disk_hits']} disk hits")
+    finally:
+        os.chdir(cwd)
+        database.close_connections()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Retention pass over a table where a third of the rows are expired: one
+unchunked DELETE (the old cleanup_old) versus RetentionJob's chunked deletes,
+including the longest single write-lock hold.
+
+Run from the "ML model" directory; BENCH_ROWS sets the predictions row count:
+
+    BENCH_ROWS=3000000 python benchmarks/bench_retention.py
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database  # noqa: E402
+from retention import RetentionJob  # noqa: E402
+
+
+N_ROWS = int(os.environ.get("BENCH_ROWS", "3000000"))
+SPAN_DAYS = 135  # retention keeps 90, so a third of the rows expire
+
+
+def _populate(path: str) -> None:
+    database.configure(path)
+    database.init_db()
+    start_ms = database.to_epoch_ms(datetime.now(timezone.utc) - timedelta(days=SPAN_DAYS))
+    step = SPAN_DAYS * 86_400_000 // N_ROWS
+    for offset in range(0, N_ROWS, 500_000):
+        with database.get_conn() as conn:
+            conn.executemany(
+                "INSERT INTO predictions (ts, equipment_id, temperature) VALUES (?, ?, ?)",
+                ((start_ms + i * step, f"EQ-{i % 1000:04d}", 60.0)
+                 for i in range(offset, min(N_ROWS, offset + 500_000))),
+            )
+
+
+def main() -> None:
+    tmp = tempfile.mkdtemp()
+
+    _populate(os.path.join(tmp, "single.db"))
+    cutoff = database.to_epoch_ms(datetime.now(timezone.utc) - timedelta(days=90))
+    start = time.perf_counter()
+    with database.get_conn() as conn:
+        removed = conn.execute("DELETE FROM predictions WHERE ts < ?", (cutoff,)).rowcount
+    single = time.perf_counter() - start
+    print(f"single DELETE      removed={removed:>9,} total={single:7.2f}s longest lock={single * 1e3:9.1f}ms")
+
+    _populate(os.path.join(tmp, "chunked.db"))
+    job = RetentionJob(days=90, chunk_rows=5000, pause=0.0)
+    longest = 0.0
+    original = database.delete_before_chunk
+
+    def timed_chunk(*args):
+        nonlocal longest
+        t0 = time.perf_counter()
+        n = original(*args)
+        longest = max(longest, time.perf_counter() - t0)
+        return n
+
+    database.delete_before_chunk = timed_chunk
+    try:
+        report = job.run_once()
+    finally:
+        database.delete_before_chunk = original
+    removed = sum(report["rows_removed"].values())
+    print(f"RetentionJob       removed={removed:>9,} total={report['seconds']:7.2f}s longest lock={longest * 1e3:9.1f}ms "
+          f"chunks={report['chunks']} pages_freed={report['pages_freed']}")
+
+    database.close_connections()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Fleet KPI latency from the hourly rollups versus aggregating the raw
+predictions table, and the insert cost of maintaining the rollups.
+
+Run from the "ML model" directory; BENCH_ROWS sets the predictions row count:
+
+    BENCH_ROWS=2000000 python benchmarks/bench_rollups.py
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database  # noqa: E402
+
+
+N_ROWS = int(os.environ.get("BENCH_ROWS", "2000000"))
+N_EQUIPMENT = 1_000
+BATCH = 1_000
+
+
+def _records(n: int, start_ms: int, step: int, rng):
+    vals = rng.normal(size=(n, 5))
+    for i in range(n):
+        prob = float(abs(vals[i, 4]) % 1.0)
+        yield {
+            "timestamp": start_ms + i * step,
+            "equipment_id": f"EQ-{i % N_EQUIPMENT:04d}",
+            "temperature": 60 + float(vals[i, 0]),
+            "vibration": 2 + float(vals[i, 1]),
+            "pressure": 12 + float(vals[i, 2]),
+            "current": 110 + float(vals[i, 3]),
+            "failure_probability": prob,
+            "health_score": 100.0 * (1.0 - prob),
+        }
+
+
+def _kpis_from_predictions():
+    # What "/" would cost without rollups: every unit's latest hour of raw rows
+    with database.get_conn() as conn:
+        return conn.execute(
+            """
+            SELECT COUNT(*), SUM(h > 80), SUM(h >= 50 AND h <= 80), SUM(h < 50) FROM (
+              SELECT MIN(health_score) AS h FROM predictions p
+              JOIN (SELECT equipment_id, MAX(ts) - MAX(ts) % 3600000 AS hour FROM predictions GROUP BY equipment_id) l
+                ON p.equipment_id = l.equipment_id AND p.ts >= l.hour
+              GROUP BY p.equipment_id
+            )
+            """
+        ).fetchone()
+
+
+def main() -> None:
+    tmp = tempfile.mkdtemp()
+    rng = np.random.default_rng(0)
+    start_ms = database.to_epoch_ms(datetime.now(timezone.utc) - timedelta(days=30))
+    step = 30 * 86_400_000 // N_ROWS
+
+    rates = {}
+    for label, with_rollups in (("without rollups", False), ("with rollups", True)):
+        database.configure(os.path.join(tmp, f"{with_rollups}.db"))
+        database.init_db()
+        original = database.update_rollups
+        if not with_rollups:
+            database.update_rollups = lambda conn, first_id, last_id: None
+        records = list(_records(N_ROWS, start_ms, step, rng))
+        start = time.perf_counter()
+        for i in range(0, N_ROWS, BATCH):
+            database.insert_predictions(records[i:i + BATCH])
+        rates[label] = N_ROWS / (time.perf_counter() - start)
+        database.update_rollups = original
+    print(f"{N_ROWS:,} predictions, {N_EQUIPMENT} units, {BATCH}-row batches")
+    for label, rate in rates.items():
+        print(f"insert {label:<16} {rate:>10.0f} rows/s")
+
+    for label, fn in (("kpis from predictions", _kpis_from_predictions), ("kpis from rollups", database.get_fleet_kpis)):
+        start = time.perf_counter()
+        result = fn()
+        print(f"{label:<24} {(time.perf_counter() - start) * 1e3:>9.1f} ms  {tuple(result.values()) if isinstance(result, dict) else tuple(result)}")
+
+    database.close_connections()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
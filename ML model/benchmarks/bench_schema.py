@@ -0,0 +1,164 @@
+"""
+Query latency on the original schema (ISO TEXT ts, no indexes) versus the
+indexed epoch-ms schema, plus the time to migrate one into the other.
+
+Run from the "ML model" directory; BENCH_ROWS sets the predictions row count:
+
+    BENCH_ROWS=10000000 python benchmarks/bench_schema.py
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database  # noqa: E402
+
+
+N_ROWS = int(os.environ.get("BENCH_ROWS", "10000000"))
+N_EQUIPMENT = 1_000
+SPAN_DAYS = 90
+CHUNK = 500_000
+
+_V1_PREDICTIONS = """
+    CREATE TABLE predictions (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      ts TEXT NOT NULL,
+      equipment_id TEXT NOT NULL,
+      temperature REAL, vibration REAL, pressure REAL, current REAL,
+      failure_probability REAL, health_score REAL
+    )
+"""
+_V1_READINGS = """
+    CREATE TABLE sensor_readings (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      ts TEXT NOT NULL,
+      temperature REAL, vibration REAL, pressure REAL, current REAL
+    )
+"""
+
+
+def _rows(now: datetime):
+    rng = np.random.default_rng(0)
+    step_ms = SPAN_DAYS * 86_400_000 / N_ROWS
+    start_ms = database.to_epoch_ms(now - timedelta(days=SPAN_DAYS))
+    ids = [f"EQ-{i:04d}" for i in range(N_EQUIPMENT)]
+    for offset in range(0, N_ROWS, CHUNK):
+        n = min(CHUNK, N_ROWS - offset)
+        idx = np.arange(offset, offset + n)
+        ts = (start_ms + idx * step_ms).astype(np.int64)
+        vals = rng.normal(size=(n, 6))
+        yield [
+            (int(ts[k]), ids[int(idx[k]) % N_EQUIPMENT], *map(float, vals[k]))
+            for k in range(n)
+        ]
+
+
+def _build_v1(path: str, now: datetime) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(_V1_PREDICTIONS)
+    conn.execute(_V1_READINGS)
+    for chunk in _rows(now):
+        conn.executemany(
+            "INSERT INTO predictions (ts, equipment_id, temperature, vibration, pressure, current, "
+            "failure_probability, health_score) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (datetime.fromtimestamp(r[0] / 1000, timezone.utc).replace(tzinfo=None).isoformat(), *r[1:])
+                for r in chunk
+            ],
+        )
+        conn.commit()
+    conn.close()
+
+
+def _build_v2(path: str, now: datetime) -> None:
+    database.configure(path)
+    database.init_db()
+    with database.get_conn() as conn:
+        conn.execute("DROP INDEX idx_predictions_ts")
+        conn.execute("DROP INDEX idx_predictions_equipment_ts")
+    for chunk in _rows(now):
+        with database.get_conn() as conn:
+            conn.executemany(
+                "INSERT INTO predictions (ts, equipment_id, temperature, vibration, pressure, current, "
+                "failure_probability, health_score) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                chunk,
+            )
+    with database.get_conn() as conn:
+        database.migrate(conn)  # recreates the indexes after the bulk load
+        conn.execute("PRAGMA user_version = 0")
+        database.migrate(conn)
+
+
+def _time(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def main() -> None:
+    now = datetime.now(timezone.utc)
+    tmp = tempfile.mkdtemp()
+    v1_path = os.path.join(tmp, "v1.db")
+    v2_path = os.path.join(tmp, "v2.db")
+
+    start = time.perf_counter()
+    _build_v1(v1_path, now)
+    _build_v2(v2_path, now)
+    print(f"built {N_ROWS:,} prediction rows per database in {time.perf_counter() - start:.1f}s")
+
+    v1 = sqlite3.connect(v1_path)
+    day_iso = (now - timedelta(days=1)).replace(tzinfo=None).isoformat()
+    week_iso = (now - timedelta(days=7)).replace(tzinfo=None).isoformat()
+    day_ms = database.to_epoch_ms(now - timedelta(days=1))
+    week_ms = database.to_epoch_ms(now - timedelta(days=7))
+
+    results = [
+        (
+            "last 1 day, all units",
+            _time(lambda: v1.execute("SELECT * FROM predictions WHERE ts >= ? ORDER BY ts", (day_iso,)).fetchall()),
+            _time(lambda: database.get_manager().connection().execute(
+                "SELECT * FROM predictions WHERE ts >= ? ORDER BY ts", (day_ms,)).fetchall()),
+        ),
+        (
+            "one unit, last 7 days",
+            _time(lambda: v1.execute(
+                "SELECT * FROM predictions WHERE equipment_id = ? AND ts >= ? ORDER BY ts",
+                ("EQ-0042", week_iso)).fetchall()),
+            _time(lambda: database.get_equipment_range("EQ-0042", week_ms)),
+        ),
+        (
+            "latest 1 per unit",
+            _time(lambda: v1.execute(
+                "SELECT * FROM (SELECT p.*, ROW_NUMBER() OVER (PARTITION BY equipment_id ORDER BY ts DESC) rn "
+                "FROM predictions p) WHERE rn <= 1").fetchall(), repeat=1),
+            _time(lambda: database.get_latest_per_equipment(1)),
+        ),
+    ]
+    print(f"{'query':<24} {'v1 ms':>12} {'v2 ms':>10} {'speedup':>9}")
+    for label, t1, t2 in results:
+        print(f"{label:<24} {t1:>12.1f} {t2:>10.1f} {t1 / t2:>8.0f}x")
+    v1.close()
+
+    database.configure(v1_path)
+    start = time.perf_counter()
+    database.init_db()
+    print(f"migrated v1 -> v{database.SCHEMA_VERSION} in {time.perf_counter() - start:.1f}s")
+    database.close_connections()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
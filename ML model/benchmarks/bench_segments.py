@@ -0,0 +1,211 @@
+"""
+Raw sensor history in SQLite versus the memory-mapped segment store.
+
+BENCH_ROWS readings (default 10M) from
+BENCH_UNITS units, evenly spread over the last BENCH_DAYS days, are loaded
+into a fresh SQLite database (bulk insert, then the schema's indexes) and
+into a SegmentStore (1M-row appends, then compaction). Then, on warm
+caches:
+
+  - load        rows/s and bytes on disk for each backend
+  - scan        a time range into NumPy arrays: SQLite's
+                ``SELECT ... WHERE ts >= ? AND ts < ?`` (as
+                iter_sensor_arrays runs it) against SegmentStore.scan,
+                for 1 hour, 1 day and 7 days
+  - historical  get_historical(1) as raw row dicts, and get_historical(30)
+                bucketed to 2000 points, through each backend
+  - export      export_csv_chunks(1) through each backend
+  - compaction  merging BENCH_SMALL_SEGMENTS segments of 1000 rows, the
+                shape the app's one-second flushes leave behind
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_segments.py
+    BENCH_ROWS=100000000 python benchmarks/bench_segments.py
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database  # noqa: E402
+from segments import SENSOR_COLUMNS, SegmentStore  # noqa: E402
+
+
+ROWS = int(os.environ.get("BENCH_ROWS", "10000000"))
+UNITS = int(os.environ.get("BENCH_UNITS", "1000"))
+DAYS = int(os.environ.get("BENCH_DAYS", "365"))
+CHUNK = 1_000_000
+SMALL_SEGMENTS = int(os.environ.get("BENCH_SMALL_SEGMENTS", "500"))
+WORKDIR = os.environ.get("BENCH_DIR")
+
+_INDEXES = [stmt for stmt in database._SCHEMA if "sensor_readings" in stmt and "CREATE INDEX" in stmt]
+
+
+def _chunks(now_ms: int):
+    """(ts, equipment ids, values) in time order; readings are spaced evenly over the window."""
+    rng = np.random.default_rng(0)
+    names = np.array([f"EQ-{i:05d}" for i in range(UNITS)], dtype=object)
+    start = now_ms - DAYS * 86_400_000
+    step = DAYS * 86_400_000 / ROWS
+    for lo in range(0, ROWS, CHUNK):
+        k = np.arange(lo, min(ROWS, lo + CHUNK))
+        ts = start + (k * step).astype(np.int64)
+        values = np.column_stack([
+            rng.normal(60.0, 5.0, len(k)),
+            rng.gamma(2.0, 1.0, len(k)),
+            rng.normal(12.0, 1.0, len(k)),
+            rng.normal(110.0, 10.0, len(k)),
+        ]).round(3)
+        yield ts, names[k % UNITS], values
+
+
+def _du(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def _best(fn, repeat: int = 3) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def _sqlite_scan(since: int, until: int) -> int:
+    with database.get_conn() as conn:
+        cur = conn.cursor()
+        cur.row_factory = None
+        cur.execute(
+            f"SELECT ts, equipment_id, {', '.join(SENSOR_COLUMNS)} FROM sensor_readings WHERE ts >= ? AND ts < ?",
+            (since, until),
+        )
+        rows = cur.fetchall()
+    if not rows:
+        return 0
+    columns = list(zip(*rows))
+    ts = np.asarray(columns[0], dtype=np.int64)
+    np.asarray(columns[1], dtype=object)
+    np.column_stack([np.asarray(c, dtype=np.float64) for c in columns[2:]])
+    return len(ts)
+
+
+def _store_scan(store: SegmentStore, since: int, until: int) -> int:
+    columns = store.scan("readings", since, until)
+    store.decode(columns["equipment_id"])
+    return len(columns["ts"])
+
+
+def load(store: SegmentStore, now_ms: int) -> None:
+    database.init_db()
+    with database.get_conn() as conn:
+        for stmt in _INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {stmt.split()[5]}")
+    sqlite_s = store_s = 0.0
+    loaded = 0
+    for ts, ids, values in _chunks(now_ms):
+        rows = list(zip(ts.tolist(), *values.T.tolist(), ids.tolist()))
+        started = time.perf_counter()
+        with database.get_conn() as conn:
+            conn.executemany(database._INSERT_READING_SQL, rows)
+        sqlite_s += time.perf_counter() - started
+        started = time.perf_counter()
+        store.append("readings", {"ts": ts, "equipment_id": ids, **dict(zip(SENSOR_COLUMNS, values.T))})
+        store_s += time.perf_counter() - started
+        loaded += len(ts)
+        print(f"  loaded {loaded:,} rows ...", end="\r", flush=True)
+    started = time.perf_counter()
+    with database.get_conn() as conn:
+        for stmt in _INDEXES:
+            conn.execute(stmt)
+    index_s = time.perf_counter() - started
+    started = time.perf_counter()
+    store.flush()
+    merged = store.compact()
+    compact_s = time.perf_counter() - started
+    segments = store.stats()["segments"]["readings"]
+    print(" " * 60, end="\r")
+    print(f"  sqlite    {ROWS / (sqlite_s + index_s) / 1e3:8.0f} k rows/s  (insert {sqlite_s:6.1f} s + indexes "
+          f"{index_s:6.1f} s)  {_du(database.DB_PATH) / 2**30:6.2f} GiB")
+    print(f"  segments  {ROWS / (store_s + compact_s) / 1e3:8.0f} k rows/s  (append {store_s:6.1f} s + compaction "
+          f"{compact_s:6.1f} s, {merged} merged, {segments} segments)  {_du(store.root) / 2**30:6.2f} GiB")
+
+
+def scans(store: SegmentStore, now_ms: int) -> None:
+    for label, span in (("1 hour", 3_600_000), ("1 day", 86_400_000), ("7 days", 7 * 86_400_000)):
+        since, until = now_ms - 3 * 86_400_000 - span, now_ms - 3 * 86_400_000
+        n = _store_scan(store, since, until)
+        sq = _best(lambda: _sqlite_scan(since, until))
+        st = _best(lambda: _store_scan(store, since, until))
+        print(f"  {label:<7} {n:>10,} rows  sqlite {sq * 1e3:9.1f} ms  segments {st * 1e3:8.2f} ms  "
+              f"({sq / st:6.1f}x)")
+
+
+def endpoints(store: SegmentStore) -> None:
+    cases = [
+        ("get_historical(1)", lambda: database.get_historical(1)),
+        ("get_historical(30, 2000, bucket)", lambda: database.get_historical(30, 2000, "bucket")),
+        ("export_csv_chunks(1)", lambda: sum(len(c) for c in database.export_csv_chunks(1))),
+    ]
+    for label, fn in cases:
+        database.configure_segments(None)
+        sq = _best(fn, 2)
+        database.configure_segments(store)
+        st = _best(fn, 2)
+        database.configure_segments(None)
+        print(f"  {label:<33} sqlite {sq * 1e3:9.1f} ms  segments {st * 1e3:9.1f} ms  ({sq / st:5.1f}x)")
+
+
+def compaction(root: str, now_ms: int) -> None:
+    store = SegmentStore(os.path.join(root, "small"), flush_rows=10**9)
+    rng = np.random.default_rng(1)
+    ids = np.array([f"EQ-{i:05d}" for i in range(UNITS)], dtype=object)
+    for k in range(SMALL_SEGMENTS):
+        ts = now_ms - (SMALL_SEGMENTS - k) * 1000 + np.arange(1000)
+        store.append("readings", {"ts": ts, "equipment_id": ids[rng.integers(0, UNITS, 1000)],
+                                  **{c: rng.normal(size=1000) for c in SENSOR_COLUMNS}})
+        store.flush()
+    since = now_ms - SMALL_SEGMENTS * 1000
+    before = _best(lambda: store.scan("readings", since))
+    started = time.perf_counter()
+    merged = store.compact()
+    compact_s = time.perf_counter() - started
+    after = _best(lambda: store.scan("readings", since))
+    print(f"  {SMALL_SEGMENTS} x 1000-row segments: compaction {compact_s * 1e3:7.1f} ms ({merged} merged); "
+          f"full scan {before * 1e3:7.1f} ms -> {after * 1e3:6.2f} ms")
+
+
+def main() -> None:
+    root = tempfile.mkdtemp(prefix="bench_segments_", dir=WORKDIR)
+    try:
+        database.configure(os.path.join(root, "app.db"))
+        store = SegmentStore(os.path.join(root, "segments"), flush_rows=CHUNK)
+        now_ms = database.to_epoch_ms(datetime.now(timezone.utc))
+        print(f"{ROWS:,} readings, {UNITS:,} units over {DAYS} days")
+        print("Load:")
+        load(store, now_ms)
+        print("Scan to arrays (ending 3 days ago):")
+        scans(store, now_ms)
+        print("database.py entry points:")
+        endpoints(store)
+        print("Compaction:")
+        compaction(root, now_ms)
+    finally:
+        database.configure_segments(None)
+        database.close_connections()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
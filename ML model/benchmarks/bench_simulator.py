@@ -0,0 +1,65 @@
+"""
+Per-request synthetic data and long-history streaming: generate_data vs FleetSimulator.
+
+Compares regenerating a 20-point series per request (what the endpoints did)
+with advancing a FleetSimulator one tick, then streams BENCH_DAYS of 10-minute
+ticks for BENCH_UNITS units and reports throughput and peak traced memory.
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_simulator.py
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from predictive_model import generate_data  # noqa: E402
+from simulator import FleetSimulator  # noqa: E402
+
+
+N_UNITS = int(os.environ.get("BENCH_UNITS", "10000"))
+N_DAYS = float(os.environ.get("BENCH_DAYS", "30"))
+TICK_SECONDS = 600.0
+
+
+def _per_call(fn, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    print("per request")
+    gen = _per_call(lambda: generate_data(num_points=20, days=1), 200)
+    print(f"  generate_data(20 points)        {gen * 1e3:8.3f} ms")
+    for units in (15, 1_000, N_UNITS):
+        sim = FleetSimulator(n_units=units, random_state=0)
+        tick = _per_call(lambda: sim.advance(1), 200)
+        print(f"  FleetSimulator.advance(1) {units:>7,} units {tick * 1e3:8.3f} ms")
+
+    ticks = int(N_DAYS * 86400 / TICK_SECONDS)
+    rows = ticks * N_UNITS
+    sim = FleetSimulator(n_units=N_UNITS, tick_seconds=TICK_SECONDS, start=0, random_state=0)
+    tracemalloc.start()
+    start = time.perf_counter()
+    checksum = 0.0
+    for chunk in sim.iter_history(ticks, chunk_ticks=max(1, 1_000_000 // N_UNITS)):
+        checksum += float(chunk["temperature"].sum())
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"history: {N_DAYS:g} days x {N_UNITS:,} units = {rows:,} readings")
+    print(f"  {elapsed:.1f} s, {rows / elapsed / 1e6:.1f} M readings/s, peak {peak / 2**20:.0f} MiB "
+          f"(full series would be {rows * 4 * 8 / 2**20:,.0f} MiB of sensor values)")
+    print(f"  a year would take ~{elapsed * 365 / N_DAYS / 60:.1f} min at this rate")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Live dashboard stream: /api/stream fan-out to many concurrent subscribers.
+
+Serves the app on a threaded werkzeug server in this process and opens raw
+HTTP/1.0 subscribers from a separate client process (one selector loop),
+so client parsing does not compete with the server for the GIL.
+
+  - fan-out   BENCH_SUBSCRIBERS (default 1000) readers on the default
+              15-unit fleet, ticking every BENCH_TICK_SECONDS for
+              BENCH_TICKS ticks; reports how many readers got every tick,
+              publish-to-client delay, the feed's per-tick compute and
+              fan-out time, and server RSS and thread count
+  - slow      BENCH_SLOW clients that never read, next to BENCH_FAST
+              readers, on a BENCH_SLOW_UNITS-unit fleet (large enough
+              frames to fill the socket buffers); the slow clients should
+              be dropped after LIVE_MAX_LAG_SECONDS while readers keep up
+
+Polling, for comparison, costs one simulation step, one scoring pass and
+one JSON encoding per dashboard per poll.
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_sse.py
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import re
+import selectors
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+SUBSCRIBERS = int(os.environ.get("BENCH_SUBSCRIBERS", "1000"))
+TICKS = int(os.environ.get("BENCH_TICKS", "10"))
+TICK_SECONDS = float(os.environ.get("BENCH_TICK_SECONDS", "1"))
+FAST = int(os.environ.get("BENCH_FAST", "20"))
+SLOW = int(os.environ.get("BENCH_SLOW", "20"))
+SLOW_UNITS = int(os.environ.get("BENCH_SLOW_UNITS", "2000"))
+MAX_LAG_SECONDS = 2.0
+
+_FRAME = re.compile(rb"id: (\d+)\nevent: ([\w-]+)\n")
+
+
+def _connect(port: int, slow: bool) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if slow:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.connect(("127.0.0.1", port))
+    sock.sendall(b"GET /api/stream HTTP/1.0\r\nHost: bench\r\n\r\n")
+    sock.setblocking(False)
+    return sock
+
+
+def _clients(port: int, readers: int, slow: int, seconds: float, queue) -> None:
+    """Client process: open all streams, read for ``seconds``, report arrival times per tick id."""
+    socks = []
+    for i in range(readers + slow):
+        socks.append(_connect(port, slow=i >= readers))
+        if i % 100 == 99:
+            time.sleep(0.05)  # stay inside the server's listen backlog
+    queue.put(("connected", time.monotonic()))
+
+    sel = selectors.DefaultSelector()
+    buffers = {}
+    arrivals = {}
+    closed = 0
+    for k, sock in enumerate(socks[:readers]):
+        sel.register(sock, selectors.EVENT_READ, k)
+        buffers[k] = b""
+        arrivals[k] = {}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for key, _ in sel.select(timeout=0.1):
+            k = key.data
+            try:
+                data = key.fileobj.recv(1 << 20)
+            except BlockingIOError:
+                continue
+            now = time.monotonic()
+            if not data:
+                sel.unregister(key.fileobj)
+                closed += 1
+                continue
+            buf = buffers[k] + data
+            end = buf.rfind(b"\n\n")
+            if end >= 0:
+                for match in _FRAME.finditer(buf, 0, end + 2):
+                    arrivals[k].setdefault(int(match.group(1)), now)
+                buf = buf[end + 2:]
+            buffers[k] = buf
+    # Slow clients that the server closed read EOF here
+    slow_closed = 0
+    for sock in socks[readers:]:
+        try:
+            sock.setblocking(True)
+            sock.settimeout(0.5)
+            while sock.recv(1 << 20):
+                pass
+            slow_closed += 1
+        except OSError:
+            pass
+    for sock in socks:
+        sock.close()
+    queue.put(("done", {"arrivals": arrivals, "closed": closed, "slow_closed": slow_closed}))
+
+
+def _rss_mib() -> float:
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _phase(units: int, readers: int, slow: int, ticks: int, tick_seconds: float) -> dict:
+    import app as app_module
+    from werkzeug.serving import make_server
+
+    os.environ.update({
+        "SIM_UNITS": str(units),
+        "LIVE_TICK_SECONDS": str(tick_seconds),
+        "LIVE_MAX_LAG_SECONDS": str(MAX_LAG_SECONDS),
+        "LIVE_MAX_SUBSCRIBERS": str(readers + slow + 10),
+    })
+    flask_app = app_module.create_app()
+    feed = flask_app.config["LIVE_FEED"]
+    published = {}
+    publish = feed.publish
+
+    def timed_publish(events):
+        published[feed._event_id + 1] = time.monotonic()
+        publish(events)
+
+    feed.publish = timed_publish
+    feed.compute_seconds = []
+    compute = feed.compute
+    fanout = []
+
+    def timed_compute():
+        if feed.last_fanout_seconds:
+            fanout.append(feed.last_fanout_seconds)
+        started = time.perf_counter()
+        events = compute()
+        feed.compute_seconds.append(time.perf_counter() - started)
+        return events
+
+    feed.compute = timed_compute
+
+    server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    rss_before = _rss_mib()
+
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    seconds = ticks * tick_seconds + 2.0
+    proc = ctx.Process(target=_clients, args=(server.server_port, readers, slow, seconds, queue))
+    proc.start()
+    _, connected_at = queue.get()
+    peak_rss, peak_threads, peak_subscribers = rss_before, 0, 0
+    while True:
+        try:
+            kind, result = queue.get(timeout=0.2)
+            break
+        except Exception:
+            peak_rss = max(peak_rss, _rss_mib())
+            peak_threads = max(peak_threads, threading.active_count())
+            peak_subscribers = max(peak_subscribers, feed.stats()["subscribers"])
+    proc.join()
+    stats = feed.stats()
+    feed.stop()
+    server.shutdown()
+
+    # Ticks published after every reader had connected and before they stopped reading
+    last = connected_at + seconds - 1.0
+    ids = sorted(i for i, t in published.items() if connected_at + tick_seconds < t < last)
+    arrivals = result["arrivals"]
+    delays = [arrivals[k][i] - published[i] for k in arrivals for i in ids if i in arrivals[k]]
+    complete = sum(all(i in arrivals[k] for k in arrivals) for i in ids)
+    return {
+        "ids": len(ids),
+        "complete": complete,
+        "delays_ms": np.asarray(delays) * 1e3,
+        "compute_ms": np.asarray(feed.compute_seconds) * 1e3,
+        "fanout_ms": np.asarray(fanout or [0.0]) * 1e3,
+        "rss_before": rss_before,
+        "peak_rss": peak_rss,
+        "peak_threads": peak_threads,
+        "peak_subscribers": peak_subscribers,
+        "stats": stats,
+        "reader_eof": result["closed"],
+        "slow_closed": result["slow_closed"],
+    }
+
+
+def _report(name: str, out: dict, readers: int) -> None:
+    d = out["delays_ms"]
+    print(f"{name}: {out['peak_subscribers']} subscribers, {out['peak_threads']} threads, "
+          f"RSS {out['rss_before']:.0f} -> {out['peak_rss']:.0f} MiB")
+    print(f"  ticks with all {readers} readers served: {out['complete']}/{out['ids']}   "
+          f"reader streams closed by server: {out['reader_eof']}")
+    if len(d):
+        print(f"  publish -> client  p50 {np.percentile(d, 50):7.1f} ms  p99 {np.percentile(d, 99):7.1f} ms  "
+              f"max {d.max():7.1f} ms")
+    print(f"  per tick: compute p50 {np.percentile(out['compute_ms'], 50):6.1f} ms, "
+          f"fan-out p50 {np.percentile(out['fanout_ms'], 50):6.2f} ms  "
+          f"(frames {out['stats']['frames_published']:,}, coalesced {out['stats']['coalesced']}, "
+          f"dropped {out['stats']['dropped']})")
+
+
+def main() -> None:
+    workdir = tempfile.mkdtemp(prefix="bench_sse_")
+    cwd = os.getcwd()
+    os.environ.update({"MODEL_LOAD": "eager", "INGEST_ASYNC": "0", "RETENTION_ENABLED": "0", "SIM_SEED": "0"})
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    try:
+        os.chdir(workdir)
+        out = _phase(15, SUBSCRIBERS, 0, TICKS, TICK_SECONDS)
+        _report("fan-out", out, SUBSCRIBERS)
+        out = _phase(SLOW_UNITS, FAST, SLOW, max(TICKS, 12), TICK_SECONDS)
+        _report(f"slow ({SLOW} non-reading clients, {SLOW_UNITS} units)", out, FAST)
+        print(f"  slow clients disconnected by the server: {out['slow_closed']}/{SLOW}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
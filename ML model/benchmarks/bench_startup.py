@@ -0,0 +1,108 @@
+"""
+Cold start and per-worker memory for the ML model app.
+
+Starts BENCH_WORKERS app processes side by side (as gunicorn workers would)
+and reports, for each MODEL_LOAD / MODEL_MMAP combination, the time until
+create_app() returns, the time until the model is ready, and the worker's
+RSS, PSS (shared pages split between workers) and private memory.
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_startup.py
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from predictive_model import generate_data, train_model  # noqa: E402
+
+
+N_ROWS = int(os.environ.get("BENCH_ROWS", "50000"))
+N_WORKERS = int(os.environ.get("BENCH_WORKERS", "2"))
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CONFIGS = [
+    ("eager, copied", {"MODEL_LOAD": "eager", "MODEL_MMAP": "0"}),
+    ("background, mmap", {"MODEL_LOAD": "background", "MODEL_MMAP": "1"}),
+]
+
+WORKER = r"""
+import json, sys, time
+start = time.perf_counter()
+import app
+flask_app = app.create_app()
+serving = time.perf_counter() - start
+loader = flask_app.config["MODEL_LOADER"]
+loader.get(600)
+ready = time.perf_counter() - start
+flask_app.test_client().get("/api/predictions")
+print("ready", flush=True)
+sys.stdin.readline()
+mem = {}
+with open("/proc/self/smaps_rollup") as fh:
+    for line in fh:
+        key, _, rest = line.partition(":")
+        if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+            mem[key] = int(rest.split()[0]) / 1024
+print(json.dumps({"serving": serving, "ready": ready, **mem}), flush=True)
+"""
+
+
+def _run_workers(workdir: str, extra_env: dict) -> list:
+    env = dict(os.environ, PYTHONPATH=APP_DIR, INGEST_ASYNC="0", RETENTION_ENABLED="0", **extra_env)
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER], cwd=workdir, env=env, text=True,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+        for _ in range(N_WORKERS)
+    ]
+    # Measure memory only once every worker holds its model
+    for proc in procs:
+        proc.stdout.readline()
+    results = []
+    for proc in procs:
+        proc.stdin.write("\n")
+        proc.stdin.flush()
+        results.append(json.loads(proc.stdout.readline()))
+        proc.wait()
+    return results
+
+
+def _report(label: str, results: list) -> None:
+    n = len(results)
+    avg = {k: sum(r[k] for r in results) / n for k in results[0]}
+    private = avg["Private_Clean"] + avg["Private_Dirty"]
+    print(f"{label:<28} serving {avg['serving']:6.2f} s  ready {avg['ready']:6.2f} s  "
+          f"RSS {avg['Rss']:6.1f} MiB  PSS {avg['Pss']:6.1f} MiB  private {private:6.1f} MiB")
+
+
+def main() -> None:
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise SystemExit("needs Linux /proc/self/smaps_rollup")
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    model_path = os.path.join(workdir, "data", "model.pkl")
+    try:
+        print(f"{N_WORKERS} workers, model trained on {N_ROWS:,} rows")
+        for label, env in CONFIGS:
+            if os.path.exists(model_path):
+                os.remove(model_path)
+            _report(f"{label} (train)", _run_workers(workdir, env))
+
+        train_model(df=generate_data(num_points=N_ROWS), save_path=model_path)
+        print(f"artifact {os.path.getsize(model_path) / 2**20:.1f} MiB")
+        for label, env in CONFIGS:
+            _report(f"{label} (load)", _run_workers(workdir, env))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
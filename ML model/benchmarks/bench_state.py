@@ -0,0 +1,93 @@
+"""
+Memory and latency of FleetState for 100k units versus a dict-of-dicts
+holding the same latest-state fields.
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_state.py
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from state import FleetState  # noqa: E402
+
+
+N_UNITS = 100_000
+
+
+def _records(rng):
+    now = datetime.now(timezone.utc).isoformat()
+    vals = rng.normal(size=(N_UNITS, 5))
+    return [
+        {
+            "timestamp": now,
+            "equipment_id": f"EQ-{i:06d}",
+            "temperature": 60 + vals[i, 0],
+            "vibration": 2 + vals[i, 1],
+            "pressure": 12 + vals[i, 2],
+            "current": 110 + vals[i, 3],
+            "failure_probability": abs(vals[i, 4]) % 1.0,
+            "health_score": 100 * (1 - abs(vals[i, 4]) % 1.0),
+        }
+        for i in range(N_UNITS)
+    ]
+
+
+def main() -> None:
+    records = _records(np.random.default_rng(0))
+
+    start = time.perf_counter()
+    FleetState().update_predictions(records)
+    update_s = time.perf_counter() - start
+
+    tracemalloc.start()
+    state = FleetState()
+    state.update_predictions(records)
+    state_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    plain = {}
+    for r in records:
+        plain[r["equipment_id"]] = {
+            "reading_ts": r["timestamp"], "prediction_ts": r["timestamp"],
+            "temperature": r["temperature"], "vibration": r["vibration"],
+            "pressure": r["pressure"], "current": r["current"],
+            "failure_probability": r["failure_probability"], "health_score": r["health_score"],
+            "status": "healthy",
+        }
+    dict_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    counts = state.counts()
+    counts_s = time.perf_counter() - start
+    start = time.perf_counter()
+    snap = state.snapshot()
+    snap_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(10_000):
+        state.get(f"EQ-{i:06d}")
+    get_us = (time.perf_counter() - start) / 10_000 * 1e6
+
+    print(f"{N_UNITS:,} units")
+    print(f"FleetState      {state_bytes / 2**20:7.1f} MiB ({state_bytes / N_UNITS:.0f} B/unit), "
+          f"arrays+index {state.memory_bytes() / 2**20:.1f} MiB")
+    print(f"dict-of-dicts   {dict_bytes / 2**20:7.1f} MiB ({dict_bytes / N_UNITS:.0f} B/unit)")
+    print(f"update 100k predictions {update_s * 1e3:8.1f} ms")
+    print(f"counts()                {counts_s * 1e3:8.3f} ms  {counts}")
+    print(f"snapshot() {len(snap):,} rows  {snap_s * 1e3:8.1f} ms")
+    print(f"get(one unit)           {get_us:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
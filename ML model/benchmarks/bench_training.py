@@ -0,0 +1,149 @@
+"""
+Out-of-core training from SQLite history: wall time and peak memory.
+
+Writes BENCH_ROWS readings (default 10M) from a FleetSimulator fleet of
+BENCH_UNITS units into a fresh database, with a "failure" maintenance
+record at the start of every simulated anomaly episode. Each measurement
+runs in its own process and reports that process's peak RSS:
+
+  - in-memory    pandas.read_sql of the first BENCH_BASELINE_ROWS readings,
+                 what train_model needs before it can start (no fit)
+  - sample       sample_history alone: stream, label and sample every row
+  - train        train_from_history over all rows, BENCH_SAMPLE rows per
+                 class, BENCH_TREES trees
+  - windowed     the same over the last 7 days with a 2-day half-life
+  - update       update_from_history adds BENCH_TREES // 2 trees for the
+                 second half of the history to a model of the first half
+                 (trained in a separate, unmeasured process)
+
+Peak RSS includes the interpreter with pandas and sklearn imported
+(about 250 MiB) and SQLite's page cache and memory map.
+
+Run from the "ML model" directory:
+
+    python benchmarks/bench_training.py
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database  # noqa: E402
+from simulator import FleetSimulator, reading_rows  # noqa: E402
+
+
+ROWS = int(os.environ.get("BENCH_ROWS", "10000000"))
+UNITS = int(os.environ.get("BENCH_UNITS", "1000"))
+SAMPLE = int(os.environ.get("BENCH_SAMPLE", "100000"))
+TREES = int(os.environ.get("BENCH_TREES", "50"))
+BASELINE_ROWS = int(os.environ.get("BENCH_BASELINE_ROWS", "2000000"))
+HORIZON_HOURS = 2.0
+TICK_SECONDS = 600.0
+
+
+def _build_db(path: str) -> tuple:
+    database.configure(path)
+    database.init_db()
+    ticks = ROWS // UNITS
+    end_ms = int(time.time() * 1000) - int(HORIZON_HOURS * 3_600_000)
+    sim = FleetSimulator(
+        n_units=UNITS, tick_seconds=TICK_SECONDS, start=end_ms - ticks * TICK_SECONDS * 1000, random_state=0
+    )
+    ids = np.asarray(sim.equipment_ids)
+    previous = np.zeros(UNITS, dtype=bool)
+    failures = 0
+    for chunk in sim.iter_history(ticks, chunk_ticks=max(1, 100_000 // UNITS)):
+        anomaly = chunk["anomaly"]
+        onset = anomaly & ~np.vstack([previous[None], anomaly[:-1]])
+        previous = anomaly[-1]
+        k, u = np.nonzero(onset)
+        events = [(int(t), eid, "failure") for t, eid in zip(chunk["timestamp"][k].astype(np.int64), ids[u])]
+        failures += len(events)
+        with database.get_conn() as conn:
+            database.write_readings(conn, reading_rows(chunk, sim.equipment_ids))
+            database.write_maintenance(conn, events)
+    database.close_connections()
+    return ticks * UNITS, failures, end_ms
+
+
+def _child(task: str, db: str, workdir: str, end_ms: int, queue) -> None:
+    database.configure(db)
+    started = time.perf_counter()
+    out: dict = {}
+    if task == "in-memory":
+        import pandas as pd
+
+        with database.get_conn() as conn:
+            frame = pd.read_sql(f"SELECT * FROM sensor_readings LIMIT {BASELINE_ROWS}", conn)
+        out["rows"] = len(frame)
+    else:
+        from training import sample_history, train_from_history, update_from_history
+
+        common = {"horizon_hours": HORIZON_HOURS, "max_rows_per_class": SAMPLE, "until_ms": end_ms}
+        half_ms = int(end_ms - (ROWS // UNITS) * TICK_SECONDS * 1000 / 2)
+        model = os.path.join(workdir, "update.pkl" if task in ("first-half", "update") else f"{task}.pkl")
+        if task == "sample":
+            _, _, out = sample_history(**common)
+        elif task == "train":
+            out = train_from_history(model, n_estimators=TREES, **common).training
+        elif task == "windowed":
+            out = train_from_history(
+                model, n_estimators=TREES, since_ms=end_ms - 7 * 86_400_000, half_life_days=2.0, **common
+            ).training
+        elif task == "first-half":
+            out = train_from_history(model, n_estimators=TREES, **dict(common, until_ms=half_ms)).training
+        else:
+            out = update_from_history(model, add_estimators=TREES // 2, **common).training
+        out["model_mib"] = os.path.getsize(model) / 2**20 if os.path.exists(model) else 0.0
+    out["wall"] = time.perf_counter() - started
+    out["peak_rss_mib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put(out)
+
+
+def _run(task: str, db: str, workdir: str, end_ms: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(task, db, workdir, end_ms, queue))
+    proc.start()
+    out = queue.get()
+    proc.join()
+    return out
+
+
+def main() -> None:
+    workdir = tempfile.mkdtemp(prefix="bench_training_")
+    try:
+        db = os.path.join(workdir, "history.db")
+        started = time.perf_counter()
+        rows, failures, end_ms = _build_db(db)
+        size = sum(os.path.getsize(db + s) for s in ("", "-wal") if os.path.exists(db + s))
+        print(f"{rows:,} readings, {failures:,} failure records, {size / 2**30:.2f} GiB "
+              f"(built in {time.perf_counter() - started:.0f} s)")
+        for task in ("in-memory", "sample", "train", "windowed", "first-half", "update"):
+            out = _run(task, db, workdir, end_ms)
+            if task == "first-half":
+                continue
+            line = f"  {task:<10} {out.get('rows_seen', out.get('rows', 0)):>11,} rows  {out['wall']:7.1f} s"
+            line += f"  peak RSS {out['peak_rss_mib']:6.0f} MiB"
+            if task != "in-memory":
+                line += (f"  stream {out['stream_seconds']:5.1f} s  sampled {out['rows_sampled']:,} "
+                         f"({out['positives_sampled']:,} of {out['positives_seen']:,} positives)")
+            if "fit_seconds" in out:
+                line += (f"  fit {out['fit_seconds']:.1f} s, {out['n_estimators']} trees, "
+                         f"artifact {out['model_mib']:.0f} MiB")
+            print(line, flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Parametrized microbenchmarks for the model, data generator and database layers.
+
+Each benchmark is timed over repeated runs (at least ``min_repeat`` runs and
+``min_time`` seconds) and then run once more under tracemalloc for peak
+memory. Results are written as JSON, one file per run, so two commits can
+be compared:
+
+    python benchmarks/suite.py                      # quick profile, < 1 minute
+    python benchmarks/suite.py --profile full       # 1 to 1M rows, DBs up to 10M rows
+    python benchmarks/suite.py -k predict           # only benchmarks matching "predict"
+    python benchmarks/suite.py --compare old.json new.json
+
+Run from the "ML model" directory. Results go to benchmarks/results/ unless
+--output is given. Peak memory covers Python and NumPy allocations, not
+SQLite's page cache.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database  # noqa: E402
+from predictive_model import (  # noqa: E402
+    FEATURE_COLUMNS,
+    generate_data,
+    predict_failure,
+    predict_failure_arrays,
+    train_model,
+)
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+REGRESSION_RATIO = 1.10
+
+# A benchmark's setup takes its parameters and returns (run, items per run)
+Setup = Callable[..., Tuple[Callable[[], Any], int]]
+BENCHMARKS: List[Tuple[str, Dict[str, Dict[str, list]], Setup]] = []
+
+
+def benchmark(name: str, quick: Dict[str, list], full: Dict[str, list]):
+    """Register a setup function with a parameter grid per profile."""
+    def register(setup: Setup) -> Setup:
+        BENCHMARKS.append((name, {"quick": quick, "full": full}, setup))
+        return setup
+    return register
+
+
+class _Context:
+    """Models and databases shared between benchmarks of one run."""
+
+    def __init__(self) -> None:
+        self.workdir = tempfile.mkdtemp(prefix="bench_suite_")
+        self._models: Dict[int, Any] = {}
+        self._dbs: Dict[int, str] = {}
+
+    def model(self, n_estimators: int):
+        if n_estimators not in self._models:
+            path = os.path.join(self.workdir, f"model_{n_estimators}.pkl")
+            self._models[n_estimators] = train_model(save_path=path, n_estimators=n_estimators)
+        return self._models[n_estimators]
+
+    def features(self, rows: int) -> np.ndarray:
+        rng = np.random.default_rng(rows)
+        centre = np.array([60.0, 2.0, 12.0, 110.0])
+        scale = np.array([6.0, 0.8, 1.2, 10.0])
+        return (centre + scale * rng.standard_normal((rows, len(FEATURE_COLUMNS)))).astype(np.float32)
+
+    def history_db(self, rows: int) -> str:
+        """A database with ``rows`` readings over the last 30 days for 100 units."""
+        if rows not in self._dbs:
+            path = os.path.join(self.workdir, f"history_{rows}.db")
+            database.configure(path)
+            database.init_db()
+            end_ms = int(time.time() * 1000)
+            step = 30 * 86_400_000 / rows
+            chunk = 200_000
+            for start in range(0, rows, chunk):
+                stop = min(rows, start + chunk)
+                idx = np.arange(start, stop)
+                ts = (end_ms - 30 * 86_400_000 + idx * step).astype(np.int64).tolist()
+                values = self.features(stop - start).astype(np.float64).tolist()
+                units = [f"EQ-{i % 100:03d}" for i in range(start, stop)]
+                with database.get_conn() as conn:
+                    database.write_readings(conn, [(t, *v, u) for t, v, u in zip(ts, values, units)])
+            self._dbs[rows] = path
+        database.configure(self._dbs[rows])
+        return self._dbs[rows]
+
+    def fresh_db(self, name: str) -> str:
+        path = os.path.join(self.workdir, f"{name}.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        database.configure(path)
+        database.init_db()
+        return path
+
+    def close(self) -> None:
+        database.close_connections()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+CTX: _Context | None = None
+
+
+@benchmark(
+    "predict_failure",
+    quick={"n_estimators": [50], "rows": [1, 1_000, 100_000]},
+    full={"n_estimators": [50, 200], "rows": [1, 100, 10_000, 100_000, 1_000_000]},
+)
+def _predict_failure(n_estimators: int, rows: int):
+    model, X = CTX.model(n_estimators), CTX.features(rows)
+    import pandas as pd
+
+    frame = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+    return (lambda: predict_failure(model, frame)), rows
+
+
+@benchmark(
+    "predict_failure_arrays",
+    quick={"n_estimators": [50], "rows": [1, 1_000]},
+    full={"n_estimators": [50, 200], "rows": [1, 100, 10_000, 1_000_000]},
+)
+def _predict_failure_arrays(n_estimators: int, rows: int):
+    model, X = CTX.model(n_estimators), CTX.features(rows)
+    return (lambda: predict_failure_arrays(model, X)), rows
+
+
+@benchmark(
+    "generate_data",
+    quick={"rows": [1_000, 100_000]},
+    full={"rows": [1_000, 100_000, 1_000_000]},
+)
+def _generate_data(rows: int):
+    return (lambda: generate_data(num_points=rows)), rows
+
+
+@benchmark(
+    "train_model",
+    quick={"rows": [2_000], "n_estimators": [50]},
+    full={"rows": [10_000, 100_000], "n_estimators": [50, 200]},
+)
+def _train_model(rows: int, n_estimators: int):
+    df = generate_data(num_points=rows)
+    path = os.path.join(CTX.workdir, "train.pkl")
+    return (lambda: train_model(df=df, save_path=path, n_estimators=n_estimators)), rows
+
+
+@benchmark(
+    "insert_predictions",
+    quick={"rows": [1_000]},
+    full={"rows": [1_000, 100_000]},
+)
+def _insert_predictions(rows: int):
+    CTX.fresh_db("insert")
+    X = CTX.features(rows).astype(np.float64)
+    now = datetime.now(timezone.utc).isoformat()
+    records = [
+        {
+            "equipment_id": f"EQ-{i % 100:03d}",
+            "timestamp": now,
+            "temperature": x[0],
+            "vibration": x[1],
+            "pressure": x[2],
+            "current": x[3],
+            "failure_probability": 0.1,
+            "health_score": 90.0,
+        }
+        for i, x in enumerate(X.tolist())
+    ]
+    return (lambda: database.insert_predictions(records)), rows
+
+
+@benchmark(
+    "get_historical",
+    quick={"db_rows": [10_000, 100_000], "max_points": [2_000]},
+    full={"db_rows": [10_000, 100_000, 1_000_000, 10_000_000], "max_points": [2_000]},
+)
+def _get_historical(db_rows: int, max_points: int):
+    CTX.history_db(db_rows)
+    # Last 7 of 30 days: roughly a quarter of the rows are in the window
+    return (lambda: database.get_historical(7, max_points=max_points)), db_rows * 7 // 30
+
+
+def _measure(run: Callable[[], Any], min_repeat: int, min_time: float, max_repeat: int) -> List[float]:
+    times: List[float] = []
+    started = time.perf_counter()
+    while len(times) < max_repeat and (len(times) < min_repeat or time.perf_counter() - started < min_time):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _peak_mib(run: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2**20
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(profile: str, pattern: str | None) -> Dict[str, Any]:
+    global CTX
+    repeat = {"quick": (3, 0.2, 20), "full": (5, 1.0, 200)}[profile]
+    results: List[Dict[str, Any]] = []
+    CTX = _Context()
+    try:
+        for name, grids, setup in BENCHMARKS:
+            if pattern and pattern not in name:
+                continue
+            grid = grids[profile]
+            keys = list(grid)
+            for values in itertools.product(*(grid[k] for k in keys)):
+                params = dict(zip(keys, values))
+                run, items = setup(**params)
+                run()  # warm-up: imports, caches, lazily built state
+                times = _measure(run, *repeat)
+                median = statistics.median(times)
+                entry = {
+                    "name": name,
+                    "params": params,
+                    "items": items,
+                    "repeat": len(times),
+                    "wall_min": min(times),
+                    "wall_median": median,
+                    "throughput": items / median if median > 0 else None,
+                    "peak_mib": round(_peak_mib(run), 2),
+                }
+                results.append(entry)
+                _print_entry(entry)
+    finally:
+        CTX.close()
+        CTX = None
+    return {
+        "commit": _git_commit(),
+        "profile": profile,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+
+
+def _label(entry: Dict[str, Any]) -> str:
+    params = ",".join(f"{k}={v}" for k, v in entry["params"].items())
+    return f"{entry['name']}[{params}]"
+
+
+def _print_entry(entry: Dict[str, Any]) -> None:
+    print(f"{_label(entry):<58} {entry['wall_median'] * 1e3:11.3f} ms  "
+          f"{entry['throughput']:14,.0f} rows/s  {entry['peak_mib']:8.1f} MiB  x{entry['repeat']}", flush=True)
+
+
+def compare(old_path: str, new_path: str) -> int:
+    """Print the median-time ratio per benchmark; returns 1 if any regressed past REGRESSION_RATIO."""
+    with open(old_path) as fh:
+        old = {_label(e): e for e in json.load(fh)["results"]}
+    with open(new_path) as fh:
+        new = json.load(fh)["results"]
+    regressed = 0
+    for entry in new:
+        label = _label(entry)
+        if label not in old:
+            print(f"{label:<58} (new)")
+            continue
+        ratio = entry["wall_median"] / old[label]["wall_median"]
+        flag = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+        regressed |= bool(flag)
+        print(f"{label:<58} {old[label]['wall_median'] * 1e3:11.3f} -> {entry['wall_median'] * 1e3:11.3f} ms"
+              f"  x{ratio:5.2f}{flag}")
+    return int(regressed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profile", choices=("quick", "full"), default="quick")
+    parser.add_argument("-k", dest="pattern", help="only run benchmarks whose name contains this")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/<commit>-<profile>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare))
+
+    started = time.perf_counter()
+    report = run_suite(args.profile, args.pattern)
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}-{args.profile}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"{len(report['results'])} results in {time.perf_counter() - started:.1f} s -> {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from model_selection import measure_latency
+from predictive_model import (
+    CompiledForest,
+    TrainedModel,
+    generate_data,
+    load_trained_model,
+    predict_failure_arrays,
+    save_trained_model,
+    validation_scores,
+    variants_path,
+)
+
+
+# Trees kept by the pruned variants and the depth they are cut at
+DEFAULT_TREES = 32
+DEFAULT_MAX_DEPTH = 8
+
+STUDENTS = ("hist_gradient_boosting", "logistic")
+
+# Synthetic rows compaction draws when not given data (a different seed from
+# train_model's, so none of them were seen in training)
+DEFAULT_ROWS = 5000
+
+
+def node_depths(compiled: CompiledForest) -> np.ndarray:
+    """Depth of every node of a compiled forest (roots are 0, unreachable nodes -1)."""
+    depth = np.full(compiled.n_nodes, -1, dtype=np.intp)
+    frontier = np.asarray(compiled.roots, dtype=np.intp)
+    level = 0
+    while frontier.size:
+        depth[frontier] = level
+        children = np.asarray(compiled.children[frontier], dtype=np.intp)
+        # Leaves point to themselves
+        frontier = children[children[:, 0] != frontier].ravel()
+        level += 1
+    return depth
+
+
+def _subset(compiled: CompiledForest, keep: np.ndarray) -> CompiledForest:
+    # The nodes in ``keep`` (closed under parent links), renumbered in order;
+    # trees whose root is dropped are dropped
+    index = np.cumsum(keep) - 1
+    out = CompiledForest(
+        feature=np.ascontiguousarray(compiled.feature[keep]),
+        threshold=np.ascontiguousarray(compiled.threshold[keep]),
+        children=np.ascontiguousarray(index[compiled.children[keep]], dtype=compiled.children.dtype),
+        value=np.ascontiguousarray(compiled.value[keep]),
+        roots=np.asarray(index[compiled.roots[keep[compiled.roots]]], dtype=compiled.roots.dtype),
+        depth=compiled.depth,
+    )
+    out.depth = int(node_depths(out).max(initial=0))
+    return out
+
+
+def float32_thresholds(compiled: CompiledForest) -> CompiledForest:
+    """
+    The forest with float32 thresholds, compared with float32 inputs without
+    converting them. Each threshold is rounded down to the largest float32
+    not above it, so every row takes exactly the branches it takes against
+    the float64 threshold. Indices and values stay as they are: NumPy
+    converts narrower index types on every gather, which costs more than
+    the smaller arrays save.
+    """
+    threshold = np.asarray(compiled.threshold, dtype=np.float64)
+    rounded = threshold.astype(np.float32)
+    above = rounded.astype(np.float64) > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return CompiledForest(
+        feature=np.ascontiguousarray(compiled.feature),
+        threshold=np.ascontiguousarray(rounded),
+        children=np.ascontiguousarray(compiled.children),
+        value=np.ascontiguousarray(compiled.value),
+        roots=np.asarray(compiled.roots),
+        depth=compiled.depth,
+    )
+
+
+def cap_depth(compiled: CompiledForest, max_depth: int, X: np.ndarray | None = None) -> CompiledForest:
+    """
+    Cut every tree at ``max_depth``; nodes at that depth become leaves and
+    everything below them is dropped. A new leaf predicts its own class
+    fraction, which compile_forest keeps for every node, or with X the
+    average the uncut tree gives the rows of X that reach it. The class
+    fraction is class-weighted (class_weight="balanced_subsample") and so
+    overstates failures far more than the pure leaves below it do.
+    """
+    depth = node_depths(compiled)
+    cut = np.flatnonzero(depth == max_depth)
+    feature, threshold, children = np.array(compiled.feature), np.array(compiled.threshold), np.array(compiled.children)
+    feature[cut] = 0
+    threshold[cut] = np.inf
+    children[cut] = cut[:, None]
+    value = np.array(compiled.value)
+    capped = CompiledForest(feature, threshold, children, value, compiled.roots, max(max_depth, 0))
+    if X is not None and len(X):
+        nodes = capped.apply(X).ravel()
+        full = compiled.tree_values(X).ravel()
+        reached = np.bincount(nodes, minlength=capped.n_nodes)
+        total = np.bincount(nodes, weights=full, minlength=capped.n_nodes)
+        calibrate = cut[reached[cut] > 0]
+        value[calibrate] = total[calibrate] / reached[calibrate]
+    return _subset(capped, (depth >= 0) & (depth <= max_depth))
+
+
+def prune_trees(
+    compiled: CompiledForest, X: np.ndarray, y: np.ndarray, n_trees: int
+) -> Tuple[CompiledForest, List[int]]:
+    """
+    Keep the ``n_trees`` trees that contribute most on (X, y), chosen
+    greedily: each step adds the tree whose average with those already
+    chosen has the lowest Brier score. Returns the pruned forest and the
+    indices of the kept trees. The Brier score moves with every tree, where
+    average precision only moves with trees that reorder the failures.
+    """
+    if n_trees >= compiled.n_trees:
+        return compiled, list(range(compiled.n_trees))
+    values = compiled.tree_values(X).astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)[:, None]
+    total = np.zeros((values.shape[0], 1))
+    available = np.ones(compiled.n_trees, dtype=bool)
+    kept: List[int] = []
+    for k in range(n_trees):
+        brier = (((total + values) / (k + 1) - y) ** 2).mean(axis=0)
+        brier[~available] = np.inf
+        best = int(np.argmin(brier))
+        kept.append(best)
+        available[best] = False
+        total[:, 0] += values[:, best]
+    kept.sort()
+    tree = np.searchsorted(compiled.roots, np.arange(compiled.n_nodes), side="right") - 1
+    return _subset(compiled, np.isin(tree, kept)), kept
+
+
+def distill(teacher: TrainedModel, X: pd.DataFrame, student: str = "hist_gradient_boosting", random_state: int = 42):
+    """
+    Fit a small ``student`` estimator to the teacher's failure probabilities
+    on X (a DataFrame in the teacher's feature columns). Each row is given
+    twice, as a failure weighted by the teacher's probability and as a
+    non-failure weighted by the rest, so the student fits the soft labels
+    by cross-entropy rather than the 0/1 outcomes.
+    """
+    soft, _ = predict_failure_arrays(teacher, X)
+    X_twice = pd.concat([X, X], ignore_index=True)
+    y_twice = np.r_[np.ones(len(X), dtype=np.int64), np.zeros(len(X), dtype=np.int64)]
+    weight = np.r_[soft, 1.0 - soft]
+    if student == "hist_gradient_boosting":
+        from sklearn.ensemble import HistGradientBoostingClassifier
+
+        est = HistGradientBoostingClassifier(
+            max_iter=50, max_leaf_nodes=15, learning_rate=0.1, random_state=random_state
+        )
+        return est.fit(X_twice, y_twice, sample_weight=weight)
+    if student == "logistic":
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import StandardScaler
+
+        est = make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000))
+        return est.fit(X_twice, y_twice, logisticregression__sample_weight=weight)
+    raise ValueError(f"Unknown student: {student}")
+
+
+def _variant_path(path: str, name: str) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}.{name}{ext}"
+
+
+def _measure(
+    path: str, X: pd.DataFrame, y: np.ndarray, reference: np.ndarray | None
+) -> Tuple[Dict[str, Any], np.ndarray]:
+    # Load time, latency and accuracy of the artifact at ``path`` as the app loads it
+    load_times = []
+    for _ in range(3):
+        started = time.perf_counter()
+        loaded = load_trained_model(path, mmap_mode="r")
+        load_times.append(time.perf_counter() - started)
+    prob, _ = predict_failure_arrays(loaded, X)
+    out = {
+        "file": os.path.basename(path),
+        "size_mib": round(os.path.getsize(path) / 2**20, 3),
+        "load_ms": round(statistics.median(load_times) * 1e3, 3),
+        **{k: round(v, 4) for k, v in measure_latency(loaded, X.to_numpy(dtype=np.float32)).items()},
+        "holdout": validation_scores(y, prob),
+    }
+    if reference is not None:
+        out["mean_abs_diff"] = float(np.abs(prob - reference).mean())
+    return out, prob
+
+
+def compact_model(
+    path: str = os.path.join("data", "model.pkl"),
+    df: pd.DataFrame | None = None,
+    n_trees: int = DEFAULT_TREES,
+    max_depth: int = DEFAULT_MAX_DEPTH,
+    students: Sequence[str] = STUDENTS,
+    holdout_fraction: float = 0.5,
+    rows: int = DEFAULT_ROWS,
+    random_state: int = 42,
+) -> Dict[str, Any]:
+    """
+    Build compact variants of the model saved at ``path`` and save each
+    next to it as ``model.<variant>.pkl``:
+
+      - float32        the compiled forest with float32 thresholds (same
+                       decisions)
+      - pruned         the ``n_trees`` trees that contribute most
+      - pruned_depth   the same selection from trees cut at ``max_depth``
+      - distilled_*    a small student fitted to the forest's probabilities
+
+    Forest variants keep only the compiled arrays, which the app maps
+    rather than unpickles; students keep their estimator. Trees are chosen
+    and students fitted on one part of ``df`` (``rows`` fresh synthetic rows
+    by default) and every artifact, the original included, is measured on the
+    other: size, load time, single-row p50/p99 latency on this host, and
+    holdout scores with their difference from the original. The report is
+    written as the manifest ``load_trained_model(latency_budget_ms=...)``
+    chooses from, and returned.
+    """
+    from sklearn.model_selection import train_test_split
+
+    base = load_trained_model(path)
+    if df is None:
+        df = generate_data(num_points=rows, random_state=random_state + 1)
+    if base.rolling and not set(base.feature_columns) <= set(df.columns):
+        from features import add_rolling_features
+
+        df = add_rolling_features(df, **base.rolling)
+    X = df[list(base.feature_columns)].astype(np.float32).reset_index(drop=True)
+    y = df["failure"].to_numpy(dtype=np.int64)
+    X_fit, X_hold, y_fit, y_hold = train_test_split(
+        X, y, test_size=holdout_fraction, stratify=y, random_state=random_state
+    )
+
+    started = time.perf_counter()
+    variants: List[Tuple[str, TrainedModel | None, Dict[str, Any]]] = []
+    if base.compiled is not None:
+        compact = float32_thresholds(base.compiled)
+        pruned, kept = prune_trees(compact, X_fit.to_numpy(), y_fit, n_trees)
+        capped = cap_depth(compact, max_depth, X_fit.to_numpy())
+        capped, capped_kept = prune_trees(capped, X_fit.to_numpy(), y_fit, n_trees)
+        variants += [
+            ("float32", compact, {"trees": compact.n_trees}),
+            ("pruned", pruned, {"trees": len(kept), "kept": kept}),
+            ("pruned_depth", capped, {"trees": len(capped_kept), "max_depth": max_depth, "kept": capped_kept}),
+        ]
+    for student in students:
+        variants.append((f"distilled_{student}", distill(base, X_fit, student, random_state), {"student": student}))
+    build_seconds = time.perf_counter() - started
+
+    full, reference = _measure(path, X_hold, y_hold, None)
+    entries = [{"name": "full", **full}]
+    for name, built, params in variants:
+        compiled = built if isinstance(built, CompiledForest) else None
+        trained = TrainedModel(
+            model=None if compiled is not None else built,
+            feature_columns=list(base.feature_columns),
+            compiled=compiled,
+            version=f"{base.version}+{name}",
+            training={**(base.training or {}), "compaction": {"variant": name, "source": base.version, **params}},
+            rolling=base.rolling,
+        )
+        variant_path = _variant_path(path, name)
+        save_trained_model(trained, variant_path)
+        measured, _ = _measure(variant_path, X_hold, y_hold, reference)
+        params = {k: v for k, v in params.items() if k != "kept"}
+        if compiled is not None:
+            params.update(nodes=compiled.n_nodes, depth=compiled.depth)
+        delta = {k: measured["holdout"][k] - full["holdout"][k] for k in full["holdout"]}
+        entries.append({"name": name, **measured, "delta": delta, "params": params})
+
+    st = os.stat(path)
+    manifest = {
+        "source": {"version": base.version, "mtime_ns": st.st_mtime_ns, "size": st.st_size},
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "fit_rows": int(len(y_fit)),
+        "holdout_rows": int(len(y_hold)),
+        "build_seconds": round(build_seconds, 3),
+        "variants": entries,
+    }
+    manifest_path = variants_path(path)
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build compact variants of a saved model and measure them.")
+    parser.add_argument("--model", default=os.path.join("data", "model.pkl"))
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="synthetic rows (ignored with --history)")
+    parser.add_argument("--history", action="store_true", help="sample the stored history instead (see training.py)")
+    parser.add_argument("--db", help="SQLite database for --history (default: data/app.db)")
+    parser.add_argument("--trees", type=int, default=DEFAULT_TREES, help="trees kept by the pruned variants")
+    parser.add_argument("--max-depth", type=int, default=DEFAULT_MAX_DEPTH)
+    parser.add_argument("--students", default=",".join(STUDENTS), help="comma-separated; empty for none")
+    args = parser.parse_args()
+
+    if args.history:
+        import database
+        from training import sample_history
+
+        if args.db:
+            database.configure(args.db)
+        base = load_trained_model(args.model, compile_trees=False)
+        X_hist, y_hist, _ = sample_history(rolling=base.rolling)
+        data = pd.DataFrame(X_hist, columns=base.feature_columns)
+        data["failure"] = y_hist
+    else:
+        data = None
+    result = compact_model(
+        args.model, data, n_trees=args.trees, max_depth=args.max_depth,
+        students=[s for s in args.students.split(",") if s], rows=args.rows,
+    )
+    print(f"{'variant':<32} {'MiB':>8} {'load ms':>8} {'p50 ms':>7} {'p99 ms':>7} {'AP':>6} {'dAP':>7} {'|dp|':>6}")
+    for v in result["variants"]:
+        print(f"{v['name']:<32} {v['size_mib']:8.3f} {v['load_ms']:8.2f} {v['p50_ms']:7.3f} {v['p99_ms']:7.3f} "
+              f"{v['holdout']['average_precision']:6.3f} {v.get('delta', {}).get('average_precision', 0.0):+7.3f} "
+              f"{v.get('mean_abs_diff', 0.0):6.3f}")
+    print(f"{len(result['variants']) - 1} variants built in {result['build_seconds']:.1f} s, "
+          f"measured on {result['holdout_rows']} holdout rows; manifest {variants_path(args.model)}")
@@ -1,155 +1,1250 @@
+import logging
 import os
 import sqlite3
+import threading
 from contextlib import contextmanager
-from datetime import datetime, timedelta
-from typing import Iterable, List, Tuple, Dict, Any
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, List, Tuple, Dict, Any
+
+import numpy as np
+
+from downsample import lttb_multi, split_points
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = os.path.join("data", "app.db")
 
+# Connection tuning; each can be overridden from the environment.
+SQLITE_PRAGMAS: Dict[str, Any] = {
+    # Must precede journal_mode: it only applies to a database with no pages
+    # yet, and lets retention hand freed pages back via incremental_vacuum.
+    "auto_vacuum": os.environ.get("SQLITE_AUTO_VACUUM", "INCREMENTAL"),
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": os.environ.get("SQLITE_TEMP_STORE", "MEMORY"),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+}
+STATEMENT_CACHE_SIZE = int(os.environ.get("SQLITE_STATEMENT_CACHE", "256"))
+
 
 def _ensure_dir(path: str) -> None:
     os.makedirs(os.path.dirname(path), exist_ok=True)
 
 
+class ConnectionManager:
+    """
+    Hands out one long-lived connection per thread (and per process, so
+    connections opened before a gunicorn fork are never shared).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        pragmas: Dict[str, Any] | None = None,
+        cached_statements: int = STATEMENT_CACHE_SIZE,
+    ) -> None:
+        self.path = path
+        self.pragmas = dict(SQLITE_PRAGMAS if pragmas is None else pragmas)
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conns: List[sqlite3.Connection] = []
+        self.opened = 0
+
+    def _open(self) -> sqlite3.Connection:
+        _ensure_dir(self.path)
+        conn = sqlite3.connect(
+            self.path,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        with self._lock:
+            self._conns.append(conn)
+            self.opened += 1
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "conn", None) is None or local.pid != os.getpid():
+            local.conn = self._open()
+            local.pid = os.getpid()
+        return local.conn
+
+    def close(self) -> None:
+        """Close every connection this manager opened in the current process."""
+        with self._lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+        self._local = threading.local()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"path": self.path, "open": len(self._conns), "opened_total": self.opened}
+
+
+_manager: ConnectionManager | None = None
+_manager_lock = threading.Lock()
+
+
+def get_manager() -> ConnectionManager:
+    global _manager
+    if _manager is None or _manager.path != DB_PATH:
+        with _manager_lock:
+            if _manager is None or _manager.path != DB_PATH:
+                if _manager is not None:
+                    _manager.close()
+                _manager = ConnectionManager(DB_PATH)
+    return _manager
+
+
+def configure(path: str | None = None, **pragmas: Any) -> ConnectionManager:
+    """Point the module at a database and/or override pragmas, reopening connections."""
+    global DB_PATH, _manager
+    with _manager_lock:
+        if path is not None:
+            DB_PATH = path
+        if _manager is not None:
+            _manager.close()
+        _manager = ConnectionManager(DB_PATH, {**SQLITE_PRAGMAS, **pragmas})
+    return _manager
+
+
+def close_connections() -> None:
+    if _manager is not None:
+        _manager.close()
+
+
+# Segment store appends made inside get_conn, applied once the transaction
+# commits (a rolled-back batch never reaches the store)
+_pending = threading.local()
+
+
 @contextmanager
 def get_conn():
-    _ensure_dir(DB_PATH)
-    conn = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-    conn.row_factory = sqlite3.Row
+    conn = get_manager().connection()
+    outer = getattr(_pending, "appends", None)
+    appends: List[Tuple[str, Dict[str, Any]]] = []
+    _pending.appends = appends
     try:
         yield conn
         conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
     finally:
-        conn.close()
+        _pending.appends = outer
+    _apply_segment_appends(appends)
 
 
-def init_db() -> None:
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS sensor_readings (
-              id INTEGER PRIMARY KEY AUTOINCREMENT,
-              ts TEXT NOT NULL,
-              temperature REAL,
-              vibration REAL,
-              pressure REAL,
-              current REAL
-            )
+# Schema version recorded in PRAGMA user_version. Version 1 is the original
+# layout with ISO TEXT timestamps and no indexes; version 3 adds rollups,
+# version 4 the alert transition log, version 5 the data version counter and
+# version 6 a unique key on alert transitions.
+SCHEMA_VERSION = 6
+
+SENSOR_COLUMNS = ["temperature", "vibration", "pressure", "current"]
+
+# Rollup resolutions and their bucket width in milliseconds
+ROLLUP_RESOLUTIONS: Dict[str, int] = {"hourly": 3_600_000, "daily": 86_400_000}
+
+_ROLLUP_VALUE_DDL = ",\n".join(
+    f"      {c}_sum REAL, {c}_min REAL, {c}_max REAL" for c in SENSOR_COLUMNS
+)
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS sensor_readings (
+      id INTEGER PRIMARY KEY,
+      equipment_id TEXT NOT NULL DEFAULT '',
+      ts INTEGER NOT NULL,  -- epoch milliseconds, UTC
+      temperature REAL,
+      vibration REAL,
+      pressure REAL,
+      current REAL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS predictions (
+      id INTEGER PRIMARY KEY,
+      ts INTEGER NOT NULL,  -- epoch milliseconds, UTC
+      equipment_id TEXT NOT NULL,
+      temperature REAL,
+      vibration REAL,
+      pressure REAL,
+      current REAL,
+      failure_probability REAL,
+      health_score REAL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS maintenance_records (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      equipment_id TEXT NOT NULL,
+      action TEXT NOT NULL,
+      notes TEXT,
+      ts INTEGER NOT NULL  -- epoch milliseconds, UTC
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_readings_ts ON sensor_readings (ts)",
+    "CREATE INDEX IF NOT EXISTS idx_readings_equipment_ts ON sensor_readings (equipment_id, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_predictions_ts ON predictions (ts)",
+    "CREATE INDEX IF NOT EXISTS idx_predictions_equipment_ts ON predictions (equipment_id, ts)",
+    """
+    CREATE TABLE IF NOT EXISTS alert_transitions (
+      id INTEGER PRIMARY KEY,
+      ts INTEGER NOT NULL,  -- epoch milliseconds, UTC
+      equipment_id TEXT NOT NULL,
+      rule TEXT NOT NULL,
+      severity TEXT NOT NULL,
+      state TEXT NOT NULL,  -- 'open' or 'closed'
+      value REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_maintenance_equipment_ts ON maintenance_records (equipment_id, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_alert_transitions_ts ON alert_transitions (ts)",
+    "CREATE INDEX IF NOT EXISTS idx_alert_transitions_equipment_rule ON alert_transitions (equipment_id, rule, id)",
+    # Workers sharing SIM_SEED record the same transition; the first insert wins
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_alert_transitions_unique "
+    "ON alert_transitions (equipment_id, rule, ts, state)",
+    # One row, bumped by every transaction that writes or deletes readings or
+    # predictions; response caches key on it (see get_data_version)
+    """
+    CREATE TABLE IF NOT EXISTS data_version (
+      id INTEGER PRIMARY KEY CHECK (id = 1),
+      version INTEGER NOT NULL,
+      updated_ms INTEGER NOT NULL  -- epoch milliseconds, UTC
+    )
+    """,
+    "INSERT OR IGNORE INTO data_version (id, version, updated_ms) VALUES (1, 0, "
+    "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))",
+]
+for _resolution in ROLLUP_RESOLUTIONS:
+    _SCHEMA += [
+        f"""
+    CREATE TABLE IF NOT EXISTS rollup_{_resolution} (
+      equipment_id TEXT NOT NULL,
+      bucket INTEGER NOT NULL,  -- bucket start, epoch milliseconds
+      count INTEGER NOT NULL,
+{_ROLLUP_VALUE_DDL},
+      failure_probability_sum REAL,
+      failure_probability_max REAL,
+      health_score_min REAL,
+      PRIMARY KEY (equipment_id, bucket)
+    ) WITHOUT ROWID
+    """,
+        f"CREATE INDEX IF NOT EXISTS idx_rollup_{_resolution}_bucket ON rollup_{_resolution} (bucket)",
+    ]
+
+# ISO-8601 text -> epoch milliseconds, evaluated inside SQLite during migration
+_ISO_TO_EPOCH_MS = "CAST(ROUND((julianday({col}) - 2440587.5) * 86400000.0) AS INTEGER)"
+# Epoch milliseconds -> ISO-8601 UTC text for API responses. The result is
+# aliased back to "ts", so ORDER BY must name the table column explicitly.
+_EPOCH_MS_TO_ISO = "strftime('%Y-%m-%dT%H:%M:%fZ', {col} / 1000.0, 'unixepoch')"
+
+
+def to_epoch_ms(ts: Any) -> int:
+    """Convert an ISO string, datetime or epoch number to epoch milliseconds (naive = UTC)."""
+    if isinstance(ts, (int, float)):
+        return int(ts)
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    if hasattr(ts, "to_pydatetime"):
+        ts = ts.to_pydatetime()
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(round(ts.timestamp() * 1000))
+
+
+def _cutoff_ms(days: float) -> int:
+    return to_epoch_ms(datetime.now(timezone.utc) - timedelta(days=days))
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row["name"] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+_V1_TABLES = ("sensor_readings", "predictions", "maintenance_records")
+
+
+def _migrate_v1(conn: sqlite3.Connection) -> None:
+    """Rewrite version-1 tables (TEXT ts, no readings.equipment_id) into the current schema."""
+    legacy = [t for t in _V1_TABLES if _table_columns(conn, t)]
+    for table in legacy:
+        conn.execute(f"ALTER TABLE {table} RENAME TO {table}_v1")
+    for stmt in _SCHEMA:
+        conn.execute(stmt)
+    _copy_v1(conn, legacy)
+
+
+def _leftover_v1(conn: sqlite3.Connection) -> List[str]:
+    return [t for t in _V1_TABLES if _table_columns(conn, f"{t}_v1") and _table_columns(conn, t)]
+
+
+def _copy_v1(conn: sqlite3.Connection, legacy: List[str]) -> None:
+    # Copy renamed version-1 tables into the current ones and drop them.
+    # OR IGNORE keeps rows a previous, interrupted run already copied.
+    if "sensor_readings" in legacy:
+        conn.execute(
+            f"""
+            INSERT OR IGNORE INTO sensor_readings (id, equipment_id, ts, temperature, vibration, pressure, current)
+            SELECT id, '', {_ISO_TO_EPOCH_MS.format(col="ts")}, temperature, vibration, pressure, current
+            FROM sensor_readings_v1
             """
         )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS predictions (
-              id INTEGER PRIMARY KEY AUTOINCREMENT,
-              ts TEXT NOT NULL,
-              equipment_id TEXT NOT NULL,
-              temperature REAL,
-              vibration REAL,
-              pressure REAL,
-              current REAL,
-              failure_probability REAL,
-              health_score REAL
+    if "predictions" in legacy:
+        conn.execute(
+            f"""
+            INSERT OR IGNORE INTO predictions (
+              id, ts, equipment_id, temperature, vibration, pressure, current, failure_probability, health_score
             )
+            SELECT id, {_ISO_TO_EPOCH_MS.format(col="ts")}, equipment_id, temperature, vibration, pressure,
+                   current, failure_probability, health_score
+            FROM predictions_v1
             """
         )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS maintenance_records (
-              id INTEGER PRIMARY KEY AUTOINCREMENT,
-              equipment_id TEXT NOT NULL,
-              action TEXT NOT NULL,
-              notes TEXT,
-              ts TEXT NOT NULL
-            )
+    if "maintenance_records" in legacy:
+        conn.execute(
+            f"""
+            INSERT OR IGNORE INTO maintenance_records (id, equipment_id, action, notes, ts)
+            SELECT id, equipment_id, action, notes, {_ISO_TO_EPOCH_MS.format(col="ts")}
+            FROM maintenance_records_v1
             """
         )
+    for table in legacy:
+        conn.execute(f"DROP TABLE {table}_v1")
 
 
-def insert_reading(ts: str, temperature: float, vibration: float, pressure: float, current: float) -> None:
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Bring the schema to SCHEMA_VERSION; returns the version found before migrating.
+
+    The whole migration runs in one BEGIN IMMEDIATE transaction. sqlite3
+    would otherwise run the DDL in autocommit mode, so a failed copy could
+    leave the history in renamed tables. The version is read again once the
+    write lock is held, so workers starting together migrate only once.
+    Version-1 tables left renamed by an interrupted migration from before
+    it was atomic are copied in, even into a database already stamped.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION and not _leftover_v1(conn):
+        return version
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        leftover = _leftover_v1(conn)
+        _copy_v1(conn, leftover)
+        if version < SCHEMA_VERSION:
+            readings_cols = _table_columns(conn, "sensor_readings")
+            if readings_cols and "equipment_id" not in readings_cols:
+                _migrate_v1(conn)
+            else:
+                if version < 6 and _table_columns(conn, "alert_transitions"):
+                    # Duplicates from before the unique key, oldest kept
+                    conn.execute(
+                        "DELETE FROM alert_transitions WHERE id NOT IN "
+                        "(SELECT MIN(id) FROM alert_transitions GROUP BY equipment_id, rule, ts, state)"
+                    )
+                for stmt in _SCHEMA:
+                    conn.execute(stmt)
+        if version < 3 or leftover:
+            rebuild_rollups(conn)
+        conn.execute(f"PRAGMA user_version = {max(version, SCHEMA_VERSION)}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return version
+
+
+def init_db() -> None:
     with get_conn() as conn:
-        conn.execute(
-            "INSERT INTO sensor_readings (ts, temperature, vibration, pressure, current) VALUES (?, ?, ?, ?, ?)",
-            (ts, temperature, vibration, pressure, current),
+        migrate(conn)
+
+
+_INSERT_READING_SQL = """
+    INSERT INTO sensor_readings (ts, temperature, vibration, pressure, current, equipment_id)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+_INSERT_PREDICTION_SQL = """
+    INSERT INTO predictions (
+      ts, equipment_id, temperature, vibration, pressure, current, failure_probability, health_score
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_READING_COLUMNS = f"{_EPOCH_MS_TO_ISO.format(col='ts')} AS ts, equipment_id, temperature, vibration, pressure, current"
+_PREDICTION_COLUMNS = (
+    f"id, {_EPOCH_MS_TO_ISO.format(col='ts')} AS ts, equipment_id, temperature, vibration, pressure, current, "
+    "failure_probability, health_score"
+)
+_TABLES = {"readings": ("sensor_readings", _READING_COLUMNS), "predictions": ("predictions", _PREDICTION_COLUMNS)}
+# The same columns with ts left as epoch ms, for get_historical_columns
+_MS_COLUMNS = {
+    "readings": "ts, equipment_id, temperature, vibration, pressure, current",
+    "predictions": "id, ts, equipment_id, temperature, vibration, pressure, current, failure_probability, health_score",
+}
+
+
+# Optional columnar copy of the raw history (segments.SegmentStore) that
+# get_historical and the exports read from; SQLite stays the system of record
+_segment_store = None
+
+
+def configure_segments(store) -> None:
+    """Mirror committed raw writes into ``store`` and serve history scans from it (None restores SQLite scans)."""
+    global _segment_store
+    if store is not None:
+        store.on_flush = _segments_flushed
+    _segment_store = store
+
+
+def _segments_flushed() -> None:
+    # With a segment store the history reads see other processes' rows only
+    # once sealed, so the data version moves here rather than on the write
+    with get_conn() as conn:
+        bump_data_version(conn)
+
+
+def get_segment_store():
+    return _segment_store
+
+
+def _append_segments(kind: str, columns: Dict[str, Any]) -> None:
+    # Deferred to the commit inside get_conn; a caller managing its own
+    # transaction on a bare connection gets the append straight away
+    appends = getattr(_pending, "appends", None)
+    if appends is None:
+        _apply_segment_appends([(kind, columns)])
+    else:
+        appends.append((kind, columns))
+
+
+def _apply_segment_appends(appends: List[Tuple[str, Dict[str, Any]]]) -> None:
+    if _segment_store is None:
+        return
+    for kind, columns in appends:
+        try:
+            _segment_store.append(kind, columns)
+        except Exception:
+            # SQLite already has the rows; raising would make callers retry them
+            logger.exception("segment store append of %s failed after commit", kind)
+
+
+def bump_data_version(conn: sqlite3.Connection) -> None:
+    """Mark readings or predictions as changed, inside the writing transaction."""
+    conn.execute(
+        "UPDATE data_version SET version = version + 1, updated_ms = ? WHERE id = 1",
+        (to_epoch_ms(datetime.now(timezone.utc)),),
+    )
+
+
+def get_data_version() -> Tuple[int, int]:
+    """
+    (version, updated_ms) of the readings and predictions: the version goes
+    up with every committed write or delete, in any process. With a segment
+    store configured it goes up when the store seals rows or drops
+    partitions instead, so a response built at a version includes every
+    write counted in it, whichever process made it.
+    """
+    with get_conn() as conn:
+        row = conn.execute("SELECT version, updated_ms FROM data_version WHERE id = 1").fetchone()
+    return (int(row[0]), int(row[1])) if row is not None else (0, 0)
+
+
+def write_readings(conn: sqlite3.Connection, rows: Iterable[Tuple[Any, ...]]) -> None:
+    """
+    Insert (ts, temperature, vibration, pressure, current[, equipment_id]) rows
+    on an open connection.
+    """
+    rows = [(to_epoch_ms(r[0]), r[1], r[2], r[3], r[4], r[5] if len(r) > 5 else "") for r in rows]
+    conn.executemany(_INSERT_READING_SQL, rows)
+    if rows and _segment_store is None:
+        bump_data_version(conn)
+    if _segment_store is not None and rows:
+        ts, *values, equipment_id = zip(*rows)
+        _append_segments("readings", {"ts": ts, "equipment_id": equipment_id, **dict(zip(SENSOR_COLUMNS, values))})
+
+
+def write_predictions(conn: sqlite3.Connection, records: Iterable[Dict[str, Any]]) -> None:
+    """Insert prediction records on an open connection and fold them into the rollups."""
+    rows = [
+        (
+            to_epoch_ms(r["timestamp"]),
+            r["equipment_id"],
+            r["temperature"],
+            r["vibration"],
+            r["pressure"],
+            r["current"],
+            r["failure_probability"],
+            r["health_score"],
         )
+        for r in records
+    ]
+    if not rows:
+        return
+    conn.executemany(_INSERT_PREDICTION_SQL, rows)
+    # The write lock is held for the whole transaction, so the batch occupies
+    # the contiguous rowid range ending at last_insert_rowid().
+    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    update_rollups(conn, last_id - len(rows) + 1, last_id)
+    if _segment_store is None:
+        bump_data_version(conn)
+    else:
+        names = ["ts", "equipment_id", *SENSOR_COLUMNS, "failure_probability", "health_score"]
+        columns = dict(zip(names, zip(*rows)))
+        columns["id"] = np.arange(last_id - len(rows) + 1, last_id + 1)
+        _append_segments("predictions", columns)
+
+
+def insert_reading(
+    ts: Any,
+    temperature: float,
+    vibration: float,
+    pressure: float,
+    current: float,
+    equipment_id: str = "",
+) -> None:
+    with get_conn() as conn:
+        write_readings(conn, [(ts, temperature, vibration, pressure, current, equipment_id)])
+
+
+def insert_readings(rows: Iterable[Tuple[Any, ...]]) -> None:
+    with get_conn() as conn:
+        write_readings(conn, rows)
 
 
 def insert_predictions(records: Iterable[Dict[str, Any]]) -> None:
     with get_conn() as conn:
-        conn.executemany(
-            """
-            INSERT INTO predictions (
-              ts, equipment_id, temperature, vibration, pressure, current, failure_probability, health_score
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            [
-                (
-                    r["timestamp"],
-                    r["equipment_id"],
-                    r["temperature"],
-                    r["vibration"],
-                    r["pressure"],
-                    r["current"],
-                    r["failure_probability"],
-                    r["health_score"],
-                )
-                for r in records
-            ],
-        )
+        write_predictions(conn, records)
 
 
 def insert_maintenance(equipment_id: str, action: str, notes: str = "") -> None:
     with get_conn() as conn:
         conn.execute(
             "INSERT INTO maintenance_records (equipment_id, action, notes, ts) VALUES (?, ?, ?, ?)",
-            (equipment_id, action, notes, datetime.utcnow().isoformat()),
+            (equipment_id, action, notes, to_epoch_ms(datetime.now(timezone.utc))),
         )
 
 
-def get_historical(days: int) -> Dict[str, List[Dict[str, Any]]]:
-    cutoff = datetime.utcnow() - timedelta(days=days)
+def write_maintenance(conn: sqlite3.Connection, rows: Iterable[Tuple[Any, ...]]) -> None:
+    """Insert (ts, equipment_id, action[, notes]) rows on an open connection."""
+    conn.executemany(
+        "INSERT INTO maintenance_records (ts, equipment_id, action, notes) VALUES (?, ?, ?, ?)",
+        [(to_epoch_ms(r[0]), r[1], r[2], r[3] if len(r) > 3 else "") for r in rows],
+    )
+
+
+def write_alert_transitions(conn: sqlite3.Connection, rows: Iterable[Tuple[Any, ...]]) -> None:
+    """
+    Insert (ts, equipment_id, rule, severity, state, value) rows, as
+    AlertEngine.evaluate returns them; a transition already recorded (by
+    another worker) is skipped.
+    """
+    conn.executemany(
+        "INSERT OR IGNORE INTO alert_transitions (ts, equipment_id, rule, severity, state, value) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [(to_epoch_ms(r[0]), r[1], r[2], r[3], r[4], r[5]) for r in rows],
+    )
+
+
+def insert_alert_transitions(rows: Iterable[Tuple[Any, ...]]) -> None:
+    with get_conn() as conn:
+        write_alert_transitions(conn, rows)
+
+
+def get_alert_transitions(days: int = 7, equipment_id: str | None = None, limit: int = 1000) -> List[Dict[str, Any]]:
+    """Alert opens and closes of the last ``days`` days, newest first."""
+    sql = (
+        f"SELECT {_EPOCH_MS_TO_ISO.format(col='ts')} AS ts, equipment_id, rule, severity, state, value "
+        "FROM alert_transitions WHERE ts >= ?"
+    )
+    params: List[Any] = [_cutoff_ms(days)]
+    if equipment_id is not None:
+        sql += " AND equipment_id = ?"
+        params.append(equipment_id)
+    sql += " ORDER BY alert_transitions.ts DESC, id DESC LIMIT ?"
+    params.append(limit)
+    with get_conn() as conn:
+        return [dict(row) for row in conn.execute(sql, params)]
+
+
+def get_open_alert_transitions(as_of: Any | None = None) -> List[Tuple[int, str, str, str, str, float]]:
+    """
+    The latest transition of every (equipment, rule) pair that is still open,
+    for AlertEngine.restore; with ``as_of``, open at that time.
+    """
+    as_of_ms = to_epoch_ms(as_of) if as_of is not None else 2**62
+    with get_conn() as conn:
+        cur = conn.execute(
+            """
+            SELECT t.ts, t.equipment_id, t.rule, t.severity, t.state, t.value
+            FROM alert_transitions t
+            JOIN (
+              SELECT MAX(id) AS id FROM alert_transitions WHERE ts <= ? GROUP BY equipment_id, rule
+            ) latest ON t.id = latest.id
+            WHERE t.state = 'open'
+            """,
+            (as_of_ms,),
+        )
+        return [tuple(row) for row in cur.fetchall()]
+
+
+def get_maintenance_times(actions: Iterable[str] | None = None) -> Dict[str, np.ndarray]:
+    """Sorted epoch-ms times of maintenance records per equipment, optionally only the given actions."""
+    sql = "SELECT equipment_id, ts FROM maintenance_records"
+    params: List[Any] = []
+    if actions is not None:
+        actions = list(actions)
+        sql += f" WHERE action IN ({','.join('?' * len(actions))})"
+        params = actions
+    times: Dict[str, List[int]] = {}
+    with get_conn() as conn:
+        for equipment_id, ts in conn.execute(sql + " ORDER BY equipment_id, ts", params):
+            times.setdefault(equipment_id, []).append(ts)
+    return {k: np.asarray(v, dtype=np.int64) for k, v in times.items()}
+
+
+def iter_sensor_arrays(
+    kind: str = "readings",
+    since_ms: int | None = None,
+    until_ms: int | None = None,
+    chunk_rows: int = 100_000,
+    ordered: bool = False,
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Stream sensor values from the readings or predictions table as
+    (ts int64, equipment_id object, values float32 of shape (n, 4)) chunks
+    of at most ``chunk_rows`` rows, in storage order, or in ts order (each
+    unit's rows in time order, read off the ts index) with ``ordered``.
+    Rows with a missing sensor value are skipped; ``since_ms``/``until_ms``
+    bound ts to [since, until).
+    """
+    table = _TABLES[kind][0]
+    where = [f"{c} IS NOT NULL" for c in SENSOR_COLUMNS]
+    params: List[Any] = []
+    if since_ms is not None:
+        where.append("ts >= ?")
+        params.append(int(since_ms))
+    if until_ms is not None:
+        where.append("ts < ?")
+        params.append(int(until_ms))
+    sql = f"SELECT ts, equipment_id, {', '.join(SENSOR_COLUMNS)} FROM {table} WHERE {' AND '.join(where)}"
+    if ordered:
+        sql += " ORDER BY ts"
     with get_conn() as conn:
         cur = conn.cursor()
-        # Sensor readings
+        cur.row_factory = None  # plain tuples
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            yield (
+                np.asarray(columns[0], dtype=np.int64),
+                np.asarray(columns[1], dtype=object),
+                np.column_stack([np.asarray(c, dtype=np.float32) for c in columns[2:]]),
+            )
+        cur.close()
+
+
+HISTORICAL_METHODS = ("lttb", "bucket")
+
+_VALUE_COLUMNS = {
+    "readings": ["temperature", "vibration", "pressure", "current"],
+    "predictions": ["temperature", "vibration", "pressure", "current", "failure_probability", "health_score"],
+}
+
+
+# Recursive skip-scan over an index led by equipment_id: one probe per unit,
+# independent of how many rows each unit has.
+_EQUIPMENT_CTE = """
+    WITH RECURSIVE eq(id) AS (
+      SELECT (SELECT equipment_id FROM {table} ORDER BY equipment_id LIMIT 1)
+      UNION ALL
+      SELECT (SELECT equipment_id FROM {table} WHERE equipment_id > eq.id ORDER BY equipment_id LIMIT 1)
+      FROM eq WHERE eq.id IS NOT NULL
+    )
+"""
+
+
+def _distinct_equipment(conn: sqlite3.Connection, table: str) -> List[str]:
+    rows = conn.execute(
+        _EQUIPMENT_CTE.format(table=table) + "SELECT id FROM eq WHERE id IS NOT NULL"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+# dtype per column name in get_historical_columns; everything else is float64
+# with NULL as NaN
+_COLUMN_DTYPES = {"id": np.int64, "ts": np.int64, "count": np.int64, "equipment_id": object}
+
+
+def _fetch_columns(cur: sqlite3.Cursor) -> Dict[str, np.ndarray]:
+    names = [d[0] for d in cur.description]
+    rows = cur.fetchall()
+    values = list(zip(*rows)) if rows else [()] * len(names)
+    return {name: np.array(v, dtype=_COLUMN_DTYPES.get(name, np.float64)) for name, v in zip(names, values)}
+
+
+def _query(conn: sqlite3.Connection, sql: str, params: Tuple[Any, ...], columnar: bool):
+    """Row dicts, or with ``columnar`` one NumPy array per selected column."""
+    cur = conn.cursor()
+    if columnar:
+        cur.row_factory = None
+    cur.execute(sql, params)
+    if columnar:
+        return _fetch_columns(cur)
+    return [dict(row) for row in cur.fetchall()]
+
+
+def _empty(names: Iterable[str], columnar: bool):
+    if not columnar:
+        return []
+    return {name: np.empty(0, dtype=_COLUMN_DTYPES.get(name, np.float64)) for name in names}
+
+
+# Time buckets per LTTB output point in the SQL preselection; each bucket
+# contributes the rows holding the min and max of every value column
+_LTTB_PRESELECT = 2
+
+
+def _lttb_rows(conn: sqlite3.Connection, kind: str, cutoff: int, max_points: int, columnar: bool = False):
+    """
+    LTTB per equipment unit over the window; whole rows are returned, oldest
+    first. ``max_points`` is split across the units, so the total never
+    exceeds it (with more units than points the later units get none).
+
+    SQLite first aggregates each unit's window into time buckets and only the
+    rows holding a bucket's min or max of some value column reach Python, so
+    LTTB sees a few rows per output point instead of the whole window.
+    """
+    table, columns = _TABLES[kind]
+    # health_score mirrors failure_probability, so it adds nothing to the shape
+    value_cols = [c for c in _VALUE_COLUMNS[kind] if c != "health_score"]
+    units = _distinct_equipment(conn, table)
+    if not units:
+        return _empty(_MS_COLUMNS[kind].split(", "), columnar)
+    now = to_epoch_ms(datetime.now(timezone.utc))
+    extremes = ", ".join(f"MIN({c}), MAX({c})" for c in value_cols)
+    is_extreme = " OR ".join(
+        f"{c} IN (SELECT value FROM _lttb_extremes WHERE col = {k})" for k, c in enumerate(value_cols)
+    )
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS _lttb_extremes (col INTEGER, value REAL, PRIMARY KEY (col, value)) "
+        "WITHOUT ROWID"
+    )
+
+    keep: List[int] = []
+    cur = conn.cursor()
+    cur.row_factory = None
+    for eq_id, budget in zip(units, split_points(max_points, len(units))):
+        if not budget:
+            break
+        width = max(1, -(-(now - cutoff) // (budget * _LTTB_PRESELECT)))
         cur.execute(
-            "SELECT ts, temperature, vibration, pressure, current FROM sensor_readings WHERE ts >= ? ORDER BY ts ASC",
-            (cutoff.isoformat(),),
+            f"SELECT {extremes} FROM {table} WHERE equipment_id = ? AND ts >= ? GROUP BY ({table}.ts - ?) / ?",
+            (eq_id, cutoff, cutoff, width),
+        )
+        bounds = cur.fetchall()
+        if not bounds:
+            continue
+        conn.execute("DELETE FROM _lttb_extremes")
+        conn.executemany(
+            "INSERT OR IGNORE INTO _lttb_extremes (col, value) VALUES (?, ?)",
+            ((k // 2, v) for row in bounds for k, v in enumerate(row) if v is not None),
         )
-        readings = [dict(row) for row in cur.fetchall()]
-
-        # Latest predictions per equipment within window
         cur.execute(
+            f"SELECT id, ts, {', '.join(value_cols)} FROM {table} "
+            f"WHERE equipment_id = ? AND ts >= ? AND ({is_extreme}) ORDER BY {table}.ts ASC",
+            (eq_id, cutoff),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            continue
+        arr = np.array(rows, dtype=np.float64)
+        picked = lttb_multi(arr[:, 1], arr[:, 2:], budget)
+        keep.extend(arr[picked, 0].astype(np.int64).tolist())
+
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS _keep_ids (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM _keep_ids")
+    conn.executemany("INSERT INTO _keep_ids (id) VALUES (?)", ((i,) for i in keep))
+    if columnar:
+        columns = _MS_COLUMNS[kind]
+    return _query(
+        conn,
+        f"SELECT {columns} FROM {table} WHERE id IN (SELECT id FROM _keep_ids) ORDER BY {table}.ts ASC",
+        (),
+        columnar,
+    )
+
+
+def _bucket_rows(conn: sqlite3.Connection, kind: str, cutoff: int, max_points: int, columnar: bool = False):
+    """
+    Fixed-width time buckets per equipment unit, aggregated inside SQLite.
+    Each row carries the bucket's first ts, a count, and mean/min/max of every
+    value column (the mean under the plain column name).
+    """
+    table, _ = _TABLES[kind]
+    units = _distinct_equipment(conn, table)
+    if not units:
+        names = ["ts", "equipment_id", "count"]
+        names += [f"{c}{suffix}" for c in _VALUE_COLUMNS[kind] for suffix in ("", "_min", "_max")]
+        return _empty(names, columnar)
+    buckets = max(1, max_points // len(units))
+    now = to_epoch_ms(datetime.now(timezone.utc))
+    width = max(1, -(-(now - cutoff) // buckets))
+    aggs = ", ".join(
+        f"AVG({c}) AS {c}, MIN({c}) AS {c}_min, MAX({c}) AS {c}_max" for c in _VALUE_COLUMNS[kind]
+    )
+    first_ts = f"MIN({table}.ts)" if columnar else _EPOCH_MS_TO_ISO.format(col=f"MIN({table}.ts)")
+    return _query(
+        conn,
+        f"""
+        SELECT {first_ts} AS ts, equipment_id, COUNT(*) AS count, {aggs}
+        FROM {table}
+        WHERE ts >= ?
+        GROUP BY equipment_id, ({table}.ts - ?) / ?
+        ORDER BY MIN({table}.ts) ASC
+        """,
+        (cutoff, cutoff, width),
+        columnar,
+    )
+
+
+def _historical(days: int, max_points: int | None, method: str, columnar: bool):
+    cutoff = _cutoff_ms(days)
+    if max_points and method not in HISTORICAL_METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    if _segment_store is not None:
+        now = to_epoch_ms(datetime.now(timezone.utc))
+        return _segment_store.historical(cutoff, now, max_points, method, columnar=columnar)
+    with get_conn() as conn:
+        if max_points:
+            sample = _lttb_rows if method == "lttb" else _bucket_rows
+            return {kind: sample(conn, kind, cutoff, max_points, columnar) for kind in _TABLES}
+        out = {}
+        for kind, (table, columns) in _TABLES.items():
+            if columnar:
+                columns = _MS_COLUMNS[kind]
+            out[kind] = _query(
+                conn, f"SELECT {columns} FROM {table} WHERE ts >= ? ORDER BY {table}.ts ASC", (cutoff,), columnar
+            )
+        return out
+
+
+def get_historical(
+    days: int,
+    max_points: int | None = None,
+    method: str = "lttb",
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Readings and predictions from the last ``days`` days, oldest first.
+
+    With ``max_points`` each list is downsampled to about that many rows:
+    ``"lttb"`` keeps at most ``max_points`` raw rows that best preserve each
+    series' shape, ``"bucket"`` returns per-unit time buckets with
+    mean/min/max computed in SQLite (at least one per unit with data). With a segment store
+    configured the same rows come from its memory-mapped columns.
+    """
+    return _historical(days, max_points, method, columnar=False)
+
+
+def get_historical_columns(
+    days: int,
+    max_points: int | None = None,
+    method: str = "lttb",
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    ``get_historical`` with each list turned into one NumPy array per key:
+    ts as int64 epoch ms, equipment_id as an object array of str, id and
+    count as int64 and every value column as float64 with NULL as NaN.
+    The rows (and their order) are the same.
+    """
+    return _historical(days, max_points, method, columnar=True)
+
+
+def get_equipment_range(
+    equipment_id: str,
+    start: Any,
+    end: Any | None = None,
+    kind: str = "predictions",
+) -> List[Dict[str, Any]]:
+    """Rows of one equipment unit with start <= ts < end, oldest first."""
+    table, columns = _TABLES[kind]
+    end_ms = to_epoch_ms(end) if end is not None else 2**62
+    with get_conn() as conn:
+        cur = conn.execute(
+            f"SELECT {columns} FROM {table} WHERE equipment_id = ? AND ts >= ? AND ts < ? ORDER BY {table}.ts ASC",
+            (equipment_id, to_epoch_ms(start), end_ms),
+        )
+        return [dict(row) for row in cur.fetchall()]
+
+
+def get_latest_per_equipment(n: int = 1, kind: str = "predictions") -> Dict[str, List[Dict[str, Any]]]:
+    """
+    The newest ``n`` rows for every equipment unit, newest first.
+
+    Distinct ids are found with a skip-scan over the (equipment_id, ts) index
+    and each unit's rows with one bounded index probe, so cost grows with the
+    number of units rather than the table size.
+    """
+    table, columns = _TABLES[kind]
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    with get_conn() as conn:
+        ids = _distinct_equipment(conn, table)
+        for eq_id in ids:
+            cur = conn.execute(
+                f"SELECT {columns} FROM {table} WHERE equipment_id = ? ORDER BY {table}.ts DESC LIMIT ?",
+                (eq_id, n),
+            )
+            out[eq_id] = [dict(row) for row in cur.fetchall()]
+    return out
+
+
+# Health bands, matching the labels in static/js/equipment.js
+HEALTHY_ABOVE = 80.0
+CRITICAL_BELOW = 50.0
+
+
+def health_status(health_score: float) -> str:
+    if health_score > HEALTHY_ABOVE:
+        return "healthy"
+    if health_score >= CRITICAL_BELOW:
+        return "at_risk"
+    return "critical"
+
+
+def _rollup_select(width: int, where: str) -> str:
+    return f"""
+        SELECT equipment_id, ts - ts % {width}, COUNT(*),
+               {", ".join(f"SUM({c}), MIN({c}), MAX({c})" for c in SENSOR_COLUMNS)},
+               SUM(failure_probability), MAX(failure_probability), MIN(health_score)
+        FROM predictions
+        WHERE {where}
+        GROUP BY equipment_id, ts - ts % {width}
+    """
+
+
+_ROLLUP_UPSERT = {
+    resolution: f"""
+    INSERT INTO rollup_{resolution} {_rollup_select(width, "id > ? AND id <= ?")}
+    ON CONFLICT (equipment_id, bucket) DO UPDATE SET
+      count = count + excluded.count,
+      {", ".join(
+          f"{c}_sum = {c}_sum + excluded.{c}_sum, "
+          f"{c}_min = MIN({c}_min, excluded.{c}_min), "
+          f"{c}_max = MAX({c}_max, excluded.{c}_max)"
+          for c in SENSOR_COLUMNS
+      )},
+      failure_probability_sum = failure_probability_sum + excluded.failure_probability_sum,
+      failure_probability_max = MAX(failure_probability_max, excluded.failure_probability_max),
+      health_score_min = MIN(health_score_min, excluded.health_score_min)
+    """
+    for resolution, width in ROLLUP_RESOLUTIONS.items()
+}
+
+
+def update_rollups(conn: sqlite3.Connection, first_id: int, last_id: int) -> None:
+    """
+    Fold the prediction rows with first_id <= id <= last_id into every rollup
+    table. The range is aggregated inside SQLite so each (unit, bucket) costs
+    one upsert.
+    """
+    if last_id < first_id:
+        return
+    for resolution in ROLLUP_RESOLUTIONS:
+        conn.execute(_ROLLUP_UPSERT[resolution], (first_id - 1, last_id))
+
+
+def rebuild_rollups(conn: sqlite3.Connection | None = None) -> Dict[str, int]:
+    """Recompute every rollup table from the predictions table (backfill)."""
+    if conn is None:
+        with get_conn() as conn:
+            return rebuild_rollups(conn)
+    counts: Dict[str, int] = {}
+    for resolution, width in ROLLUP_RESOLUTIONS.items():
+        conn.execute(f"DELETE FROM rollup_{resolution}")
+        conn.execute(f"INSERT INTO rollup_{resolution} {_rollup_select(width, 'TRUE')}")
+        counts[resolution] = conn.execute(f"SELECT COUNT(*) FROM rollup_{resolution}").fetchone()[0]
+    return counts
+
+
+def get_fleet_kpis() -> Dict[str, int]:
+    """
+    Fleet status counts from each unit's latest hourly rollup (its worst
+    health score in that hour). Cost grows with the number of units only.
+    """
+    with get_conn() as conn:
+        row = conn.execute(
+            _EQUIPMENT_CTE.format(table="rollup_hourly")
+            + f"""
+            SELECT COUNT(*),
+                   SUM(h > {HEALTHY_ABOVE}),
+                   SUM(h >= {CRITICAL_BELOW} AND h <= {HEALTHY_ABOVE}),
+                   SUM(h < {CRITICAL_BELOW})
+            FROM (
+              SELECT (SELECT health_score_min FROM rollup_hourly
+                      WHERE equipment_id = eq.id ORDER BY bucket DESC LIMIT 1) AS h
+              FROM eq WHERE eq.id IS NOT NULL
+            )
             """
-            SELECT p.* FROM predictions p
-            WHERE ts >= ?
-            ORDER BY ts ASC
+        ).fetchone()
+    total, healthy, at_risk, critical = (int(v or 0) for v in row)
+    return {"total": total, "healthy": healthy, "at_risk": at_risk, "critical": critical}
+
+
+def get_rollups(resolution: str, days: int, equipment_id: str | None = None) -> List[Dict[str, Any]]:
+    """
+    Rollup buckets from the last ``days`` days, oldest first. Without
+    ``equipment_id`` the buckets are merged across the whole fleet.
+    """
+    if resolution not in ROLLUP_RESOLUTIONS:
+        raise ValueError(f"Unknown rollup resolution: {resolution}")
+    table = f"rollup_{resolution}"
+    width = ROLLUP_RESOLUTIONS[resolution]
+    cutoff = _cutoff_ms(days)
+    cutoff -= cutoff % width  # include the bucket the window starts in
+    values = ", ".join(
+        f"SUM({c}_sum) / SUM(count) AS {c}_mean, MIN({c}_min) AS {c}_min, MAX({c}_max) AS {c}_max"
+        for c in SENSOR_COLUMNS
+    )
+    where = "bucket >= ?"
+    params: Tuple[Any, ...] = (cutoff,)
+    if equipment_id is not None:
+        where += " AND equipment_id = ?"
+        params += (equipment_id,)
+    with get_conn() as conn:
+        cur = conn.execute(
+            f"""
+            SELECT {_EPOCH_MS_TO_ISO.format(col="bucket")} AS ts, SUM(count) AS count, {values},
+                   SUM(failure_probability_sum) / SUM(count) AS failure_probability_mean,
+                   MAX(failure_probability_max) AS failure_probability_max,
+                   MIN(health_score_min) AS health_score_min
+            FROM {table}
+            WHERE {where}
+            GROUP BY bucket
+            ORDER BY bucket ASC
             """,
-            (cutoff.isoformat(),),
+            params,
         )
-        preds = [dict(row) for row in cur.fetchall()]
+        return [dict(row) for row in cur.fetchall()]
+
 
-    return {"readings": readings, "predictions": preds}
+RETENTION_TABLES = ("sensor_readings", "predictions", "alert_transitions")
 
 
-def cleanup_old(days: int = 90) -> None:
-    cutoff = datetime.utcnow() - timedelta(days=days)
+def delete_before_chunk(table: str, cutoff_ms: int, limit: int) -> int:
+    """Delete up to ``limit`` of the oldest rows with ts < cutoff_ms in one short transaction."""
+    if table not in RETENTION_TABLES:
+        raise ValueError(f"Unknown table: {table}")
     with get_conn() as conn:
-        conn.execute("DELETE FROM sensor_readings WHERE ts < ?", (cutoff.isoformat(),))
-        conn.execute("DELETE FROM predictions WHERE ts < ?", (cutoff.isoformat(),))
+        cur = conn.execute(
+            f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE ts < ? ORDER BY ts LIMIT ?)",
+            (cutoff_ms, limit),
+        )
+        if cur.rowcount > 0 and table != "alert_transitions" and _segment_store is None:
+            bump_data_version(conn)
+        return cur.rowcount
 
 
-def export_csv(days: int) -> str:
+def incremental_vacuum(max_pages: int = 0) -> Dict[str, int]:
+    """
+    Return up to ``max_pages`` free pages to the OS (0 = all). Does nothing
+    unless the database was created with auto_vacuum=INCREMENTAL.
+    """
+    with get_conn() as conn:
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if mode == 2 and before:
+            # executescript steps the pragma to completion; execute() would
+            # stop after the first page.
+            conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+        after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {"auto_vacuum": mode, "pages_freed": before - after, "free_pages": after}
+
+
+def cleanup_old(days: int = 90, chunk_rows: int = 5000) -> int:
+    """Delete rows older than ``days`` in bounded chunks; returns rows removed."""
+    cutoff = _cutoff_ms(days)
+    removed = 0
+    for table in RETENTION_TABLES:
+        while True:
+            n = delete_before_chunk(table, cutoff, chunk_rows)
+            removed += n
+            if n < chunk_rows:
+                break
+    if _segment_store is not None:
+        _segment_store.drop_before(cutoff)
+    return removed
+
+
+EXPORT_COLUMNS = [
+    "type", "ts", "equipment_id", "temperature", "vibration", "pressure", "current", "failure_probability", "health_score",
+]
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+def iter_export_rows(days: int, chunk_rows: int = 5000, iso_ts: bool = True) -> Iterator[List[Tuple[Any, ...]]]:
+    """
+    Yield export rows (in EXPORT_COLUMNS order) in lists of at most
+    ``chunk_rows``, stepping the SQLite cursor instead of materializing the
+    window. Readings come first, then predictions, each oldest first. With
+    ``iso_ts=False`` timestamps stay as epoch milliseconds. With a segment
+    store configured rows are read from it instead.
+    """
+    cutoff = _cutoff_ms(days)
+    if _segment_store is not None:
+        yield from _segment_store.iter_export_rows(cutoff, chunk_rows, iso_ts)
+        return
+    ts = _EPOCH_MS_TO_ISO.format(col="ts") if iso_ts else "ts"
+    queries = [
+        f"""
+        SELECT 'reading', {ts}, equipment_id, temperature, vibration, pressure, current, NULL, NULL
+        FROM sensor_readings WHERE ts >= ? ORDER BY sensor_readings.ts ASC
+        """,
+        f"""
+        SELECT 'prediction', {ts}, equipment_id, temperature, vibration, pressure, current,
+               failure_probability, health_score
+        FROM predictions WHERE ts >= ? ORDER BY predictions.ts ASC
+        """,
+    ]
+    with get_conn() as conn:
+        for sql in queries:
+            cur = conn.cursor()
+            cur.row_factory = None  # plain tuples
+            cur.execute(sql, (cutoff,))
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield rows
+            cur.close()
+
+
+def export_csv_chunks(days: int, chunk_rows: int = 5000) -> Iterator[str]:
+    """CSV export as a stream of text chunks, one per ``chunk_rows`` rows."""
     import csv
     from io import StringIO
 
-    data = get_historical(days)
     buf = StringIO()
     writer = csv.writer(buf)
-    writer.writerow(["type", "ts", "equipment_id", "temperature", "vibration", "pressure", "current", "failure_probability", "health_score"]) 
-    for r in data["readings"]:
-        writer.writerow(["reading", r["ts"], "", r["temperature"], r["vibration"], r["pressure"], r["current"], "", ""])
-    for p in data["predictions"]:
-        writer.writerow(["prediction", p["ts"], p["equipment_id"], p["temperature"], p["vibration"], p["pressure"], p["current"], p["failure_probability"], p["health_score"]])
-    return buf.getvalue()
+    writer.writerow(EXPORT_COLUMNS)
+    yield buf.getvalue()
+    for rows in iter_export_rows(days, chunk_rows):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(rows)
+        yield buf.getvalue()
+
+
+def export_csv(days: int) -> str:
+    return "".join(export_csv_chunks(days))
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+        self.closed = False
+        self._pos = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
 
+    def close(self) -> None:
+        self.closed = True
 
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts = []
+        return out
+
+
+def export_columnar_chunks(days: int, fmt: str = "parquet", row_group_rows: int = 65536) -> Iterator[bytes]:
+    """
+    Parquet or Arrow IPC stream export as a stream of byte chunks.
+
+    Each ``row_group_rows`` rows become one Parquet row group (or one Arrow
+    record batch) and are yielded as soon as they are encoded, so memory is
+    bounded by a single group. Requires pyarrow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("Columnar export requires pyarrow (pip install pyarrow)") from exc
+
+    schema = pa.schema([
+        ("type", pa.string()),
+        ("ts", pa.timestamp("ms", tz="UTC")),
+        ("equipment_id", pa.string()),
+        ("temperature", pa.float64()),
+        ("vibration", pa.float64()),
+        ("pressure", pa.float64()),
+        ("current", pa.float64()),
+        ("failure_probability", pa.float64()),
+        ("health_score", pa.float64()),
+    ])
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    elif fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+    else:
+        raise ValueError(f"Unknown columnar format: {fmt}")
+
+    try:
+        for rows in iter_export_rows(days, row_group_rows, iso_ts=False):
+            columns = list(zip(*rows))
+            batch = pa.record_batch(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            )
+            if fmt == "parquet":
+                writer.write_table(pa.Table.from_batches([batch]), row_group_size=row_group_rows)
+            else:
+                writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+if __name__ == "__main__":
+    # python database.py [migrate|rebuild-rollups] [path/to/app.db]
+    import sys
+
+    args = sys.argv[1:]
+    command = args.pop(0) if args and args[0] in ("migrate", "rebuild-rollups") else "migrate"
+    if args:
+        configure(args[0])
+    with get_conn() as conn:
+        before = migrate(conn)
+        if command == "rebuild-rollups":
+            print(f"{DB_PATH}: rebuilt rollups {rebuild_rollups(conn)}")
+    print(f"{DB_PATH}: schema version {before} -> {SCHEMA_VERSION}")
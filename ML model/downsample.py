@@ -0,0 +1,66 @@
+from typing import List
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of ``n_out`` points of (x, y)
+    that best preserve the visual shape of the series. The first and last
+    points are always kept; x must be sorted.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n, dtype=np.intp)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+
+    # n_out - 2 buckets over the interior points [1, n - 1)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    out = np.empty(n_out, dtype=np.intp)
+    out[0] = 0
+    out[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt = slice(edges[i + 1], edges[i + 2])
+            avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def lttb_multi(x: np.ndarray, values: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Row indices to keep for several series sharing one x axis.
+
+    Each column of ``values`` gets an equal share of ``max_points`` and the
+    union of the per-column LTTB picks is returned, sorted, so whole rows are
+    kept and the total never exceeds ``max_points``.
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n, dtype=np.intp)
+    values = np.asarray(values, dtype=np.float64).reshape(n, -1)
+    share = max(3, max_points // values.shape[1])
+    picks: List[np.ndarray] = [lttb_indices(x, values[:, k], share) for k in range(values.shape[1])]
+    keep = np.unique(np.concatenate(picks))
+    if len(keep) > max_points:
+        keep = keep[np.linspace(0, len(keep) - 1, max_points).astype(np.intp)]
+    return keep
+
+
+def split_points(max_points: int, parts: int) -> List[int]:
+    """
+    ``max_points`` shared out over ``parts`` series as evenly as integers
+    allow, larger shares first. The shares sum to ``max_points`` exactly, so
+    with more series than points the last ones get none.
+    """
+    base, extra = divmod(max_points, parts)
+    return [base + 1] * extra + [base] * (parts - extra)
@@ -0,0 +1,344 @@
+import gzip
+import importlib.util
+import json
+import os
+import struct
+import threading
+from typing import Any, Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider
+
+from metrics import stage
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the json module
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip only
+    brotli = None
+
+
+JSON_MIMETYPE = "application/json"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+# Little-endian uint32 header length, a JSON header, then 8-byte aligned
+# column buffers (see pack_columns)
+PACKED_MIMETYPE = "application/x-packed-columns"
+
+# ?layout= on the JSON endpoints; the binary formats are always columnar
+RESPONSE_LAYOUTS = ("rows", "columns")
+# Integer columns with these names are epoch milliseconds (UTC)
+TIME_COLUMNS = ("ts", "timestamp")
+
+HAVE_ARROW = importlib.util.find_spec("pyarrow") is not None
+
+if orjson is not None:
+    _DUMPS_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    # Sorted keys, and dates and dataclasses left to Flask's default, as jsonify renders them
+    _JSONIFY_OPTIONS = (
+        _DUMPS_OPTIONS
+        | orjson.OPT_SORT_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_APPEND_NEWLINE
+    )
+
+
+def negotiate(accept, layout: str | None = None) -> str:
+    """
+    Response format for a request: ``"packed"`` or ``"arrow"`` when the
+    Accept header (a werkzeug MIMEAccept) prefers one of them, otherwise
+    JSON as ``"columns"`` or ``"rows"`` (the default) per ``layout``.
+    Arrow is only offered when pyarrow is installed.
+    """
+    offers = [JSON_MIMETYPE, PACKED_MIMETYPE] + ([ARROW_MIMETYPE] if HAVE_ARROW else [])
+    best = accept.best_match(offers, default=JSON_MIMETYPE)
+    if best == PACKED_MIMETYPE:
+        return "packed"
+    if best == ARROW_MIMETYPE:
+        return "arrow"
+    return "columns" if layout == "columns" else "rows"
+
+
+def _split(body: Dict[str, Any]) -> Tuple[Dict[str, Dict[str, np.ndarray]], Dict[str, Any]]:
+    # Tables are dicts of arrays; every other entry is metadata
+    tables, meta = {}, {}
+    for key, value in body.items():
+        if isinstance(value, dict) and value and all(isinstance(v, np.ndarray) for v in value.values()):
+            tables[key] = value
+        else:
+            meta[key] = value
+    return tables, meta
+
+
+def _jsonable(values: np.ndarray) -> Any:
+    values = np.asarray(values)
+    if values.dtype.kind == "O":
+        return values.tolist()
+    if orjson is not None:
+        return np.ascontiguousarray(values)
+    out = values.tolist()
+    if values.dtype.kind == "f":
+        for k in np.flatnonzero(np.isnan(values)).tolist():
+            out[k] = None
+    return out
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON; orjson when installed (NumPy arrays encode natively, NaN as null)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=_DUMPS_OPTIONS)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def columns_json(body: Dict[str, Any]) -> bytes:
+    """``body`` with each table as ``{"column": [values...]}``; missing values are null."""
+    tables, meta = _split(body)
+    out = dict(meta)
+    for name, columns in tables.items():
+        out[name] = {col: _jsonable(values) for col, values in columns.items()}
+    return dumps(out)
+
+
+def pack_columns(body: Dict[str, Any]) -> bytes:
+    """
+    Tables as packed little-endian arrays, for typed-array views in the browser.
+
+    The JSON header holds ``meta`` (the non-table entries of ``body``) and
+    per table its row count and columns, each with a dtype, the byte offset
+    of its buffer (relative to the end of the header) and its length.
+    Floats are stored as float32 (NaN for missing); integers, including
+    epoch-ms time columns, as float64, exact up to 2**53; strings as int16
+    or int32 codes into a ``dictionary`` list.
+    """
+    tables, meta = _split(body)
+    header: Dict[str, Any] = {"meta": meta, "tables": {}}
+    buffers = []
+    offset = 0
+    for name, columns in tables.items():
+        entries = []
+        rows = 0
+        for col, values in columns.items():
+            values = np.asarray(values)
+            rows = len(values)
+            entry: Dict[str, Any] = {"name": col}
+            if values.dtype.kind in "OUS":
+                codes, uniques = pd.factorize(values)
+                entry["dictionary"] = uniques.tolist()
+                data = codes.astype("<i2" if len(uniques) < 2**15 else "<i4")
+            elif values.dtype.kind in "iub":
+                data = values.astype("<f8")
+            else:
+                data = values.astype("<f4")
+            raw = data.tobytes()
+            entry.update(dtype=data.dtype.name, offset=offset, length=rows)
+            entries.append(entry)
+            buffers.append(raw + b"\0" * (-len(raw) % 8))
+            offset += len(buffers[-1])
+        header["tables"][name] = {"rows": rows, "columns": entries}
+    head = json.dumps(header, separators=(",", ":")).encode()
+    head += b" " * (-(4 + len(head)) % 8)
+    return struct.pack("<I", len(head)) + head + b"".join(buffers)
+
+
+def arrow_columns(body: Dict[str, Any]) -> bytes:
+    """
+    Tables as one Arrow IPC stream: the union of their columns plus a
+    dictionary-encoded ``table`` column naming each row's table. Time
+    columns become timestamp[ms, UTC] and strings are dictionary-encoded;
+    ``meta`` travels as JSON in the schema metadata. Requires pyarrow.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError as exc:
+        raise RuntimeError("Arrow responses require pyarrow (pip install pyarrow)") from exc
+
+    tables, meta = _split(body)
+    sizes = {name: len(next(iter(cols.values()))) for name, cols in tables.items()}
+    names = list(dict.fromkeys(col for cols in tables.values() for col in cols))
+    arrays = [pa.array(np.repeat(list(tables), list(sizes.values())).astype(object)).dictionary_encode()]
+    for col in names:
+        parts = [tables[t].get(col) for t in tables]
+        kind = next(np.asarray(p).dtype.kind for p in parts if p is not None)
+        if kind in "OUS":
+            values = np.concatenate([
+                np.asarray(p, dtype=object) if p is not None else np.full(sizes[t], None, dtype=object)
+                for t, p in zip(tables, parts)
+            ])
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            continue
+        dtype = np.int64 if kind in "iub" else np.float64
+        values = np.concatenate([
+            np.asarray(p, dtype=dtype) if p is not None else np.zeros(sizes[t], dtype=dtype)
+            for t, p in zip(tables, parts)
+        ])
+        mask = np.concatenate([np.full(sizes[t], p is None) for t, p in zip(tables, parts)])
+        if kind == "f":
+            mask |= np.isnan(values)
+        if kind in "iub" and col in TIME_COLUMNS:
+            arrays.append(pa.array(values, mask=mask, type=pa.timestamp("ms", tz="UTC")))
+        else:
+            arrays.append(pa.array(values, mask=mask))
+    table = pa.table(arrays, names=["table", *names]).replace_schema_metadata({"meta": json.dumps(meta)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_columns(body: Dict[str, Any], fmt: str) -> Tuple[bytes, str]:
+    """(bytes, mimetype) of a columnar ``body`` in the ``negotiate`` format."""
+    if fmt == "packed":
+        return pack_columns(body), PACKED_MIMETYPE
+    if fmt == "arrow":
+        return arrow_columns(body), ARROW_MIMETYPE
+    return columns_json(body), JSON_MIMETYPE
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask's JSON provider with orjson encoding ``jsonify`` responses when it
+    is installed. Keys stay sorted and dates, dataclasses and the other
+    types Flask knows go through its ``default``; NaN encodes as null, and
+    anything orjson rejects (or pretty-printed debug output) falls back to
+    the json module.
+    """
+
+    def response(self, *args: Any, **kwargs: Any):
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            data = orjson.dumps(obj, default=self.default, option=_JSONIFY_OPTIONS)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(data, mimetype=self.mimetype)
+
+
+COMPRESSIBLE_TYPES = (JSON_MIMETYPE, PACKED_MIMETYPE, ARROW_MIMETYPE, "application/javascript")
+
+
+class ResponseCompressor:
+    """
+    Compresses buffered responses per Accept-Encoding: brotli (when the
+    module is installed) or gzip, the client's highest quality winning and
+    ``encodings`` order breaking ties. Streamed responses (SSE, exports),
+    bodies under ``min_bytes`` and types outside COMPRESSIBLE_TYPES and
+    text/* are sent as they are. The default levels are low because every
+    response is compressed on the request path: on a multi-MB JSON body
+    gzip 3 and brotli 2 cost a third and a sixth of gzip 6's time for
+    10-20% more bytes.
+    """
+
+    def __init__(
+        self,
+        encodings: Iterable[str] = ("br", "gzip"),
+        min_bytes: int = 1024,
+        gzip_level: int = 3,
+        brotli_quality: int = 2,
+    ) -> None:
+        encodings = [e.strip().lower() for e in encodings if e.strip()]
+        unknown = set(encodings) - {"br", "gzip"}
+        if unknown:
+            raise ValueError(f"Unknown content encodings: {sorted(unknown)}")
+        self.encodings = [e for e in encodings if e != "br" or brotli is not None]
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.skipped_small = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.by_encoding = {e: 0 for e in self.encodings}
+
+    def choose(self, accept) -> str | None:
+        """Best of ``encodings`` for a werkzeug Accept of Accept-Encoding, or None."""
+        best, best_q = None, 0.0
+        for encoding in self.encodings:
+            q = accept.quality(encoding)
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def compressible(self, mimetype: str | None) -> bool:
+        mimetype = mimetype or ""
+        return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES
+
+    def encode(self, data: bytes, encoding: str) -> bytes:
+        """``data`` compressed with ``encoding`` (one of ``choose``'s answers)."""
+        with stage("compress"):
+            if encoding == "br":
+                out = brotli.compress(data, quality=self.brotli_quality)
+            else:
+                out = gzip.compress(data, self.gzip_level, mtime=0)
+        with self._lock:
+            self.responses += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(out)
+            self.by_encoding[encoding] += 1
+        return out
+
+    def compress(self, response, accept):
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code in (204, 206, 304)
+            or "Content-Encoding" in response.headers
+            or not self.compressible(response.mimetype)
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self.choose(accept)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            with self._lock:
+                self.skipped_small += 1
+            return response
+        response.set_data(self.encode(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def install(self, app) -> None:
+        """Compress every eligible response of a Flask app; register after instrument_app."""
+        from flask import request
+
+        @app.after_request
+        def _compress_response(response):
+            return self.compress(response, request.accept_encodings)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "encodings": ",".join(self.encodings),
+                "min_bytes": self.min_bytes,
+                "responses": self.responses,
+                "skipped_small": self.skipped_small,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+                "by_encoding": dict(self.by_encoding),
+            }
+
+
+def create_compressor_from_env() -> ResponseCompressor | None:
+    """
+    Build the response compressor from RESPONSE_COMPRESSION (encodings in
+    preference order, default ``br,gzip``; ``0`` or ``none`` disables it),
+    COMPRESS_MIN_BYTES, COMPRESS_GZIP_LEVEL and COMPRESS_BROTLI_QUALITY.
+    """
+    encodings = os.environ.get("RESPONSE_COMPRESSION", "br,gzip").strip().lower()
+    if encodings in ("", "0", "none", "off"):
+        return None
+    return ResponseCompressor(
+        encodings=encodings.split(","),
+        min_bytes=int(os.environ.get("COMPRESS_MIN_BYTES", "1024")),
+        gzip_level=int(os.environ.get("COMPRESS_GZIP_LEVEL", "3")),
+        brotli_quality=int(os.environ.get("COMPRESS_BROTLI_QUALITY", "2")),
+    )
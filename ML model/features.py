@@ -0,0 +1,286 @@
+import threading
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from predictive_model import FEATURE_COLUMNS
+
+
+# Per-equipment statistics over the last ``window`` readings of each sensor;
+# slope is in units per reading, EWMA runs over the whole history
+ROLLING_STATS = ("mean", "std", "slope", "ewma")
+DEFAULT_WINDOW = 12
+
+
+def default_alpha(window: int) -> float:
+    """EWMA smoothing with the same centre of mass as a ``window``-reading mean."""
+    return 2.0 / (window + 1.0)
+
+
+def rolling_columns(columns: Iterable[str] = FEATURE_COLUMNS) -> List[str]:
+    return [f"{c}_{stat}" for c in columns for stat in ROLLING_STATS]
+
+
+def extended_columns(columns: Iterable[str] = FEATURE_COLUMNS) -> List[str]:
+    """Instantaneous readings followed by their rolling statistics, the order models see them in."""
+    columns = list(columns)
+    return columns + rolling_columns(columns)
+
+
+def rolling_spec(window: int = DEFAULT_WINDOW, alpha: float | None = None) -> Dict[str, Any]:
+    """The settings stored with a model (``TrainedModel.rolling``) so serving computes the same features."""
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    return {"window": int(window), "alpha": float(alpha if alpha is not None else default_alpha(window))}
+
+
+def _slope(n: np.ndarray, sum_x: np.ndarray, sum_ix: np.ndarray) -> np.ndarray:
+    # Least-squares slope of x against 0..n-1; 0 for a single reading
+    sum_i = n * (n - 1) / 2.0
+    denom = n * (n - 1) * (n + 1) / 12.0 * n
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = (n * sum_ix - sum_i * sum_x) / denom
+    return np.where(n > 1, slope, 0.0)
+
+
+def _stack(x, mean, std, slope, ewma) -> np.ndarray:
+    # (rows, columns) each -> (rows, columns * (1 + stats)) in extended_columns order
+    rows, width = x.shape
+    out = np.empty((rows, width * (1 + len(ROLLING_STATS))), dtype=np.float64)
+    out[:, :width] = x
+    stats = np.stack([mean, std, slope, ewma], axis=2)
+    out[:, width:] = stats.reshape(rows, -1)
+    return out
+
+
+class RollingFeatures:
+    """
+    Streaming rolling-window features per equipment unit.
+
+    Each unit owns a slot in parallel NumPy arrays: a ring buffer of its
+    last ``window`` readings plus running mean, sum of squared deviations
+    (Welford's update, extended to a sliding window), index-weighted sum for
+    the least-squares slope and EWMA. A new reading updates them in O(1) per
+    sensor, and a batch of readings for many units is one vectorized update,
+    so scoring a fleet tick never rescans history. Readings at or before a
+    unit's last timestamp are ignored, which makes repeated updates with the
+    same tick harmless.
+
+    ``add_rolling_features`` computes the same values offline over a
+    DataFrame for training.
+    """
+
+    def __init__(
+        self,
+        window: int = DEFAULT_WINDOW,
+        alpha: float | None = None,
+        columns: Iterable[str] = FEATURE_COLUMNS,
+        capacity: int = 1024,
+    ) -> None:
+        spec = rolling_spec(window, alpha)
+        self.window = spec["window"]
+        self.alpha = spec["alpha"]
+        self.columns = list(columns)
+        self.feature_columns = extended_columns(self.columns)
+        self._lock = threading.Lock()
+        self._index: Dict[Any, int] = {}
+        self._size = 0
+        width = len(self.columns)
+        self.buffer = np.zeros((capacity, self.window, width))
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.head = np.zeros(capacity, dtype=np.int64)  # oldest reading in the ring once full
+        self.last_ts = np.full(capacity, np.iinfo(np.int64).min, dtype=np.int64)
+        self.mean = np.zeros((capacity, width))
+        self.m2 = np.zeros((capacity, width))
+        self.sum_ix = np.zeros((capacity, width))
+        self.ewma = np.zeros((capacity, width))
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def spec(self) -> Dict[str, Any]:
+        return {"window": self.window, "alpha": self.alpha}
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.count)
+        while capacity < needed:
+            capacity *= 2
+        for name in ("buffer", "count", "head", "last_ts", "mean", "m2", "sum_ix", "ewma"):
+            old = getattr(self, name)
+            fill = np.iinfo(np.int64).min if name == "last_ts" else 0
+            new = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def _slots(self, equipment_ids: Iterable) -> np.ndarray:
+        codes, uniques = pd.factorize(np.asarray(equipment_ids, dtype=object))
+        slots = np.empty(len(uniques), dtype=np.int64)
+        for k, unit in enumerate(uniques):
+            slot = self._index.get(unit)
+            if slot is None:
+                slot = self._index[unit] = self._size
+                self._size += 1
+            slots[k] = slot
+        if self._size > len(self.count):
+            self._grow(self._size)
+        return slots[codes]
+
+    def _apply(self, u: np.ndarray, x: np.ndarray, ts: np.ndarray | None) -> None:
+        # One reading per unit in ``u`` (no repeats)
+        if ts is not None:
+            fresh = ts > self.last_ts[u]
+            u, x, ts = u[fresh], x[fresh], ts[fresh]
+            if not len(u):
+                return
+            self.last_ts[u] = ts
+        w = self.window
+        n_old = self.count[u]
+        first = n_old == 0
+        self.ewma[u] = np.where(first[:, None], x, self.alpha * x + (1.0 - self.alpha) * self.ewma[u])
+
+        growing = n_old < w
+        g, xg, ng = u[growing], x[growing], n_old[growing]
+        if len(g):
+            n = (ng + 1)[:, None].astype(np.float64)
+            delta = xg - self.mean[g]
+            mean = self.mean[g] + delta / n
+            self.m2[g] += delta * (xg - mean)
+            self.mean[g] = mean
+            self.sum_ix[g] += ng[:, None] * xg
+            self.buffer[g, ng % w] = xg
+            self.count[g] = ng + 1
+
+        f, xf = u[~growing], x[~growing]
+        if len(f):
+            pos = self.head[f]
+            x_old = self.buffer[f, pos]
+            mean_old = self.mean[f]
+            mean = mean_old + (xf - x_old) / w
+            self.m2[f] = np.maximum(self.m2[f] + (xf - x_old) * (xf - mean + x_old - mean_old), 0.0)
+            self.sum_ix[f] += (w - 1) * xf - (mean_old * w - x_old)
+            self.mean[f] = mean
+            self.buffer[f, pos] = xf
+            self.head[f] = (pos + 1) % w
+
+    def _features(self, u: np.ndarray, x: np.ndarray) -> np.ndarray:
+        n = self.count[u][:, None].astype(np.float64)
+        mean = self.mean[u]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.where(n > 0, np.sqrt(self.m2[u] / n), 0.0)
+        slope = _slope(n, mean * n, self.sum_ix[u])
+        return _stack(x, mean, std, slope, self.ewma[u])
+
+    def update(self, equipment_ids: Iterable, X: Any, timestamps: Iterable | None = None) -> np.ndarray:
+        """
+        Add readings and return each row's extended features as of that reading.
+
+        ``X`` is (rows, columns) in ``self.columns`` order (or a DataFrame
+        with those columns); ``timestamps`` are epoch ms, and rows of one unit
+        must be in time order. Without timestamps every row counts as new.
+        Units seen for the first time start from their current reading
+        (std and slope 0).
+        """
+        if isinstance(X, pd.DataFrame):
+            X = X.loc[:, self.columns].to_numpy(dtype=np.float64)
+        x = np.asarray(X, dtype=np.float64).reshape(-1, len(self.columns))
+        ts = np.asarray(timestamps, dtype=np.int64) if timestamps is not None else None
+        with self._lock:
+            return self._update(equipment_ids, x, ts)
+
+    def _update(self, equipment_ids: Iterable, x: np.ndarray, ts: np.ndarray | None) -> np.ndarray:
+        slots = self._slots(equipment_ids)
+        out = np.empty((len(slots), len(self.feature_columns)))
+        if not len(slots):
+            return out
+
+        # Repeated units are applied in passes, one reading per unit each
+        order = np.argsort(slots, kind="stable")
+        sorted_slots = slots[order]
+        starts = np.flatnonzero(np.r_[True, sorted_slots[1:] != sorted_slots[:-1]])
+        rank = np.empty(len(slots), dtype=np.int64)
+        rank[order] = np.arange(len(slots)) - np.repeat(starts, np.diff(np.r_[starts, len(slots)]))
+        if not rank.any():
+            self._apply(slots, x, ts)
+            out[:] = self._features(slots, x)
+            return out
+        for r in range(int(rank.max()) + 1):
+            rows = np.flatnonzero(rank == r)
+            self._apply(slots[rows], x[rows], ts[rows] if ts is not None else None)
+            out[rows] = self._features(slots[rows], x[rows])
+        return out
+
+    def frame(self, equipment_ids: Iterable, X: Any, timestamps: Iterable | None = None) -> pd.DataFrame:
+        """``update`` as a DataFrame with ``feature_columns``."""
+        return pd.DataFrame(self.update(equipment_ids, X, timestamps), columns=self.feature_columns)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"units": self._size, "window": self.window, "capacity": int(len(self.count))}
+
+
+def add_rolling_features(
+    df: pd.DataFrame,
+    window: int = DEFAULT_WINDOW,
+    alpha: float | None = None,
+    columns: Iterable[str] = FEATURE_COLUMNS,
+    group_column: str = "equipment_id",
+    time_column: str = "timestamp",
+    chunk_rows: int = 65_536,
+) -> pd.DataFrame:
+    """
+    A copy of ``df`` with the rolling columns added, computed offline.
+
+    Rows are ordered by (``group_column``, ``time_column``); a frame without
+    the group column is one series. Values match what ``RollingFeatures``
+    returns when the same readings are streamed through it, so a model
+    trained on this frame sees the features it is served.
+    """
+    spec = rolling_spec(window, alpha)
+    w, a = spec["window"], spec["alpha"]
+    columns = list(columns)
+    by = [c for c in (group_column, time_column) if c in df.columns]
+    order = np.lexsort([df[c].to_numpy() for c in reversed(by)]) if by else np.arange(len(df))
+    x_all = df[columns].to_numpy(dtype=np.float64)[order]
+
+    n_rows = len(df)
+    if group_column in df.columns:
+        groups = pd.factorize(df[group_column].to_numpy()[order])[0]
+    else:
+        groups = np.zeros(n_rows, dtype=np.int64)
+    new_group = np.ones(n_rows, dtype=bool)
+    new_group[1:] = groups[1:] != groups[:-1]
+    group_start = np.maximum.accumulate(np.where(new_group, np.arange(n_rows), 0))
+
+    # EWMA is recursive over each group's whole history
+    ewma = pd.DataFrame(x_all).groupby(groups, sort=False).ewm(alpha=a, adjust=False).mean()
+    ewma = ewma.droplevel(0).sort_index().to_numpy()
+
+    out = np.empty((n_rows, len(columns) * (1 + len(ROLLING_STATS))))
+    offsets = np.arange(w) - (w - 1)
+    for start in range(0, n_rows, chunk_rows):
+        stop = min(n_rows, start + chunk_rows)
+        rows = np.arange(start, stop)
+        idx = rows[:, None] + offsets[None, :]
+        valid = idx >= group_start[rows][:, None]
+        n = valid.sum(axis=1)[:, None].astype(np.float64)
+        vals = x_all[np.maximum(idx, 0)]  # (rows, w, columns)
+        vals = np.where(valid[:, :, None], vals, 0.0)
+        mean = vals.sum(axis=1) / n
+        dev = np.where(valid[:, :, None], vals - mean[:, None, :], 0.0)
+        std = np.sqrt((dev * dev).sum(axis=1) / n)
+        # Valid readings are the last n of the window, at positions 0..n-1
+        pos = np.clip(np.arange(w)[None, :] - (w - n), 0, None)
+        sum_ix = (vals * pos[:, :, None]).sum(axis=1)
+        slope = _slope(n, vals.sum(axis=1), sum_ix)
+        out[start:stop] = _stack(x_all[start:stop], mean, std, slope, ewma[start:stop])
+
+    result = df.copy()
+    names = extended_columns(columns)[len(columns):]
+    inverse = np.empty(n_rows, dtype=np.int64)
+    inverse[order] = np.arange(n_rows)
+    extra = out[inverse, len(columns):]
+    for k, name in enumerate(names):
+        result[name] = extra[:, k]
+    return result
@@ -0,0 +1,204 @@
+import copy
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Tuple
+
+import numpy as np
+
+from predictive_model import TrainedModel, _ensure_array, predict_failure_arrays
+
+
+class _Request:
+    __slots__ = ("model", "X", "done", "result", "error")
+
+    def __init__(self, model: TrainedModel, X: np.ndarray) -> None:
+        self.model = model
+        self.X = X
+        self.done = threading.Event()
+        self.result: Tuple[np.ndarray, np.ndarray] | None = None
+        self.error: BaseException | None = None
+
+
+class InferenceExecutor:
+    """
+    Micro-batches concurrent ``predict`` calls into one vectorized predict.
+
+    A single worker thread takes the oldest waiting request, then keeps
+    collecting until the batch holds ``max_batch`` rows or ``max_wait``
+    seconds have passed. It stops waiting early once every caller currently
+    inside ``predict`` is in the batch, so a lone caller pays no batching
+    delay. Requests larger than ``max_batch`` rows skip the queue.
+
+    Inference runs on a shallow copy of the estimator with ``n_jobs`` set
+    (default 1), so no request starts a joblib thread pool of its own.
+    """
+
+    def __init__(self, max_batch: int = 64, max_wait: float = 0.002, n_jobs: int | None = 1) -> None:
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.n_jobs = n_jobs
+
+        self._queue: Deque[_Request] = deque()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._models: Dict[int, Tuple[TrainedModel, TrainedModel]] = {}
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._stop = False
+
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.direct = 0
+        self.errors = 0
+        self.batch_sizes: Counter = Counter()
+
+    def _inference_model(self, model: TrainedModel) -> TrainedModel:
+        # Called with the condition held
+        entry = self._models.get(id(model))
+        if entry is not None and entry[0] is model:
+            return entry[1]
+        clf = model.model
+        if clf is not None and self.n_jobs is not None and getattr(clf, "n_jobs", None) != self.n_jobs:
+            clf = copy.copy(clf)
+            clf.n_jobs = self.n_jobs
+        tuned = TrainedModel(
+            model=clf,
+            feature_columns=model.feature_columns,
+            compiled=model.compiled,
+            version=model.version,
+            rolling=model.rolling,
+        )
+        # Keep only the current model (and one predecessor during a reload)
+        if len(self._models) >= 2:
+            self._models.clear()
+        self._models[id(model)] = (model, tuned)
+        return tuned
+
+    def predict(self, model: TrainedModel, X: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """(failure_probability, health_score) for the rows of X, as predict_failure_arrays returns."""
+        X_arr = _ensure_array(X, list(model.feature_columns))
+        if X_arr.shape[0] > self.max_batch:
+            with self._cond:
+                self.direct += 1
+                self.requests += 1
+                self.rows += X_arr.shape[0]
+                tuned = self._inference_model(model)
+            return predict_failure_arrays(tuned, X_arr)
+
+        request = _Request(model, X_arr)
+        with self._cond:
+            self._ensure_started()
+            self._in_flight += 1
+            self._queue.append(request)
+            self._cond.notify_all()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result  # type: ignore[return-value]
+
+    def _ensure_started(self) -> None:
+        # Called with the condition held; restarts the worker after fork()
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._stop = False
+            self._queue = deque()
+            self._in_flight = 0
+            self._thread = threading.Thread(target=self._run, name="inference-executor", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=5)
+
+    def _collect(self) -> List[_Request]:
+        with self._cond:
+            while not self._queue and not self._stop:
+                self._cond.wait()
+            if not self._queue:
+                return []
+            first = self._queue.popleft()
+            batch = [first]
+            rows = first.X.shape[0]
+            deadline = time.perf_counter() + self.max_wait
+            while rows < self.max_batch:
+                if self._queue:
+                    if self._queue[0].model is not first.model:
+                        break
+                    if rows + self._queue[0].X.shape[0] > self.max_batch:
+                        break
+                    request = self._queue.popleft()
+                    batch.append(request)
+                    rows += request.X.shape[0]
+                    continue
+                # Nobody else is waiting for a result: run now
+                if len(batch) >= self._in_flight:
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            model = batch[0].model
+            try:
+                with self._cond:
+                    tuned = self._inference_model(model)
+                X = batch[0].X if len(batch) == 1 else np.concatenate([r.X for r in batch])
+                failure_prob, health_score = predict_failure_arrays(tuned, X)
+                start = 0
+                for request in batch:
+                    stop = start + request.X.shape[0]
+                    request.result = (failure_prob[start:stop], health_score[start:stop])
+                    start = stop
+            except BaseException as exc:  # hand the error to every caller
+                for request in batch:
+                    request.error = exc
+                with self._cond:
+                    self.errors += 1
+            with self._cond:
+                self._in_flight -= len(batch)
+                self.requests += len(batch)
+                self.rows += sum(r.X.shape[0] for r in batch)
+                self.batches += 1
+                self.batch_sizes[1 << (len(batch) - 1).bit_length()] += 1
+            for request in batch:
+                request.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "n_jobs": self.n_jobs,
+                "requests": self.requests,
+                "rows": self.rows,
+                "batches": self.batches,
+                "direct": self.direct,
+                "errors": self.errors,
+                "queue_depth": len(self._queue),
+                "mean_batch_requests": round((self.requests - self.direct) / self.batches, 2) if self.batches else None,
+                "batch_requests": {str(k): v for k, v in sorted(self.batch_sizes.items())},
+            }
+
+
+def create_executor_from_env() -> InferenceExecutor | None:
+    """Build the shared executor from INFER_* settings; INFER_BATCHING=0 disables it."""
+    if os.environ.get("INFER_BATCHING", "1") == "0":
+        return None
+    n_jobs = int(os.environ.get("INFER_N_JOBS", "1"))
+    return InferenceExecutor(
+        max_batch=int(os.environ.get("INFER_MAX_BATCH", "64")),
+        max_wait=float(os.environ.get("INFER_MAX_WAIT_MS", "2")) / 1000.0,
+        n_jobs=None if n_jobs == 0 else n_jobs,
+    )
@@ -0,0 +1,288 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Tuple
+
+import database
+from metrics import stage
+
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueueFull(RuntimeError):
+    """Raised when the writer queue stays full for longer than the put timeout."""
+
+
+class _Flush:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+_READING = "reading"
+_PREDICTION = "prediction"
+_ALERT = "alert"
+
+
+def _batch_bucket(size: int) -> str:
+    # Power-of-two buckets keep the batch-size histogram small
+    bound = 1
+    while bound < size:
+        bound *= 2
+    return str(bound)
+
+
+class IngestWriter:
+    """
+    Background writer that group-commits sensor readings, prediction
+    records and alert transitions.
+
+    Request handlers enqueue rows and return; a single thread drains the queue
+    into one ``executemany`` transaction per batch, flushing when
+    ``max_batch`` rows are pending or ``flush_interval`` seconds have passed.
+    The rows of one ``submit_*`` call are one queue item, so they are
+    enqueued and written together or not at all. When the queue is full,
+    ``submit_*`` blocks for up to ``put_timeout`` seconds and then raises
+    IngestQueueFull. A failed transaction (e.g. SQLITE_BUSY past the busy
+    timeout) is retried up to ``max_retries`` times with doubling backoff
+    from ``retry_backoff`` seconds before its rows are logged and dropped.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 10000,
+        max_batch: int = 500,
+        flush_interval: float = 0.25,
+        put_timeout: float = 1.0,
+        max_retries: int = 3,
+        retry_backoff: float = 0.1,
+    ) -> None:
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.enqueued = 0
+        self.rejected = 0
+        self.rows_written = 0
+        self.batches_written = 0
+        self.write_errors = 0
+        self.write_retries = 0
+        self.rows_dropped = 0
+        self.last_batch_size = 0
+        self.max_queue_depth = 0
+        self.batch_sizes: Counter = Counter()
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def submit_reading(
+        self,
+        ts: Any,
+        temperature: float,
+        vibration: float,
+        pressure: float,
+        current: float,
+        equipment_id: str = "",
+    ) -> None:
+        self._put((_READING, [(ts, temperature, vibration, pressure, current, equipment_id)]))
+
+    def submit_predictions(self, records: Iterable[Dict[str, Any]]) -> None:
+        self._put((_PREDICTION, list(records)))
+
+    def submit_alert_transitions(self, rows: Iterable[Tuple[Any, ...]]) -> None:
+        self._put((_ALERT, list(rows)))
+
+    def _put(self, item: Tuple[str, List[Any]]) -> None:
+        if not item[1]:
+            return
+        self._ensure_started()
+        try:
+            self._queue.put(item, timeout=self.put_timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += len(item[1])
+            raise IngestQueueFull(f"ingest queue full ({self.max_queue} items)")
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self.enqueued += len(item[1])
+            if depth > self.max_queue_depth:
+                self.max_queue_depth = depth
+
+    def flush(self, timeout: float | None = 10.0) -> bool:
+        """Block until everything enqueued before this call is committed."""
+        if not self._running():
+            return True
+        marker = _Flush()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def stop(self, timeout: float | None = 10.0) -> None:
+        """Flush pending rows and stop the writer thread."""
+        if not self._running():
+            return
+        self._queue.put(_STOP)
+        assert self._thread is not None
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self.max_queue,
+                "max_queue_depth": self.max_queue_depth,
+                "enqueued": self.enqueued,
+                "rejected": self.rejected,
+                "rows_written": self.rows_written,
+                "batches_written": self.batches_written,
+                "write_errors": self.write_errors,
+                "write_retries": self.write_retries,
+                "rows_dropped": self.rows_dropped,
+                "last_batch_size": self.last_batch_size,
+                "batch_sizes": dict(sorted(self.batch_sizes.items(), key=lambda kv: int(kv[0]))),
+                "running": self._running(),
+            }
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+    def _running(self) -> bool:
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def _ensure_started(self) -> None:
+        if self._running():
+            return
+        with self._start_lock:
+            if self._running():
+                return
+            if self._pid != os.getpid():
+                # Queue contents inherited across a fork belong to the parent
+                self._queue = queue.Queue(maxsize=self.max_queue)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch: List[Tuple[str, List[Any]]] = []
+            markers: List[_Flush] = []
+            stop = False
+            rows = 0
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, _Flush):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+                    rows += len(item[1])
+                if stop or markers or rows >= self.max_batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if stop or markers:
+                # Drain whatever is already queued so flush/stop cover it
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, _Flush):
+                        markers.append(item)
+                    else:
+                        batch.append(item)
+
+            # Split at max_batch rows, keeping each submitted item whole
+            chunk: List[Tuple[str, List[Any]]] = []
+            chunk_rows = 0
+            for item in batch:
+                if chunk and chunk_rows + len(item[1]) > self.max_batch:
+                    self._write(chunk)
+                    chunk, chunk_rows = [], 0
+                chunk.append(item)
+                chunk_rows += len(item[1])
+            self._write(chunk)
+            for marker in markers:
+                marker.done.set()
+            if stop:
+                return
+
+    def _write(self, batch: List[Tuple[str, List[Any]]]) -> None:
+        if not batch:
+            return
+        readings = [row for kind, rows in batch if kind == _READING for row in rows]
+        predictions = [row for kind, rows in batch if kind == _PREDICTION for row in rows]
+        alerts = [row for kind, rows in batch if kind == _ALERT for row in rows]
+        n_rows = len(readings) + len(predictions) + len(alerts)
+        for attempt in range(self.max_retries + 1):
+            try:
+                with stage("db_write", endpoint="ingest_writer"), database.get_conn() as conn:
+                    if readings:
+                        database.write_readings(conn, readings)
+                    if predictions:
+                        database.write_predictions(conn, predictions)
+                    if alerts:
+                        database.write_alert_transitions(conn, alerts)
+                break
+            except Exception:
+                with self._stats_lock:
+                    self.write_errors += 1
+                if attempt == self.max_retries:
+                    with self._stats_lock:
+                        self.rows_dropped += n_rows
+                    logger.exception("ingest writer dropped %d rows after %d attempts", n_rows, attempt + 1)
+                    return
+                with self._stats_lock:
+                    self.write_retries += 1
+                logger.warning("ingest write failed, retrying (attempt %d of %d)", attempt + 1, self.max_retries + 1)
+                time.sleep(self.retry_backoff * 2 ** attempt)
+        with self._stats_lock:
+            self.rows_written += n_rows
+            self.batches_written += 1
+            self.last_batch_size = n_rows
+            self.batch_sizes[_batch_bucket(n_rows)] += 1
+
+
+def create_writer_from_env() -> IngestWriter | None:
+    """Build the app's writer from INGEST_* settings; INGEST_ASYNC=0 disables it."""
+    if os.environ.get("INGEST_ASYNC", "1") == "0":
+        return None
+    writer = IngestWriter(
+        max_queue=int(os.environ.get("INGEST_MAX_QUEUE", "10000")),
+        max_batch=int(os.environ.get("INGEST_MAX_BATCH", "500")),
+        flush_interval=float(os.environ.get("INGEST_FLUSH_INTERVAL", "0.25")),
+        put_timeout=float(os.environ.get("INGEST_PUT_TIMEOUT", "1.0")),
+        max_retries=int(os.environ.get("INGEST_MAX_RETRIES", "3")),
+        retry_backoff=float(os.environ.get("INGEST_RETRY_BACKOFF", "0.1")),
+    )
+    atexit.register(writer.stop)
+    return writer
@@ -0,0 +1,267 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+
+class TooManySubscribers(RuntimeError):
+    """Raised when a new stream would exceed the subscriber limit."""
+
+
+def format_event(event: str, data: Any, event_id: int | None = None) -> bytes:
+    """One Server-Sent Events frame; ``data`` is JSON-encoded on a single line."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class Subscriber:
+    """
+    One stream's pending frames, coalesced by event name.
+
+    A newer frame of an event replaces the one still waiting, so a client
+    that falls behind receives only the latest state of each event and
+    the buffer never holds more than ``max_pending`` frames.
+    """
+
+    __slots__ = ("pending", "since", "coalesced", "closed", "reason", "_lock", "_ready")
+
+    def __init__(self) -> None:
+        self.pending: "OrderedDict[str, bytes]" = OrderedDict()
+        self.since = 0.0
+        self.coalesced = 0
+        self.closed = False
+        self.reason = ""
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def offer(self, frames: List[Tuple[str, bytes]], now: float, max_pending: int, max_lag: float) -> bool:
+        """Queue frames; returns False if the subscriber is too far behind and was closed."""
+        with self._lock:
+            if self.closed:
+                return False
+            if self.pending and now - self.since > max_lag:
+                self._close("slow_consumer")
+                return False
+            if not self.pending:
+                self.since = now
+            for event, frame in frames:
+                if event in self.pending:
+                    self.coalesced += 1
+                    del self.pending[event]
+                self.pending[event] = frame
+            if len(self.pending) > max_pending:
+                self._close("buffer_full")
+                return False
+        self._ready.set()
+        return True
+
+    def _close(self, reason: str) -> None:
+        # Called with the lock held
+        self.closed = True
+        self.reason = reason
+        self.pending.clear()
+        self._ready.set()
+
+    def close(self, reason: str = "closed") -> None:
+        with self._lock:
+            self._close(reason)
+
+    def take(self, timeout: float) -> bytes | None:
+        """Pending frames joined (b"" on timeout), or None once closed."""
+        self._ready.wait(timeout)
+        with self._lock:
+            self._ready.clear()
+            if self.closed:
+                return None
+            frames = b"".join(self.pending.values())
+            self.pending.clear()
+            return frames
+
+
+class LiveFeed:
+    """
+    Computes live events once per tick and fans them out to every stream.
+
+    ``compute`` returns [(event, payload), ...]; each payload is serialized
+    once and the same bytes go to all subscribers, so the cost per tick
+    does not grow with the number of open dashboards beyond one buffer
+    update each. The tick thread starts with the first subscriber and idles
+    while there are none. Publishing never blocks on a client: frames
+    queue per subscriber with coalescing, and a subscriber whose oldest
+    frame has waited more than ``max_lag`` seconds is disconnected (the
+    browser's EventSource reconnects and gets a fresh snapshot).
+    """
+
+    def __init__(
+        self,
+        compute: Callable[[], List[Tuple[str, Any]]],
+        interval: float = 10.0,
+        max_subscribers: int = 2000,
+        max_pending: int = 16,
+        max_lag: float = 30.0,
+        heartbeat: float = 15.0,
+        retry_ms: int = 3000,
+    ) -> None:
+        self.compute = compute
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self.max_pending = max_pending
+        self.max_lag = max_lag
+        self.heartbeat = heartbeat
+        self.retry_ms = retry_ms
+
+        self._subscribers: List[Subscriber] = []
+        self._last: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._stop = False
+        self._event_id = 0
+
+        self.ticks = 0
+        self.compute_errors = 0
+        self.frames_published = 0
+        self.dropped: Dict[str, int] = {"slow_consumer": 0, "buffer_full": 0}
+        self.last_compute_seconds = 0.0
+        self.last_fanout_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Subscribers
+    # ------------------------------------------------------------------
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber()
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers(f"live stream limit reached ({self.max_subscribers} subscribers)")
+            self._subscribers.append(sub)
+            # Start from the latest state instead of waiting for the next tick
+            if self._last:
+                sub.offer(list(self._last.items()), time.monotonic(), self.max_pending, self.max_lag)
+            self._ensure_started()
+            self._wake.notify_all()
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        sub.close()
+        with self._lock:
+            try:
+                self._subscribers.remove(sub)
+            except ValueError:
+                pass
+
+    def stream(self, sub: Subscriber) -> Iterator[bytes]:
+        """SSE body for one subscriber; unsubscribes when the client goes away."""
+        try:
+            yield f"retry: {self.retry_ms}\n\n".encode()
+            while True:
+                frames = sub.take(self.heartbeat)
+                if frames is None:
+                    return
+                yield frames or b": keepalive\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+    # ------------------------------------------------------------------
+    # Tick thread
+    # ------------------------------------------------------------------
+    def publish(self, events: List[Tuple[str, Any]]) -> None:
+        """Serialize events once and offer them to every subscriber."""
+        with self._lock:
+            self._event_id += 1
+            frames = [(event, format_event(event, data, self._event_id)) for event, data in events]
+            self._last.update(frames)
+            subscribers = list(self._subscribers)
+        started = time.perf_counter()
+        now = time.monotonic()
+        gone = []
+        for sub in subscribers:
+            if not sub.offer(frames, now, self.max_pending, self.max_lag):
+                gone.append(sub)
+        with self._lock:
+            for sub in gone:
+                self.dropped[sub.reason] = self.dropped.get(sub.reason, 0) + 1
+                try:
+                    self._subscribers.remove(sub)
+                except ValueError:
+                    pass
+            self.frames_published += len(frames) * (len(subscribers) - len(gone))
+            self.last_fanout_seconds = time.perf_counter() - started
+
+    def _ensure_started(self) -> None:
+        # Called with the lock held; restarts the thread after fork()
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        next_tick = time.monotonic()
+        while True:
+            with self._lock:
+                while not self._subscribers and not self._stop:
+                    self._wake.wait()
+                    next_tick = time.monotonic()
+                if self._stop:
+                    return
+            started = time.perf_counter()
+            try:
+                events = self.compute()
+            except Exception:
+                self.compute_errors += 1
+                events = []
+            self.last_compute_seconds = time.perf_counter() - started
+            if events:
+                self.publish(events)
+            self.ticks += 1
+            next_tick = max(next_tick + self.interval, time.monotonic())
+            with self._lock:
+                # New subscribers notify too; keep sleeping until the tick is due
+                while not self._stop and time.monotonic() < next_tick:
+                    self._wake.wait(next_tick - time.monotonic())
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stop = True
+            self._wake.notify_all()
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.close("shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "max_subscribers": self.max_subscribers,
+                "interval_seconds": self.interval,
+                "ticks": self.ticks,
+                "compute_errors": self.compute_errors,
+                "frames_published": self.frames_published,
+                "coalesced": sum(s.coalesced for s in self._subscribers),
+                "dropped": dict(self.dropped),
+                "last_compute_ms": round(self.last_compute_seconds * 1000.0, 3),
+                "last_fanout_ms": round(self.last_fanout_seconds * 1000.0, 3),
+            }
+
+
+def create_feed_from_env(compute: Callable[[], List[Tuple[str, Any]]], interval: float) -> LiveFeed:
+    """
+    Build the live feed; LIVE_* settings override the tick interval and client limits.
+
+    Every open stream holds a worker thread for as long as it stays open. Under
+    a threaded (gthread) worker, LIVE_MAX_SUBSCRIBERS must stay below the
+    thread count, so some threads are always left for API requests; clients
+    over the limit get a 503 and fall back to polling. The 2000 default
+    assumes an async worker class (the Procfile's "stream" process).
+    """
+    return LiveFeed(
+        compute,
+        interval=float(os.environ.get("LIVE_TICK_SECONDS", str(interval))),
+        max_subscribers=int(os.environ.get("LIVE_MAX_SUBSCRIBERS", "2000")),
+        max_pending=int(os.environ.get("LIVE_MAX_PENDING", "16")),
+        max_lag=float(os.environ.get("LIVE_MAX_LAG_SECONDS", "30")),
+        heartbeat=float(os.environ.get("LIVE_HEARTBEAT_SECONDS", "15")),
+    )
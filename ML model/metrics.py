@@ -0,0 +1,339 @@
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+
+# Latency buckets in seconds, 50us to 10s
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_NAME_UNSAFE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+class Histogram:
+    """Fixed-bucket histogram; ``observe`` is a bisect and three additions under a lock."""
+
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class HistogramFamily:
+    """Histograms of one metric name, one per combination of label values."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]) -> None:
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._children: Dict[Tuple[str, ...], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Histogram:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for values, hist in sorted(self._children.items()):
+            counts, total, count = hist.snapshot()
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, values))
+            sep = "," if labels else ""
+            cumulative = 0
+            for bound, n in zip(self.bounds_text(), counts):
+                cumulative += n
+                yield f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}'
+            yield f"{self.name}_sum{{{labels}}} {total:.9g}"
+            yield f"{self.name}_count{{{labels}}} {count}"
+
+    def bounds_text(self) -> List[str]:
+        return [f"{b:g}" for b in self.buckets] + ["+Inf"]
+
+
+class Registry:
+    """
+    Histogram families plus gauge collectors, rendered in Prometheus text format.
+
+    A collector is a callable returning a (possibly nested) stats dict, such
+    as ``IngestWriter.stats``; its numeric leaves become gauges named
+    ``<prefix>_<path>``. Non-numeric values are skipped, and a collector that
+    raises is left out of that scrape.
+    """
+
+    def __init__(self) -> None:
+        self._families: Dict[str, HistogramFamily] = {}
+        self._collectors: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+        self._lock = threading.Lock()
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> HistogramFamily:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = HistogramFamily(name, help_text, label_names, buckets)
+            return family
+
+    def add_collector(self, prefix: str, collect: Callable[[], Dict[str, Any]]) -> None:
+        with self._lock:
+            self._collectors = [(p, c) for p, c in self._collectors if p != prefix]
+            self._collectors.append((prefix, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in list(self._families.values()):
+            lines.extend(family.render())
+        for prefix, collect in list(self._collectors):
+            try:
+                stats = collect()
+            except Exception:
+                continue
+            for name, value in _flatten(prefix, stats):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value:.9g}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _flatten(prefix: str, stats: Dict[str, Any]) -> Iterator[Tuple[str, float]]:
+    for key, value in stats.items():
+        name = _NAME_UNSAFE.sub("_", f"{prefix}_{key}")
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, bool):
+            yield name, float(value)
+        elif isinstance(value, (int, float)):
+            yield name, float(value)
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "app_stage_seconds", "Time spent in each stage of a request or background job.", ("endpoint", "stage")
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "app_request_seconds", "Request handling time until the response is returned.", ("endpoint", "method", "status")
+)
+
+# Endpoint label for stages timed during the current request
+_endpoint: ContextVar[str] = ContextVar("metrics_endpoint", default="none")
+
+
+class stage:
+    """
+    Time the enclosed block into app_stage_seconds under the current endpoint.
+
+    A plain class rather than a generator context manager, so a timed stage
+    costs a few microseconds and can wrap every stage of every request.
+    """
+
+    __slots__ = ("name", "endpoint", "start")
+
+    def __init__(self, name: str, endpoint: str | None = None) -> None:
+        self.name = name
+        self.endpoint = endpoint
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc: Any) -> None:
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.labels(self.endpoint or _endpoint.get(), self.name).observe(elapsed)
+
+
+class SlowRequestProfiler:
+    """
+    Sampling profiler that keeps stacks only for slow requests.
+
+    While any instrumented request is running, a daemon thread samples the
+    stacks of request threads every ``interval`` seconds. When a request takes
+    at least ``threshold`` seconds its samples are written to ``out_dir`` in
+    collapsed-stack format (``frame;frame;frame count`` per line), which
+    flamegraph.pl and speedscope read directly. At most ``max_files`` dumps
+    are kept. Fast requests cost one dict insert and delete.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.5,
+        interval: float = 0.005,
+        out_dir: str = os.path.join("data", "profiles"),
+        max_files: int = 50,
+    ) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.out_dir = out_dir
+        self.max_files = max_files
+        self.dumps = 0
+        self.samples = 0
+
+        self._active: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+    def begin(self) -> None:
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._sample_loop, name="slow-request-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def end(self, seconds: float, label: str) -> str | None:
+        """Finish the current thread's request; returns the dump path if it was slow."""
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if not samples or seconds < self.threshold:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(
+            self.out_dir, f"{int(time.time() * 1000)}-{_NAME_UNSAFE.sub('_', label)}-{int(seconds * 1000)}ms.folded"
+        )
+        with open(path, "w") as fh:
+            for stack, count in samples.most_common():
+                fh.write(f"{stack} {count}\n")
+        with self._lock:
+            self.dumps += 1
+        self._prune()
+        return path
+
+    def _prune(self) -> None:
+        try:
+            files = sorted(f for f in os.listdir(self.out_dir) if f.endswith(".folded"))
+        except OSError:
+            return
+        for name in files[: max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.out_dir, name))
+            except OSError:
+                pass
+
+    def _sample_loop(self) -> None:
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                idle = not self._active
+            if idle:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, counter in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != me:
+                        counter[_collapse(frame)] += 1
+                        self.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "threshold_seconds": self.threshold,
+                "active_requests": len(self._active),
+                "samples": self.samples,
+                "dumps": self.dumps,
+            }
+
+
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def create_profiler_from_env() -> SlowRequestProfiler | None:
+    """Build a profiler from SLOW_REQUEST_PROFILE_MS (unset or 0 disables it) and related settings."""
+    threshold_ms = float(os.environ.get("SLOW_REQUEST_PROFILE_MS", "0"))
+    if threshold_ms <= 0:
+        return None
+    return SlowRequestProfiler(
+        threshold=threshold_ms / 1000.0,
+        interval=float(os.environ.get("SLOW_REQUEST_PROFILE_INTERVAL_MS", "5")) / 1000.0,
+        out_dir=os.environ.get("SLOW_REQUEST_PROFILE_DIR", os.path.join("data", "profiles")),
+    )
+
+
+def instrument_app(app, registry: Registry = REGISTRY, profiler: SlowRequestProfiler | None = None) -> None:
+    """
+    Time every request of a Flask app into app_request_seconds, label stages
+    with the request's endpoint, and serve ``registry`` on ``/metrics``.
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def _metrics_begin():
+        g._metrics_start = time.perf_counter()
+        g._metrics_token = _endpoint.set(request.endpoint or "unknown")
+        if profiler is not None:
+            profiler.begin()
+
+    @app.after_request
+    def _metrics_end(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            elapsed = time.perf_counter() - start
+            endpoint = request.endpoint or "unknown"
+            REQUEST_SECONDS.labels(endpoint, request.method, str(response.status_code)).observe(elapsed)
+            if profiler is not None:
+                profiler.end(elapsed, endpoint)
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown(exc):
+        token = g.pop("_metrics_token", None)
+        if token is not None:
+            try:
+                _endpoint.reset(token)
+            except ValueError:
+                pass
+
+    if profiler is not None:
+        registry.add_collector("app_profiler", profiler.stats)
+
+    def metrics_view():
+        return Response(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
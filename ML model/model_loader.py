@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from predictive_model import TrainedModel, load_trained_model, train_model
+
+
+MODEL_LOAD_MODES = ("background", "lazy", "eager")
+
+
+class ModelLoader:
+    """
+    Loads (or trains) the failure model off the request path.
+
+    In ``background`` mode loading starts as soon as ``start`` is called, in
+    ``lazy`` mode on the first ``get``, and ``eager`` blocks in ``start`` as
+    the app used to. A missing artifact is trained and saved first; if loading
+    fails anyway a model is trained in memory so routes still respond.
+    ``get(timeout)`` waits at most ``timeout`` seconds and returns None while
+    the model is not ready, so callers can answer 503 instead of hanging.
+    With ``latency_budget_ms`` a compact variant built by compaction.py may
+    be served instead of the model at ``path``.
+    """
+
+    def __init__(
+        self,
+        path: str = os.path.join("data", "model.pkl"),
+        mode: str = "background",
+        mmap_mode: str | None = "r",
+        latency_budget_ms: float | None = None,
+    ) -> None:
+        if mode not in MODEL_LOAD_MODES:
+            raise ValueError(f"mode must be one of {MODEL_LOAD_MODES}")
+        self.path = path
+        self.mode = mode
+        self.mmap_mode = mmap_mode
+        self.latency_budget_ms = latency_budget_ms
+
+        self._model: TrainedModel | None = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._state = "idle"
+        self._error: str | None = None
+        self._trained = False
+        self._started_at: float | None = None
+        self._load_seconds: float | None = None
+
+    def start(self) -> None:
+        if self.mode == "eager":
+            self._begin()
+            self._load()
+        elif self.mode == "background":
+            self._start_thread()
+
+    def _begin(self) -> bool:
+        with self._lock:
+            # A load started before fork() has no thread in the child
+            if self._pid == os.getpid() or self._ready.is_set():
+                return False
+            self._pid = os.getpid()
+            self._state = "loading"
+            self._started_at = time.perf_counter()
+            return True
+
+    def _start_thread(self) -> None:
+        if not self._begin():
+            return
+        self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+        self._thread.start()
+
+    def _load(self) -> None:
+        model: TrainedModel | None = None
+        try:
+            if not os.path.exists(self.path):
+                self._state = "training"
+                self._trained = True
+                train_model(save_path=self.path)
+                self._state = "loading"
+            model = load_trained_model(self.path, mmap_mode=self.mmap_mode, latency_budget_ms=self.latency_budget_ms)
+        except Exception as exc:
+            # Fallback: create a model in memory so routes still respond
+            self._error = str(exc)
+            self._state = "training"
+            self._trained = True
+            try:
+                model = train_model(save_path=self.path)
+            except Exception as train_exc:
+                self._error = str(train_exc)
+        with self._lock:
+            self._model = model
+            self._state = "ready" if model is not None else "failed"
+            if self._started_at is not None:
+                self._load_seconds = time.perf_counter() - self._started_at
+            self._ready.set()
+
+    def get(self, timeout: float = 0.0) -> TrainedModel | None:
+        """The loaded model, waiting up to ``timeout`` seconds; None if not ready."""
+        if not self._ready.is_set():
+            self._start_thread()
+            self._ready.wait(timeout)
+        return self._model
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            variant = None
+            if self._model is not None:
+                # Compact variants record their name; anything else is the full model
+                variant = ((self._model.training or {}).get("compaction") or {}).get("variant", "full")
+            return {
+                "state": self._state,
+                "ready": self._model is not None,
+                "mode": self.mode,
+                "mmap": self.mmap_mode is not None,
+                "latency_budget_ms": self.latency_budget_ms,
+                "variant": variant,
+                "trained_at_startup": self._trained,
+                "load_seconds": None if self._load_seconds is None else round(self._load_seconds, 3),
+                "error": self._error,
+            }
+
+
+def create_loader_from_env(path: str = os.path.join("data", "model.pkl")) -> ModelLoader:
+    """
+    Build the app's model loader from MODEL_LOAD, MODEL_MMAP (MODEL_MMAP=0
+    copies arrays) and MODEL_LATENCY_BUDGET_MS (p99 budget for choosing a
+    compact variant; unset serves the model at MODEL_PATH).
+    """
+    mmap_mode = None if os.environ.get("MODEL_MMAP", "1") == "0" else "r"
+    budget = os.environ.get("MODEL_LATENCY_BUDGET_MS")
+    return ModelLoader(
+        path=os.environ.get("MODEL_PATH", path),
+        mode=os.environ.get("MODEL_LOAD", "background"),
+        mmap_mode=mmap_mode,
+        latency_budget_ms=float(budget) if budget else None,
+    )
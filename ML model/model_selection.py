@@ -0,0 +1,302 @@
+import itertools
+import json
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from predictive_model import (
+    FEATURE_COLUMNS,
+    TrainedModel,
+    compile_forest,
+    generate_data,
+    new_model_version,
+    predict_failure_arrays,
+    save_trained_model,
+    validation_scores,
+)
+
+
+# Candidate grids per algorithm; every combination is one candidate
+SEARCH_SPACE: Dict[str, Dict[str, list]] = {
+    "random_forest": {
+        "n_estimators": [50, 100, 200],
+        "max_depth": [None, 12],
+        "max_features": ["sqrt", 1.0],
+    },
+    "hist_gradient_boosting": {
+        "max_iter": [100, 200],
+        "max_leaf_nodes": [15, 31],
+        "learning_rate": [0.1],
+    },
+}
+
+# Candidates whose CV average precision is within this of the best compete
+# on latency, then size
+DEFAULT_TOLERANCE = 0.01
+
+
+def candidates(space: Dict[str, Dict[str, list]] = SEARCH_SPACE) -> List[Tuple[str, Dict[str, Any]]]:
+    out = []
+    for algorithm, grid in space.items():
+        keys = list(grid)
+        for values in itertools.product(*(grid[k] for k in keys)):
+            out.append((algorithm, dict(zip(keys, values))))
+    return out
+
+
+def build_estimator(algorithm: str, params: Dict[str, Any], random_state: int = 42, n_jobs: int = 1):
+    if algorithm == "random_forest":
+        from sklearn.ensemble import RandomForestClassifier
+
+        return RandomForestClassifier(
+            random_state=random_state, n_jobs=n_jobs, class_weight="balanced_subsample", **params
+        )
+    if algorithm == "hist_gradient_boosting":
+        from sklearn.ensemble import HistGradientBoostingClassifier
+
+        return HistGradientBoostingClassifier(random_state=random_state, class_weight="balanced", **params)
+    raise ValueError(f"Unknown algorithm: {algorithm}")
+
+
+def time_splits(
+    n_rows: int, n_splits: int = 3, test_fraction: float = 0.2
+) -> Tuple[List[Tuple[slice, slice]], slice, slice]:
+    """
+    Expanding-window folds over the first ``1 - test_fraction`` of the rows
+    (oldest first) plus the final train/holdout split, so no fold is ever
+    validated on data older than its training data.
+    """
+    n_train = int(n_rows * (1.0 - test_fraction))
+    fold = n_train // (n_splits + 1)
+    folds = [(slice(0, fold * k), slice(fold * k, fold * (k + 1))) for k in range(1, n_splits + 1)]
+    return folds, slice(0, n_train), slice(n_train, n_rows)
+
+
+# Set in each worker process by _init_worker
+_DATA: Tuple[pd.DataFrame, np.ndarray] | None = None
+
+
+def _init_worker(X: pd.DataFrame, y: np.ndarray) -> None:
+    global _DATA
+    _DATA = (X, y)
+    try:
+        # One thread per worker so the pool stays inside the CPU budget
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def _evaluate(task: Tuple[int, str, Dict[str, Any], int, float, int]) -> Dict[str, Any]:
+    index, algorithm, params, n_splits, test_fraction, random_state = task
+    X, y = _DATA
+    folds, train, holdout = time_splits(len(y), n_splits, test_fraction)
+    started = time.perf_counter()
+    cv = []
+    for fit_rows, val_rows in folds:
+        est = build_estimator(algorithm, params, random_state)
+        est.fit(X.iloc[fit_rows], y[fit_rows])
+        cv.append(validation_scores(y[val_rows], est.predict_proba(X.iloc[val_rows])[:, 1]))
+    est = build_estimator(algorithm, params, random_state)
+    est.fit(X.iloc[train], y[train])
+    result = {
+        "index": index,
+        "algorithm": algorithm,
+        "params": params,
+        "cv": {k: float(np.nanmean([s[k] for s in cv])) for k in cv[0]},
+        "holdout": validation_scores(y[holdout], est.predict_proba(X.iloc[holdout])[:, 1]),
+        "fit_seconds": round(time.perf_counter() - started, 3),
+        "model": pickle.dumps(est, protocol=pickle.HIGHEST_PROTOCOL),
+    }
+    return result
+
+
+def _artifact_bytes(trained: TrainedModel) -> int:
+    with tempfile.TemporaryDirectory(prefix="model_search_") as tmp:
+        path = os.path.join(tmp, "model.pkl")
+        save_trained_model(trained, path)
+        return os.path.getsize(path)
+
+
+def measure_latency(trained: TrainedModel, rows: np.ndarray, calls: int = 300) -> Dict[str, float]:
+    """p50/p99 of single-row predict_failure_arrays calls, as the prediction endpoints make them."""
+    for row in rows[:10]:
+        predict_failure_arrays(trained, row[None, :])
+    times = np.empty(calls)
+    for i in range(calls):
+        row = rows[i % len(rows)][None, :]
+        start = time.perf_counter()
+        predict_failure_arrays(trained, row)
+        times[i] = time.perf_counter() - start
+    return {"p50_ms": float(np.percentile(times, 50) * 1e3), "p99_ms": float(np.percentile(times, 99) * 1e3)}
+
+
+def choose(
+    results: List[Dict[str, Any]],
+    tolerance: float = DEFAULT_TOLERANCE,
+    max_p99_ms: float | None = None,
+    max_size_mib: float | None = None,
+) -> Dict[str, Any]:
+    """
+    Pick the candidate to ship: among those within ``tolerance`` of the best
+    CV average precision (and inside the latency and size limits, if given),
+    the one with the lowest p99 latency, then the smallest artifact.
+    """
+    allowed = [
+        r for r in results
+        if (max_p99_ms is None or r["latency"]["p99_ms"] <= max_p99_ms)
+        and (max_size_mib is None or r["size_mib"] <= max_size_mib)
+    ] or results
+    best = max(r["cv"]["average_precision"] for r in allowed)
+    close = [r for r in allowed if r["cv"]["average_precision"] >= best - tolerance]
+    return min(close, key=lambda r: (r["latency"]["p99_ms"], r["size_mib"]))
+
+
+def search_models(
+    df: pd.DataFrame | None = None,
+    save_path: str = os.path.join("data", "model.pkl"),
+    report_path: str | None = None,
+    space: Dict[str, Dict[str, list]] = SEARCH_SPACE,
+    cpus: int | None = None,
+    n_splits: int = 3,
+    test_fraction: float = 0.2,
+    tolerance: float = DEFAULT_TOLERANCE,
+    max_p99_ms: float | None = None,
+    max_size_mib: float | None = None,
+    refit: bool = True,
+    random_state: int = 42,
+) -> Tuple[TrainedModel, Dict[str, Any]]:
+    """
+    Cross-validate every candidate in ``space`` on time-ordered splits, in
+    parallel over at most ``cpus`` processes (one thread each), then measure
+    the single-row latency and artifact size of each one sequentially and
+    save the chosen model.
+
+    Accuracy on the holdout (the newest ``test_fraction`` of rows) comes
+    from a fit that never saw it. With ``refit`` the chosen configuration
+    is then refitted on all rows before saving. The report is written as
+    JSON to ``report_path`` (default: next to the model) and its summary is
+    stored in the artifact as ``TrainedModel.training``.
+    """
+    if df is None:
+        df = generate_data(random_state=random_state)
+    if "timestamp" in df:
+        df = df.sort_values("timestamp", kind="stable")
+    X = df[FEATURE_COLUMNS].astype(np.float32).reset_index(drop=True)
+    y = df["failure"].to_numpy(dtype=np.int64)
+    cpus = cpus or int(os.environ.get("MODEL_SEARCH_CPUS", "0")) or os.cpu_count() or 1
+
+    tasks = [(i, a, p, n_splits, test_fraction, random_state) for i, (a, p) in enumerate(candidates(space))]
+    started = time.perf_counter()
+    workers = max(1, min(cpus, len(tasks)))
+    if workers == 1:
+        _init_worker(X, y)
+        results = [_evaluate(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y)) as pool:
+            results = list(pool.map(_evaluate, tasks))
+    search_seconds = time.perf_counter() - started
+
+    # Latency and size are measured one candidate at a time, outside the pool
+    _, _, holdout = time_splits(len(y), n_splits, test_fraction)
+    latency_rows = X.iloc[holdout].to_numpy(dtype=np.float32)
+    fitted = {}
+    for r in results:
+        est = pickle.loads(r.pop("model"))
+        trained = TrainedModel(model=est, feature_columns=FEATURE_COLUMNS, compiled=compile_forest(est))
+        r["latency"] = measure_latency(trained, latency_rows)
+        r["size_mib"] = round(_artifact_bytes(trained) / 2**20, 3)
+        fitted[r["index"]] = est
+
+    chosen = choose(results, tolerance, max_p99_ms, max_size_mib)
+    est = fitted[chosen["index"]]
+    if refit:
+        est = build_estimator(chosen["algorithm"], chosen["params"], random_state, n_jobs=-1)
+        est.fit(X, y)
+
+    summary = {
+        "algorithm": chosen["algorithm"],
+        "params": chosen["params"],
+        "cv": chosen["cv"],
+        "holdout": chosen["holdout"],
+        "latency": chosen["latency"],
+        "size_mib": chosen["size_mib"],
+        "refit_on_all_rows": refit,
+        "rows": int(len(y)),
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+    }
+    trained = TrainedModel(
+        model=est,
+        feature_columns=FEATURE_COLUMNS,
+        compiled=compile_forest(est),
+        version=new_model_version(),
+        training={"selection": summary},
+    )
+    save_trained_model(trained, save_path)
+
+    report = {
+        "chosen": summary,
+        "chosen_index": chosen["index"],
+        "version": trained.version,
+        "cpus": workers,
+        "search_seconds": round(search_seconds, 3),
+        "n_splits": n_splits,
+        "test_fraction": test_fraction,
+        "tolerance": tolerance,
+        "candidates": sorted(results, key=lambda r: -r["cv"]["average_precision"]),
+    }
+    report_path = report_path or os.path.splitext(save_path)[0] + "_report.json"
+    with open(report_path, "w") as fh:
+        json.dump(report, fh, indent=2)
+    return trained, report
+
+
+def _params_text(params: Dict[str, Any]) -> str:
+    return ",".join(f"{k}={v}" for k, v in params.items())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search model configurations and save the best one.")
+    parser.add_argument("--model", default=os.path.join("data", "model.pkl"))
+    parser.add_argument("--rows", type=int, default=1000, help="synthetic rows (ignored with --history)")
+    parser.add_argument("--history", action="store_true", help="sample the stored history instead (see training.py)")
+    parser.add_argument("--db", help="SQLite database for --history (default: data/app.db)")
+    parser.add_argument("--cpus", type=int, help="process budget (default: MODEL_SEARCH_CPUS or all CPUs)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--max-size-mib", type=float)
+    args = parser.parse_args()
+
+    if args.history:
+        import database
+        from training import sample_history
+
+        if args.db:
+            database.configure(args.db)
+        X_hist, y_hist, _ = sample_history()
+        data = pd.DataFrame(X_hist, columns=FEATURE_COLUMNS)
+        data["failure"] = y_hist
+    else:
+        data = generate_data(num_points=args.rows)
+    _, result = search_models(
+        data, args.model, cpus=args.cpus, tolerance=args.tolerance,
+        max_p99_ms=args.max_p99_ms, max_size_mib=args.max_size_mib,
+    )
+    print(f"{'candidate':<58} {'cv AP':>6} {'test AP':>7} {'p50 ms':>7} {'p99 ms':>7} {'MiB':>7}")
+    for r in result["candidates"]:
+        mark = "*" if r["index"] == result["chosen_index"] else " "
+        print(f"{mark}{r['algorithm'] + '[' + _params_text(r['params']) + ']':<57} {r['cv']['average_precision']:6.3f} "
+              f"{r['holdout']['average_precision']:7.3f} {r['latency']['p50_ms']:7.3f} {r['latency']['p99_ms']:7.3f} "
+              f"{r['size_mib']:7.2f}")
+    print(f"{len(result['candidates'])} candidates on {result['cpus']} CPUs in {result['search_seconds']:.1f} s; "
+          f"saved {args.model} (version {result['version']})")
@@ -0,0 +1,175 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from metrics import stage
+from predictive_model import FEATURE_COLUMNS, TrainedModel, _ensure_array, predict_failure_arrays
+
+
+# Per-sensor quantization step, below the noise of the field sensors
+DEFAULT_RESOLUTION: Dict[str, float] = {
+    "temperature": 0.1,   # degrees C
+    "vibration": 0.01,    # mm/s
+    "pressure": 0.01,     # bar
+    "current": 0.1,       # A
+}
+
+Predict = Callable[[TrainedModel, np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+class PredictionCache:
+    """
+    LRU memo of (failure_probability, health_score) per quantized reading.
+
+    Each row of X is rounded to ``resolution`` per sensor; rows that land in
+    a cached cell skip the model. Misses are deduplicated and scored together
+    in one ``predict`` call at the centre of their cell, so a cached result
+    depends only on the key and never on which reading filled it.
+
+    Entries belong to one model version. A call with a different
+    ``TrainedModel.version`` (a new artifact was loaded) drops the whole
+    cache first; ``invalidate`` does the same explicitly. Rows with NaN or
+    infinite values, and models trained with rolling features, are scored
+    without the cache.
+    """
+
+    def __init__(self, max_entries: int = 100_000, resolution: Dict[str, float] | None = None) -> None:
+        resolution = {**DEFAULT_RESOLUTION, **(resolution or {})}
+        unknown = set(resolution) - set(FEATURE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown sensors in resolution: {sorted(unknown)}")
+        if any(resolution[c] <= 0 for c in FEATURE_COLUMNS):
+            raise ValueError("Resolution must be positive")
+        self.max_entries = max_entries
+        self.resolution = resolution
+        self._step = np.array([resolution[c] for c in FEATURE_COLUMNS], dtype=np.float64)
+
+        self._entries: "OrderedDict[bytes, Tuple[float, float]]" = OrderedDict()
+        self._version: str | None = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._clear(None)
+
+    def _clear(self, version: str | None) -> None:
+        # Called with the lock held
+        if self._entries:
+            self.invalidations += 1
+        self._entries = OrderedDict()
+        self._version = version
+
+    def _keys(self, q: np.ndarray) -> List[bytes]:
+        q = np.ascontiguousarray(q)
+        return q.view(np.dtype((np.void, q.dtype.itemsize * q.shape[1]))).ravel().tolist()
+
+    def predict(
+        self,
+        model: TrainedModel,
+        X: Any,
+        predict: Predict = predict_failure_arrays,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(failure_probability, health_score) for the rows of X, as predict_failure_arrays returns."""
+        if list(model.feature_columns) != FEATURE_COLUMNS:
+            # Rolling statistics have no fixed quantization step; score directly
+            X_arr = _ensure_array(X, list(model.feature_columns))
+            with self._lock:
+                self.bypassed += X_arr.shape[0]
+            return predict(model, X_arr)
+        X_arr = _ensure_array(X)
+        n = X_arr.shape[0]
+        failure_prob = np.empty(n, dtype=np.float64)
+        health_score = np.empty(n, dtype=np.float64)
+
+        with stage("cache_lookup"):
+            finite = np.isfinite(X_arr).all(axis=1)
+            rows = np.flatnonzero(finite)
+            q = np.rint(X_arr[rows] / self._step).astype(np.int64)
+            keys = self._keys(q)
+            pending: Dict[bytes, List[int]] = {}
+            with self._lock:
+                if model.version is None or model.version != self._version:
+                    self._clear(model.version)
+                entries = self._entries
+                for i, key in zip(rows.tolist(), keys):
+                    hit = entries.get(key)
+                    if hit is None:
+                        pending.setdefault(key, []).append(i)
+                    else:
+                        entries.move_to_end(key)
+                        failure_prob[i], health_score[i] = hit
+                # Repeats of a missed cell within the batch skip the model too
+                self.hits += len(rows) - len(pending)
+                self.misses += len(pending)
+                self.bypassed += n - len(rows)
+
+        if pending:
+            # Score each missed cell once, at its centre
+            cells = np.frombuffer(b"".join(pending), dtype=np.int64).reshape(len(pending), -1)
+            proba, health = predict(model, (cells * self._step).astype(np.float32))
+            new = list(zip(proba.tolist(), health.tolist()))
+            for (p, h), targets in zip(new, pending.values()):
+                failure_prob[targets] = p
+                health_score[targets] = h
+            with self._lock:
+                if model.version is not None and model.version == self._version:
+                    entries = self._entries
+                    entries.update(zip(pending, new))
+                    overflow = len(entries) - self.max_entries
+                    for _ in range(max(0, overflow)):
+                        entries.popitem(last=False)
+                    self.evictions += max(0, overflow)
+        if len(rows) < n:
+            skipped = np.flatnonzero(~finite)
+            failure_prob[skipped], health_score[skipped] = predict(model, X_arr[skipped])
+        return failure_prob, health_score
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "max_entries": self.max_entries,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "model_version": self._version,
+                "resolution": dict(self.resolution),
+            }
+
+
+def parse_resolution(text: str) -> Dict[str, float]:
+    """``"temperature=0.1,vibration=0.01"`` -> {"temperature": 0.1, "vibration": 0.01}."""
+    resolution: Dict[str, float] = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        resolution[name.strip()] = float(value)
+    return resolution
+
+
+def create_cache_from_env() -> PredictionCache | None:
+    """
+    Build the prediction cache from PREDICTION_CACHE_SIZE (unset or 0 disables
+    it) and PREDICTION_CACHE_RESOLUTION, e.g. ``temperature=0.1,vibration=0.01``.
+    """
+    size = int(os.environ.get("PREDICTION_CACHE_SIZE", "0"))
+    if size <= 0:
+        return None
+    return PredictionCache(
+        max_entries=size,
+        resolution=parse_resolution(os.environ.get("PREDICTION_CACHE_RESOLUTION", "")),
+    )
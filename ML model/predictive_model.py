@@ -1,15 +1,20 @@
 from __future__ import annotations
 
+import json
 import os
-from dataclasses import dataclass
+import uuid
+from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta
-from typing import Iterable, List, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Tuple
 
 import numpy as np
 import pandas as pd
 from joblib import dump, load
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
+
+from metrics import stage
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import RandomForestClassifier
 
 
 FEATURE_COLUMNS: List[str] = [
@@ -20,10 +25,147 @@ FEATURE_COLUMNS: List[str] = [
 ]
 
 
+# Batches up to this many rows go through the compiled forest; larger ones are
+# cheaper in sklearn's native (multi-threaded) tree traversal.
+COMPILED_MAX_ROWS = 256
+
+
+@dataclass
+class CompiledForest:
+    """
+    A RandomForestClassifier flattened into contiguous node arrays.
+
+    All trees share one set of arrays; ``roots`` holds the global index of each
+    tree's root. Leaves point to themselves in ``children`` so traversal can run
+    a fixed number of steps without per-row branching. Compact variants (see
+    compaction.py) may hold float32 thresholds.
+    """
+
+    feature: np.ndarray     # intp, split feature per node (0 for leaves)
+    threshold: np.ndarray   # float64 (or float32), go left when x[feature] <= threshold
+    children: np.ndarray    # intp, shape (n_nodes, 2): left and right child
+    value: np.ndarray       # float64, failure probability at each node
+    roots: np.ndarray       # intp, root node of each tree, ascending
+    depth: int              # deepest root-to-leaf path in the forest
+
+    @property
+    def n_trees(self) -> int:
+        return int(self.roots.shape[0])
+
+    @property
+    def n_nodes(self) -> int:
+        return int(self.value.shape[0])
+
+    def predict_proba(self, X: np.ndarray, chunk_cells: int = 1 << 18) -> np.ndarray:
+        """
+        Failure probability for each row of a 2-D array in FEATURE_COLUMNS order.
+
+        Rows are processed in chunks so the (rows x trees) node matrix stays
+        around ``chunk_cells`` entries.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n = X.shape[0]
+        out = np.empty(n, dtype=np.float64)
+        step = max(1, chunk_cells // max(1, self.n_trees))
+        for start in range(0, n, step):
+            stop = min(n, start + step)
+            out[start:stop] = self._predict_chunk(X[start:stop])
+        return out
+
+    def tree_values(self, X: np.ndarray) -> np.ndarray:
+        """Failure probability from each tree, shape (rows, n_trees), for a 2-D array of rows."""
+        return self.value[self.apply(X)]
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Index of the leaf each row reaches in each tree, shape (rows, n_trees)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        return self._nodes(X.reshape(1, -1) if X.ndim == 1 else X)
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        return self.value[self._nodes(X)].mean(axis=1)
+
+    def _nodes(self, X: np.ndarray) -> np.ndarray:
+        n_rows, n_features = X.shape
+        flat_x = X.ravel()
+        flat_children = self.children.ravel()
+        row_base = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        node = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        for _ in range(self.depth):
+            # float32 inputs against float64 thresholds, as sklearn compares them
+            # (float32 variants round thresholds down, which takes the same branches)
+            go_right = flat_x[row_base + self.feature[node]] > self.threshold[node]
+            node = flat_children[node * 2 + go_right]
+        return node
+
+
+def compile_forest(model) -> CompiledForest | None:
+    """
+    Flatten a fitted RandomForestClassifier into a CompiledForest.
+
+    Returns None for estimators that are not tree ensembles so callers can fall
+    back to ``predict_proba``.
+    """
+    estimators = getattr(model, "estimators_", None)
+    if not estimators or not all(hasattr(est, "tree_") for est in estimators):
+        return None
+    classes = list(getattr(model, "classes_", []))
+    if 1 not in classes:
+        return None
+    positive = classes.index(1)
+
+    features, thresholds, children, values, roots = [], [], [], [], []
+    depth = 0
+    offset = 0
+    for est in estimators:
+        tree = est.tree_
+        node_ids = np.arange(offset, offset + tree.node_count, dtype=np.intp)
+        is_leaf = tree.children_left < 0
+
+        left = np.where(is_leaf, node_ids, tree.children_left + offset)
+        right = np.where(is_leaf, node_ids, tree.children_right + offset)
+
+        # Per-tree class fractions, as DecisionTreeClassifier.predict_proba does
+        counts = tree.value[:, 0, :]
+        totals = counts.sum(axis=1)
+        totals[totals == 0.0] = 1.0
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        children.append(np.stack([left, right], axis=1))
+        values.append(counts[:, positive] / totals)
+        roots.append(offset)
+        depth = max(depth, int(tree.max_depth))
+        offset += tree.node_count
+
+    return CompiledForest(
+        feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+        threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+        children=np.ascontiguousarray(np.concatenate(children), dtype=np.intp),
+        value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+        roots=np.asarray(roots, dtype=np.intp),
+        depth=depth,
+    )
+
+
 @dataclass
 class TrainedModel:
-    model: RandomForestClassifier
+    # None for compact variants that keep only the compiled forest
+    model: RandomForestClassifier | None
     feature_columns: List[str]
+    compiled: CompiledForest | None = None
+    # Identifies the artifact; prediction caches key on it
+    version: str | None = None
+    # Provenance of models trained from history (see training.py)
+    training: Dict[str, Any] | None = None
+    # Rolling-window settings when feature_columns include per-equipment
+    # rolling statistics (see features.py); None for instantaneous readings only
+    rolling: Dict[str, Any] | None = None
+
+
+def new_model_version() -> str:
+    return f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
 
 
 def generate_data(
@@ -44,8 +186,9 @@ def generate_data(
     """
     rng = np.random.default_rng(random_state)
 
-    start_time = datetime.now() - timedelta(days=days)
-    timestamps = [start_time + timedelta(minutes=(i * (days * 24 * 60) / num_points)) for i in range(num_points)]
+    start_time = np.datetime64(datetime.now() - timedelta(days=days), "us")
+    step_us = days * 86_400_000_000 / num_points
+    timestamps = start_time + (np.arange(num_points) * step_us).astype("timedelta64[us]")
 
     # Base signals with diurnal cycles and slight drift
     t = np.linspace(0.0, 2.0 * np.pi * (num_points / (24 * 6)), num_points)
@@ -94,30 +237,55 @@ def generate_data(
     return df.sort_values("timestamp").reset_index(drop=True)
 
 
-def _ensure_dataframe(X: Iterable) -> pd.DataFrame:
+def _ensure_dataframe(X: Iterable, columns: List[str] = FEATURE_COLUMNS) -> pd.DataFrame:
     if isinstance(X, pd.DataFrame):
         # Reorder/select expected columns; missing columns raise KeyError
-        return X.loc[:, FEATURE_COLUMNS]
+        return X.loc[:, columns]
     # Attempt to coerce from array-like
-    X_df = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+    X_df = pd.DataFrame(X, columns=columns)
     return X_df
 
 
+def _model_columns(model: Any) -> List[str]:
+    return list(model.feature_columns) if isinstance(model, TrainedModel) else FEATURE_COLUMNS
+
+
 def train_model(
     df: pd.DataFrame | None = None,
     save_path: str = os.path.join("data", "model.pkl"),
     random_state: int = 42,
     n_estimators: int = 200,
     max_depth: int | None = None,
+    rolling_window: int | None = None,
+    rolling_alpha: float | None = None,
 ) -> TrainedModel:
     """
     Train a RandomForest classifier for failure prediction and save it to disk.
     If df is None, synthetic data is generated.
+
+    With ``rolling_window`` the model also sees per-equipment rolling mean,
+    std, slope and EWMA of each sensor over that many readings, computed by
+    ``features.add_rolling_features`` (rows grouped by ``equipment_id`` when
+    present, in timestamp order). The settings are stored with the model so
+    serving can compute the same features with ``features.RollingFeatures``.
     """
+    # sklearn is imported here (and by unpickling in load_trained_model) so
+    # that importing this module for generate_data stays cheap at startup
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import train_test_split
+
     if df is None:
         df = generate_data(random_state=random_state)
 
-    X = df[FEATURE_COLUMNS]
+    columns, rolling = FEATURE_COLUMNS, None
+    if rolling_window:
+        from features import add_rolling_features, extended_columns, rolling_spec
+
+        rolling = rolling_spec(rolling_window, rolling_alpha)
+        df = add_rolling_features(df, **rolling)
+        columns = extended_columns()
+
+    X = df[columns]
     y = df["failure"].astype(int)
 
     X_train, X_val, y_train, y_val = train_test_split(
@@ -133,18 +301,173 @@ def train_model(
     )
     model.fit(X_train, y_train)
 
-    # Persist model
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    dump({"model": model, "features": FEATURE_COLUMNS}, save_path)
+    trained = TrainedModel(
+        model=model,
+        feature_columns=columns,
+        compiled=compile_forest(model),
+        version=new_model_version(),
+        training={"validation": validation_scores(y_val.to_numpy(), model.predict_proba(X_val)[:, 1])},
+        rolling=rolling,
+    )
+    save_trained_model(trained, save_path)
+    return trained
+
 
-    return TrainedModel(model=model, feature_columns=FEATURE_COLUMNS)
+def validation_scores(y_true: np.ndarray, failure_prob: np.ndarray) -> Dict[str, float]:
+    """Average precision, ROC AUC and Brier score of failure probabilities (NaN if y has one class)."""
+    from sklearn.metrics import average_precision_score, brier_score_loss, roc_auc_score
 
+    if len(np.unique(y_true)) < 2:
+        return {"average_precision": float("nan"), "roc_auc": float("nan"), "brier": float("nan")}
+    return {
+        "average_precision": float(average_precision_score(y_true, failure_prob)),
+        "roc_auc": float(roc_auc_score(y_true, failure_prob)),
+        "brier": float(brier_score_loss(y_true, failure_prob)),
+    }
+
+
+def save_trained_model(trained: TrainedModel, path: str = os.path.join("data", "model.pkl")) -> None:
+    """
+    Persist a model atomically, with its compiled forest as plain arrays.
 
-def load_trained_model(path: str = os.path.join("data", "model.pkl")) -> TrainedModel:
-    obj = load(path)
-    model: RandomForestClassifier = obj["model"]
+    The artifact is written uncompressed so ``load_trained_model(mmap_mode="r")``
+    can map the compiled arrays instead of copying them. Writing to a temporary
+    file and renaming keeps concurrent workers from reading a partial file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if trained.version is None:
+        trained.version = new_model_version()
+    obj = {"model": trained.model, "features": list(trained.feature_columns), "version": trained.version}
+    if trained.training is not None:
+        obj["training"] = trained.training
+    if trained.rolling is not None:
+        obj["rolling"] = trained.rolling
+    if trained.compiled is not None:
+        obj["compiled"] = asdict(trained.compiled)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def variants_path(path: str = os.path.join("data", "model.pkl")) -> str:
+    """Manifest of the compact variants built from the model at ``path`` (see compaction.py)."""
+    return os.path.splitext(path)[0] + "_variants.json"
+
+
+def choose_variant(path: str, latency_budget_ms: float) -> str:
+    """
+    The artifact to serve for a p99 latency budget: the variant listed in
+    the manifest next to ``path`` with the best holdout average precision
+    among those measured within ``latency_budget_ms``, or the fastest one if
+    none is. ``path`` itself when there is no manifest, or when the model
+    there has been replaced since the variants were built.
+    """
+    try:
+        with open(variants_path(path)) as fh:
+            manifest = json.load(fh)
+        st = os.stat(path)
+    except (OSError, ValueError):
+        return path
+    source = manifest.get("source", {})
+    if (source.get("mtime_ns"), source.get("size")) != (st.st_mtime_ns, st.st_size):
+        return path
+    directory = os.path.dirname(path)
+    entries = [v for v in manifest.get("variants", []) if os.path.exists(os.path.join(directory, v["file"]))]
+    if not entries:
+        return path
+
+    def precision(entry: Dict[str, Any]) -> float:
+        value = entry["holdout"]["average_precision"]
+        return float("-inf") if value is None or np.isnan(value) else value
+
+    within = [v for v in entries if v["p99_ms"] <= latency_budget_ms]
+    if within:
+        chosen = max(within, key=lambda v: (precision(v), -v["p99_ms"]))
+    else:
+        chosen = min(entries, key=lambda v: v["p99_ms"])
+    return os.path.join(directory, chosen["file"])
+
+
+def load_trained_model(
+    path: str = os.path.join("data", "model.pkl"),
+    compile_trees: bool = True,
+    mmap_mode: str | None = None,
+    latency_budget_ms: float | None = None,
+) -> TrainedModel:
+    """
+    Load a model saved by ``train_model``.
+
+    With ``mmap_mode="r"`` the compiled forest arrays are memory-mapped from the
+    artifact, so workers on one host share those pages through the OS cache.
+    sklearn copies its own tree arrays on unpickling, so the estimator itself
+    stays private to each process. Older artifacts without compiled arrays are
+    compiled on load, and get a version derived from the file's mtime and size.
+
+    With ``latency_budget_ms`` a compact variant of the model may be loaded
+    instead, as ``choose_variant`` picks it.
+    """
+    if latency_budget_ms is not None:
+        path = choose_variant(path, latency_budget_ms)
+    obj = load(path, mmap_mode=mmap_mode)
+    model: RandomForestClassifier | None = obj["model"]
     features: List[str] = list(obj["features"])  # type: ignore[assignment]
-    return TrainedModel(model=model, feature_columns=features)
+    compiled = None
+    if compile_trees:
+        stored = obj.get("compiled")
+        compiled = CompiledForest(**stored) if stored is not None else compile_forest(model)
+    version = obj.get("version")
+    if version is None:
+        st = os.stat(path)
+        version = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+    return TrainedModel(
+        model=model,
+        feature_columns=features,
+        compiled=compiled,
+        version=version,
+        training=obj.get("training"),
+        rolling=obj.get("rolling"),
+    )
+
+
+def _ensure_array(X: Iterable, columns: List[str] = FEATURE_COLUMNS) -> np.ndarray:
+    if isinstance(X, pd.DataFrame):
+        return X.loc[:, columns].to_numpy(dtype=np.float32)
+    arr = np.asarray(X, dtype=np.float32)
+    if arr.ndim == 1:
+        arr = arr.reshape(1, -1)
+    if arr.shape[1] != len(columns):
+        raise ValueError(f"Expected {len(columns)} feature columns, got {arr.shape[1]}")
+    return arr
+
+
+def predict_failure_arrays(
+    model: RandomForestClassifier | TrainedModel,
+    X: Iterable,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return (failure_probability, health_score) as NumPy arrays.
+
+    Small batches use the compiled forest when available so no DataFrame is
+    built, as do all batches of compact variants without an estimator; X can
+    be a DataFrame or array-like in the order of the model's
+    ``feature_columns`` (FEATURE_COLUMNS unless it was trained with rolling
+    features).
+    """
+    compiled = model.compiled if isinstance(model, TrainedModel) else None
+    clf = model.model if isinstance(model, TrainedModel) else model
+    columns = _model_columns(model)
+    with stage("ensure_array"):
+        X_arr = _ensure_array(X, columns) if compiled is not None else None
+    if X_arr is not None and (X_arr.shape[0] <= COMPILED_MAX_ROWS or clf is None):
+        with stage("predict_proba"):
+            failure_prob = compiled.predict_proba(X_arr)
+    else:
+        with stage("ensure_dataframe"):
+            X_df = _ensure_dataframe(X, columns)
+        with stage("predict_proba"):
+            failure_prob = clf.predict_proba(X_df)[:, 1]
+    health_score = np.clip((1.0 - failure_prob) * 100.0, 0.0, 100.0)
+    return failure_prob, health_score
 
 
 def predict_failure(
@@ -155,17 +478,12 @@ def predict_failure(
     Return failure probabilities and health scores (0-100, higher is healthier).
 
     Input X can be a DataFrame with feature columns or array-like in the order
-    of FEATURE_COLUMNS.
+    of FEATURE_COLUMNS; models trained with rolling features take the extended
+    columns (``features.extended_columns()``), e.g. from ``RollingFeatures.frame``.
     """
-    if isinstance(model, TrainedModel):
-        clf = model.model
-    else:
-        clf = model
-
-    X_df = _ensure_dataframe(X)
-    proba = clf.predict_proba(X_df)  # shape (n, 2) -> [:, 1] is failure prob
-    failure_prob = proba[:, 1]
-    health_score = np.clip((1.0 - failure_prob) * 100.0, 0.0, 100.0)
+    with stage("ensure_dataframe"):
+        X_df = _ensure_dataframe(X, _model_columns(model))
+    failure_prob, health_score = predict_failure_arrays(model, X_df)
 
     result = X_df.copy()
     result["failure_probability"] = failure_prob
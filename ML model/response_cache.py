@@ -0,0 +1,391 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Tuple
+
+from flask import Response, request
+
+
+class Validator(NamedTuple):
+    """What a cached response is valid for: one key at one data version within one time bucket."""
+
+    etag: str
+    last_modified: datetime
+    version: int
+    bucket: int
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    content_type: str
+    headers: Dict[str, str]
+
+
+# Response headers kept with a cached body
+_KEPT_HEADERS = ("Content-Disposition", "Vary")
+
+
+class DiskStore:
+    """
+    Cached bodies as files in one directory, shared by every process (e.g.
+    gunicorn workers) pointed at it. Files are written to a temporary name
+    and renamed into place, so readers never see a partial entry. Reads
+    touch the file; ``put`` trims the directory to ``max_bytes`` by least
+    recent use and drops entries untouched for ``max_age`` seconds, which
+    can no longer be hit once their time bucket has passed.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 512 << 20, max_age: float = 120.0) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def get(self, name: str) -> CachedBody | None:
+        path = self._path(name)
+        try:
+            with open(path, "rb") as fh:
+                meta = json.loads(fh.readline())
+                body = fh.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            with self._lock:
+                self.errors += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return CachedBody(body, meta["content_type"], meta["headers"])
+
+    def put(self, name: str, entry: CachedBody) -> None:
+        tmp = self._path(f".{name}.{uuid.uuid4().hex}.tmp")
+        meta = {"content_type": entry.content_type, "headers": entry.headers}
+        try:
+            with open(tmp, "wb") as fh:
+                fh.write(json.dumps(meta).encode() + b"\n")
+                fh.write(entry.body)
+            os.replace(tmp, self._path(name))
+        except OSError:
+            with self._lock:
+                self.errors += 1
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self.writes += 1
+        self._trim()
+
+    def _trim(self) -> None:
+        files = []
+        now = time.time()
+        with os.scandir(self.root) as it:
+            for item in it:
+                try:
+                    st = item.stat()
+                except FileNotFoundError:
+                    continue
+                if item.name.startswith("."):
+                    # Temporary files left behind by a crashed writer
+                    if now - st.st_mtime > 3600:
+                        self._unlink(item.path)
+                    continue
+                files.append((st.st_mtime, st.st_size, item.path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            if total <= self.max_bytes and now - mtime <= self.max_age:
+                break
+            if self._unlink(path):
+                total -= size
+                with self._lock:
+                    self.evictions += 1
+
+    @staticmethod
+    def _unlink(path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "writes": self.writes, "evictions": self.evictions, "errors": self.errors}
+
+
+class ResponseCache:
+    """
+    Conditional requests and cached bodies for read endpoints whose output
+    depends only on the request, the stored data and the time of day.
+
+    ``respond(key, build)`` validates a response by a weak ETag over the
+    key, the data version (``version()`` returns ``(version, updated_ms)``,
+    bumped by every write) and the current ``ttl``-second time bucket, which
+    covers windows like "the last N days" sliding with the clock. A
+    matching If-None-Match (or, without one, If-Modified-Since) gets a 304
+    before anything is queried. Otherwise the body comes from an LRU in
+    memory bounded by ``max_bytes``, then from the optional ``disk`` store,
+    and only on a miss from ``build()``; concurrent misses on one key wait
+    for the first. Compressed variants are cached next to the body, so a
+    hit costs neither the query nor the compression. Streamed bodies are
+    passed through and stored once they finish, up to ``max_entry_bytes``.
+    """
+
+    def __init__(
+        self,
+        version: Callable[[], Tuple[int, int]],
+        max_bytes: int = 64 << 20,
+        max_entry_bytes: int = 16 << 20,
+        ttl: float = 60.0,
+        disk: DiskStore | None = None,
+        wait_seconds: float = 30.0,
+    ) -> None:
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.version = version
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self.disk = disk
+        self.wait_seconds = wait_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[CachedBody, int, int]]" = OrderedDict()
+        self._bytes = 0
+        self._current = (0, 0)
+        self._inflight: Dict[str, threading.Event] = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.stored = 0
+        self.too_large = 0
+        self.evictions = 0
+
+    def validator(self, key: str) -> Validator:
+        version, updated_ms = self.version()
+        now = time.time()
+        bucket = int(now // self.ttl)
+        digest = hashlib.blake2b(f"{key}\0{version}\0{bucket}".encode(), digest_size=12).hexdigest()
+        # Whole seconds, as HTTP dates carry; the ETag is what decides
+        modified = max(updated_ms / 1000.0, bucket * self.ttl)
+        return Validator(digest, datetime.fromtimestamp(int(modified), tz=timezone.utc), version, bucket)
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _get(self, name: str, tag: Validator, count: bool = True) -> CachedBody | None:
+        with self._lock:
+            item = self._entries.get(name)
+            if item is not None:
+                self._entries.move_to_end(name)
+                self.hits += count
+                return item[0]
+        if self.disk is None:
+            return None
+        entry = self.disk.get(name)
+        if entry is not None:
+            with self._lock:
+                self.disk_hits += count
+            self._put(name, tag, entry, disk=False)
+        return entry
+
+    def _put(self, name: str, tag: Validator, entry: CachedBody, disk: bool = True) -> None:
+        size = len(entry.body)
+        if size > self.max_entry_bytes:
+            with self._lock:
+                self.too_large += 1
+            return
+        with self._lock:
+            self.stored += disk
+            if (tag.version, tag.bucket) > self._current:
+                # Entries of an older version or bucket can never be hit again
+                self._current = (tag.version, tag.bucket)
+                for old in [n for n, (_, v, b) in self._entries.items() if v < tag.version or b < tag.bucket]:
+                    self._bytes -= len(self._entries.pop(old)[0].body)
+            if size <= self.max_bytes:
+                previous = self._entries.pop(name, None)
+                if previous is not None:
+                    self._bytes -= len(previous[0].body)
+                self._entries[name] = (entry, tag.version, tag.bucket)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, (evicted, _, _) = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted.body)
+                    self.evictions += 1
+        if disk and self.disk is not None:
+            self.disk.put(name, entry)
+
+    # ------------------------------------------------------------------
+    # Flask
+    # ------------------------------------------------------------------
+    def _is_not_modified(self, tag: Validator) -> bool:
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(tag.etag)
+        since = request.if_modified_since
+        return since is not None and tag.last_modified <= since
+
+    def _validators(self, response: Response, tag: Validator) -> Response:
+        response.set_etag(tag.etag, weak=True)
+        response.last_modified = tag.last_modified
+        response.cache_control.no_cache = True
+        return response
+
+    def _tee(self, tag: Validator, response: Response, chunks) -> Iterator[bytes]:
+        # Pass a streamed body through and keep it if it completes within max_entry_bytes
+        parts: list | None = []
+        size = 0
+        complete = False
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                if parts is not None:
+                    size += len(chunk)
+                    parts.append(chunk)
+                    if size > self.max_entry_bytes:
+                        parts = None
+                        with self._lock:
+                            self.too_large += 1
+                yield chunk
+            complete = True
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            if complete and parts is not None:
+                self._put(tag.etag, tag, CachedBody(b"".join(parts), response.content_type, _kept(response)))
+
+    def _build(self, tag: Validator, build: Callable[[], Response]) -> Tuple[CachedBody | None, Response | None]:
+        with self._lock:
+            self.misses += 1
+        response = build()
+        if response.status_code != 200:
+            return None, response
+        if response.is_streamed:
+            response.response = self._tee(tag, response, response.response)
+            return None, self._validators(response, tag)
+        entry = CachedBody(response.get_data(), response.content_type, _kept(response))
+        self._put(tag.etag, tag, entry)
+        return entry, None
+
+    def _serve(self, tag: Validator, entry: CachedBody, compressor) -> Response:
+        body, headers = entry.body, dict(entry.headers)
+        response = Response(body, content_type=entry.content_type, headers=headers)
+        if compressor is None or not compressor.compressible(response.mimetype):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = compressor.choose(request.accept_encodings)
+        if encoding is None or len(body) < compressor.min_bytes:
+            return response
+        name = f"{tag.etag}.{encoding}"
+        variant = self._get(name, tag, count=False)
+        if variant is None:
+            variant = CachedBody(compressor.encode(body, encoding), entry.content_type, {})
+            self._put(name, tag, variant)
+        response.set_data(variant.body)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def respond(self, key: str, build: Callable[[], Response], compressor=None) -> Response:
+        """
+        The response for ``key``: 304, cached or built. ``build`` runs only
+        on a miss; non-200 responses are returned as built and not cached.
+        ``compressor`` is the app's encoding.ResponseCompressor, if any.
+        """
+        tag = self.validator(key)
+        if self._is_not_modified(tag):
+            with self._lock:
+                self.not_modified += 1
+            return self._validators(Response(status=304), tag)
+
+        entry = self._get(tag.etag, tag)
+        if entry is None:
+            with self._lock:
+                event = self._inflight.get(tag.etag)
+                leader = event is None
+                if leader:
+                    event = self._inflight[tag.etag] = threading.Event()
+            if not leader:
+                # Another request is building this body; wait for it once
+                event.wait(self.wait_seconds)
+                entry = self._get(tag.etag, tag)
+            if entry is None:
+                try:
+                    entry, response = self._build(tag, build)
+                finally:
+                    if leader:
+                        with self._lock:
+                            self._inflight.pop(tag.etag, None)
+                        event.set()
+                if response is not None:
+                    return response
+        return self._validators(self._serve(tag, entry, compressor), tag)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            out = {
+                "max_bytes": self.max_bytes,
+                "bytes": self._bytes,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "stored": self.stored,
+                "too_large": self.too_large,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+                "ttl_seconds": self.ttl,
+            }
+        if self.disk is not None:
+            out["disk"] = self.disk.stats()
+        return out
+
+
+def _kept(response: Response) -> Dict[str, str]:
+    return {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers}
+
+
+def create_response_cache_from_env(version: Callable[[], Tuple[int, int]]) -> ResponseCache | None:
+    """
+    Build the response cache from RESPONSE_CACHE (``0`` disables caching
+    and conditional requests), RESPONSE_CACHE_MB (memory bound; 0 keeps
+    only the validators and the disk store), RESPONSE_CACHE_MAX_ENTRY_MB,
+    RESPONSE_CACHE_TTL (seconds a response stays valid without new data)
+    and RESPONSE_CACHE_DIR / RESPONSE_CACHE_DISK_MB for a store shared by
+    the workers on one host.
+    """
+    if os.environ.get("RESPONSE_CACHE", "1").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    ttl = float(os.environ.get("RESPONSE_CACHE_TTL", "60"))
+    disk = None
+    directory = os.environ.get("RESPONSE_CACHE_DIR")
+    if directory:
+        disk = DiskStore(
+            directory,
+            max_bytes=int(float(os.environ.get("RESPONSE_CACHE_DISK_MB", "512")) * (1 << 20)),
+            max_age=2 * ttl,
+        )
+    return ResponseCache(
+        version,
+        max_bytes=int(float(os.environ.get("RESPONSE_CACHE_MB", "64")) * (1 << 20)),
+        max_entry_bytes=int(float(os.environ.get("RESPONSE_CACHE_MAX_ENTRY_MB", "16")) * (1 << 20)),
+        ttl=ttl,
+        disk=disk,
+    )
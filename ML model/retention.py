@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+import database
+from metrics import stage
+
+
+class RetentionJob:
+    """
+    Periodically removes rows older than ``days`` off the request path.
+
+    Deletes run in chunks of ``chunk_rows`` rows, each in its own short
+    transaction with a ``pause`` between chunks, so ingestion is never locked
+    out for long. After deleting, up to ``vacuum_pages`` free pages are handed
+    back with an incremental vacuum. The first pass runs ``initial_delay``
+    seconds after start so short-lived workers still get to it.
+    """
+
+    def __init__(
+        self,
+        days: int = 90,
+        interval: float = 3600.0,
+        chunk_rows: int = 5000,
+        pause: float = 0.01,
+        vacuum_pages: int = 2000,
+        initial_delay: float = 60.0,
+    ) -> None:
+        self.days = days
+        self.interval = interval
+        self.chunk_rows = chunk_rows
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self.initial_delay = initial_delay
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.last_run: Dict[str, Any] | None = None
+
+    def run_once(self) -> Dict[str, Any]:
+        """Run one retention pass and return a report of what it did."""
+        started = time.perf_counter()
+        cutoff = database.to_epoch_ms(datetime.now(timezone.utc) - timedelta(days=self.days))
+        removed: Dict[str, int] = {}
+        chunks = 0
+        for table in database.RETENTION_TABLES:
+            removed[table] = 0
+            while not self._stop.is_set():
+                with stage("cleanup_old", endpoint="retention_job"):
+                    n = database.delete_before_chunk(table, cutoff, self.chunk_rows)
+                removed[table] += n
+                chunks += 1
+                if n < self.chunk_rows:
+                    break
+                time.sleep(self.pause)
+        with stage("incremental_vacuum", endpoint="retention_job"):
+            vacuum = database.incremental_vacuum(self.vacuum_pages)
+        # The segment store drops whole expired partitions
+        store = database.get_segment_store()
+        partitions = store.drop_before(cutoff) if store is not None else 0
+
+        report = {
+            "rows_removed": removed,
+            "chunks": chunks,
+            "pages_freed": vacuum["pages_freed"],
+            "free_pages": vacuum["free_pages"],
+            "segment_partitions_dropped": partitions,
+            "seconds": round(time.perf_counter() - started, 4),
+            "finished_at": time.time(),
+        }
+        with self._lock:
+            self.runs += 1
+            self.last_run = report
+        return report
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._stop.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "days": self.days,
+                "interval_seconds": self.interval,
+                "runs": self.runs,
+                "last_run": self.last_run,
+            }
+
+    def _loop(self) -> None:
+        delay = self.initial_delay
+        while not self._stop.wait(delay):
+            delay = self.interval
+            try:
+                self.run_once()
+            except Exception as exc:
+                with self._lock:
+                    self.last_run = {"error": str(exc), "finished_at": time.time()}
+
+
+def create_job_from_env() -> RetentionJob | None:
+    """Build the app's retention job from RETENTION_* settings; RETENTION_ENABLED=0 disables it."""
+    if os.environ.get("RETENTION_ENABLED", "1") == "0":
+        return None
+    return RetentionJob(
+        days=int(os.environ.get("RETENTION_DAYS", "90")),
+        interval=float(os.environ.get("RETENTION_INTERVAL", "3600")),
+        chunk_rows=int(os.environ.get("RETENTION_CHUNK_ROWS", "5000")),
+        vacuum_pages=int(os.environ.get("RETENTION_VACUUM_PAGES", "2000")),
+        initial_delay=float(os.environ.get("RETENTION_INITIAL_DELAY", "60")),
+    )
@@ -0,0 +1,743 @@
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from downsample import lttb_multi, split_points
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX; one process only
+    fcntl = None
+
+
+SENSOR_COLUMNS = ["temperature", "vibration", "pressure", "current"]
+
+# Stored columns per kind. equipment_id is kept as an int32 code into the
+# store's equipment dictionary; predictions keep their SQLite rowid as "id".
+KIND_COLUMNS: Dict[str, Dict[str, str]] = {
+    "readings": {"ts": "int64", "equipment_id": "int32", **{c: "float64" for c in SENSOR_COLUMNS}},
+    "predictions": {
+        "id": "int64",
+        "ts": "int64",
+        "equipment_id": "int32",
+        **{c: "float64" for c in SENSOR_COLUMNS},
+        "failure_probability": "float64",
+        "health_score": "float64",
+    },
+}
+VALUE_COLUMNS = {
+    kind: [c for c in cols if c not in ("id", "ts", "equipment_id")] for kind, cols in KIND_COLUMNS.items()
+}
+# Key order of the rows get_historical returns, as the SQLite queries produce them
+RECORD_KEYS = {
+    "readings": ["ts", "equipment_id", *SENSOR_COLUMNS],
+    "predictions": ["id", "ts", "equipment_id", *SENSOR_COLUMNS, "failure_probability", "health_score"],
+}
+EXPORT_TYPES = {"readings": "reading", "predictions": "prediction"}
+
+
+def iso_ms(ts: np.ndarray) -> List[str]:
+    """Epoch ms -> ISO-8601 UTC strings, as database's strftime('%Y-%m-%dT%H:%M:%fZ') renders them."""
+    return np.datetime_as_string(np.asarray(ts, dtype="datetime64[ms]"), unit="ms", timezone="UTC").tolist()
+
+
+def _pylist(values: np.ndarray) -> List[Any]:
+    # NaN stands in for SQL NULL
+    out = values.tolist()
+    if values.dtype.kind == "f":
+        missing = np.flatnonzero(np.isnan(values))
+        for k in missing.tolist():
+            out[k] = None
+    return out
+
+
+class Segment:
+    """One immutable directory of .npy columns sorted by ts, opened memory-mapped on first use."""
+
+    __slots__ = ("name", "partition", "rows", "min_ts", "max_ts", "path", "_columns", "_index")
+
+    def __init__(self, root: str, meta: Dict[str, Any]) -> None:
+        self.name = meta["name"]
+        self.partition = int(meta["partition"])
+        self.rows = int(meta["rows"])
+        self.min_ts = int(meta["min_ts"])
+        self.max_ts = int(meta["max_ts"])
+        self.path = os.path.join(root, self.name)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._index: np.ndarray | None = None
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "partition": self.partition,
+            "rows": self.rows,
+            "min_ts": self.min_ts,
+            "max_ts": self.max_ts,
+        }
+
+    def column(self, name: str) -> np.ndarray:
+        arr = self._columns.get(name)
+        if arr is None:
+            arr = self._columns[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+        return arr
+
+    def bounds(self, since_ms: int | None, until_ms: int | None, stride: int) -> Tuple[int, int]:
+        """Row range with since <= ts < until, found through the sparse index and one block of ts."""
+        if self._index is None:
+            self._index = np.load(os.path.join(self.path, "ts_index.npy"))
+        ts = self.column("ts")
+
+        def locate(value: int | None, default: int) -> int:
+            if value is None:
+                return default
+            # index[k] = ts[k * stride]; the answer lies in one stride-wide block
+            block = int(np.searchsorted(self._index, value, side="left"))
+            lo = max(0, (block - 1) * stride)
+            hi = min(self.rows, block * stride + 1)
+            return lo + int(np.searchsorted(ts[lo:hi], value, side="left"))
+
+        return locate(since_ms, 0), locate(until_ms, self.rows)
+
+
+class SegmentStore:
+    """
+    Append-only, time-partitioned columnar history.
+
+    Rows are buffered in memory and sealed into immutable segments, one
+    directory of ``.npy`` files per segment (one array per column, sorted by
+    ts) plus a sparse index holding every ``index_stride``-th timestamp.
+    Segments belong to a time partition of ``partition_ms`` and are listed
+    in a per-kind manifest that is replaced atomically, so a reader sees
+    either the old or the new set of segments. Scans memory-map the
+    columns and slice the requested time range without copying or creating
+    a Python object per value; only rows that leave as JSON or CSV are
+    converted. ``compact`` merges a partition's small segments into one.
+
+    Writers in several processes share the directory through a lock file;
+    each process sees its own unsealed rows immediately and other
+    processes' rows once sealed (at most ``flush_seconds`` later);
+    ``on_flush`` is called after sealed rows or dropped partitions reach
+    the manifest, when every process can see the change. The SQLite
+    tables stay the system of record: the store can be rebuilt from them
+    at any time (``python segments.py rebuild``).
+    """
+
+    def __init__(
+        self,
+        root: str,
+        partition_ms: int = 86_400_000,
+        flush_rows: int = 50_000,
+        flush_seconds: float = 1.0,
+        compact_rows: int = 1_000_000,
+        compact_interval: float = 60.0,
+        index_stride: int = 4096,
+    ) -> None:
+        if partition_ms <= 0 or index_stride <= 0:
+            raise ValueError("partition_ms and index_stride must be positive")
+        self.root = root
+        self.partition_ms = int(partition_ms)
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.compact_rows = compact_rows
+        self.compact_interval = compact_interval
+        self.index_stride = int(index_stride)
+        for kind in KIND_COLUMNS:
+            os.makedirs(os.path.join(root, kind), exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._buffers: Dict[str, List[Dict[str, np.ndarray]]] = {kind: [] for kind in KIND_COLUMNS}
+        self._buffered_rows: Dict[str, int] = {kind: 0 for kind in KIND_COLUMNS}
+        self._buffer_since: Dict[str, float] = {kind: 0.0 for kind in KIND_COLUMNS}
+        self._segments: Dict[str, List[Segment]] = {kind: [] for kind in KIND_COLUMNS}
+        self._manifest_stamp: Dict[str, Tuple[int, int] | None] = {kind: None for kind in KIND_COLUMNS}
+        self._names: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._names_stamp: Tuple[int, int] | None = None
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._stop = threading.Event()
+        self.on_flush: Callable[[], None] | None = None
+
+        self.rows_appended = 0
+        self.segments_written = 0
+        self.compactions = 0
+        self.partitions_dropped = 0
+        self.last_flush_seconds = 0.0
+        self.last_compact_seconds = 0.0
+        self.errors = 0
+
+    # ------------------------------------------------------------------
+    # Files shared between processes
+    # ------------------------------------------------------------------
+    @contextmanager
+    def _file_lock(self):
+        # Serializes manifest and dictionary updates across processes
+        with self._lock, open(os.path.join(self.root, ".lock"), "a") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _stamp(path: str) -> Tuple[int, int] | None:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    @staticmethod
+    def _write_json(path: str, data: Any) -> None:
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+        os.replace(tmp, path)
+
+    def _manifest_path(self, kind: str) -> str:
+        return os.path.join(self.root, kind, "manifest.json")
+
+    def _refresh(self, kind: str) -> List[Segment]:
+        # Called with self._lock held; re-reads the manifest if another process changed it
+        path = self._manifest_path(kind)
+        stamp = self._stamp(path)
+        if stamp != self._manifest_stamp[kind]:
+            metas = []
+            if stamp is not None:
+                with open(path, encoding="utf-8") as fh:
+                    metas = json.load(fh)["segments"]
+            known = {s.name: s for s in self._segments[kind]}
+            root = os.path.join(self.root, kind)
+            self._segments[kind] = [known.get(m["name"]) or Segment(root, m) for m in metas]
+            self._manifest_stamp[kind] = stamp
+        return self._segments[kind]
+
+    def _save_manifest(self, kind: str, segments: List[Segment]) -> None:
+        # Called under _file_lock
+        segments = sorted(segments, key=lambda s: (s.partition, s.min_ts, s.name))
+        path = self._manifest_path(kind)
+        self._write_json(path, {"segments": [s.meta() for s in segments]})
+        self._segments[kind] = segments
+        self._manifest_stamp[kind] = self._stamp(path)
+
+    def _refresh_names(self) -> None:
+        path = os.path.join(self.root, "equipment.json")
+        stamp = self._stamp(path)
+        if stamp != self._names_stamp:
+            names = []
+            if stamp is not None:
+                with open(path, encoding="utf-8") as fh:
+                    names = json.load(fh)
+            self._names = names
+            self._codes = {name: k for k, name in enumerate(names)}
+            self._names_stamp = stamp
+
+    def encode(self, equipment_ids: Sequence[Any]) -> np.ndarray:
+        """Equipment ids -> int32 codes, adding unseen ids to the shared dictionary."""
+        ids = np.asarray(equipment_ids, dtype=object)
+        uniques, inverse = np.unique(ids.astype(str), return_inverse=True)
+        with self._lock:
+            codes = [self._codes.get(u) for u in uniques.tolist()]
+            if any(c is None for c in codes):
+                with self._file_lock():
+                    self._refresh_names()
+                    for u in uniques.tolist():
+                        if u not in self._codes:
+                            self._codes[u] = len(self._names)
+                            self._names.append(u)
+                    path = os.path.join(self.root, "equipment.json")
+                    self._write_json(path, self._names)
+                    self._names_stamp = self._stamp(path)
+                codes = [self._codes[u] for u in uniques.tolist()]
+        return np.asarray(codes, dtype=np.int32)[inverse.reshape(-1)]
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """int32 codes -> equipment ids as an object array."""
+        with self._lock:
+            if len(codes) and int(codes.max()) >= len(self._names):
+                self._refresh_names()
+            names = np.asarray(self._names, dtype=object)
+        return names[codes] if len(names) else np.empty(0, dtype=object)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def append(self, kind: str, columns: Dict[str, Any]) -> None:
+        """
+        Buffer rows given as one sequence per column (``ts`` in epoch ms,
+        ``equipment_id`` as strings); missing value columns are stored as NaN.
+        """
+        spec = KIND_COLUMNS[kind]
+        n = len(columns["ts"])
+        if not n:
+            return
+        batch: Dict[str, np.ndarray] = {}
+        for name, dtype in spec.items():
+            if name == "equipment_id":
+                batch[name] = self.encode(columns.get(name, [""] * n))
+            elif name in columns:
+                batch[name] = np.asarray(columns[name], dtype=dtype)
+            else:
+                batch[name] = np.full(n, np.nan if dtype == "float64" else 0, dtype=dtype)
+        with self._lock:
+            if not self._buffers[kind]:
+                self._buffer_since[kind] = time.monotonic()
+            self._buffers[kind].append(batch)
+            self._buffered_rows[kind] += n
+            self.rows_appended += n
+            due = self._buffered_rows[kind] >= self.flush_rows
+        if due:
+            self.flush(kind)
+
+    def _take_buffer(self, kind: str) -> Dict[str, np.ndarray] | None:
+        # Called with self._lock held
+        parts = self._buffers[kind]
+        if not parts:
+            return None
+        self._buffers[kind] = []
+        self._buffered_rows[kind] = 0
+        return {name: np.concatenate([p[name] for p in parts]) for name in KIND_COLUMNS[kind]}
+
+    def _write_segment(self, kind: str, partition: int, columns: Dict[str, np.ndarray]) -> Segment:
+        # Columns must already be sorted by ts
+        root = os.path.join(self.root, kind)
+        ts = columns["ts"]
+        name = f"{partition}-{uuid.uuid4().hex[:12]}"
+        tmp = os.path.join(root, f".tmp-{name}")
+        os.makedirs(tmp)
+        for col, values in columns.items():
+            np.save(os.path.join(tmp, f"{col}.npy"), np.ascontiguousarray(values))
+        np.save(os.path.join(tmp, "ts_index.npy"), np.ascontiguousarray(ts[:: self.index_stride]))
+        os.rename(tmp, os.path.join(root, name))
+        self.segments_written += 1
+        meta = {"name": name, "partition": partition, "rows": len(ts), "min_ts": int(ts[0]), "max_ts": int(ts[-1])}
+        return Segment(root, meta)
+
+    def _split_partitions(self, columns: Dict[str, np.ndarray]) -> Iterator[Tuple[int, Dict[str, np.ndarray]]]:
+        order = np.argsort(columns["ts"], kind="stable")
+        columns = {name: values[order] for name, values in columns.items()}
+        part = columns["ts"] // self.partition_ms * self.partition_ms
+        starts = np.flatnonzero(np.r_[True, part[1:] != part[:-1]])
+        ends = np.r_[starts[1:], len(part)]
+        for lo, hi in zip(starts.tolist(), ends.tolist()):
+            yield int(part[lo]), {name: values[lo:hi] for name, values in columns.items()}
+
+    def flush(self, kind: str | None = None) -> int:
+        """Seal buffered rows into segments; returns rows written."""
+        written = 0
+        for k in [kind] if kind else list(KIND_COLUMNS):
+            with self._lock:
+                columns = self._take_buffer(k)
+            if columns is None:
+                continue
+            started = time.perf_counter()
+            new = [self._write_segment(k, partition, part) for partition, part in self._split_partitions(columns)]
+            with self._file_lock():
+                self._save_manifest(k, self._refresh(k) + new)
+            written += len(columns["ts"])
+            self.last_flush_seconds = time.perf_counter() - started
+        if written and self.on_flush is not None:
+            self.on_flush()
+        return written
+
+    def compact(self, kind: str | None = None) -> int:
+        """
+        Merge each partition's segments smaller than ``compact_rows`` into one
+        segment; returns the number of segments merged away.
+        """
+        merged = 0
+        for k in [kind] if kind else list(KIND_COLUMNS):
+            started = time.perf_counter()
+            with self._lock:
+                segments = list(self._refresh(k))
+            by_partition: Dict[int, List[Segment]] = {}
+            for seg in segments:
+                if seg.rows < self.compact_rows:
+                    by_partition.setdefault(seg.partition, []).append(seg)
+            for partition, small in by_partition.items():
+                if len(small) < 2:
+                    continue
+                columns = {
+                    name: np.concatenate([np.asarray(s.column(name)) for s in small]) for name in KIND_COLUMNS[k]
+                }
+                order = np.argsort(columns["ts"], kind="stable")
+                new = self._write_segment(k, partition, {name: v[order] for name, v in columns.items()})
+                gone = {s.name for s in small}
+                with self._file_lock():
+                    current = self._refresh(k)
+                    if not gone <= {s.name for s in current}:
+                        # Another process compacted or dropped them first
+                        shutil.rmtree(new.path, ignore_errors=True)
+                        continue
+                    self._save_manifest(k, [s for s in current if s.name not in gone] + [new])
+                for seg in small:
+                    # Open memory maps keep the data readable until released
+                    shutil.rmtree(seg.path, ignore_errors=True)
+                merged += len(small) - 1
+                self.compactions += 1
+            self.last_compact_seconds = time.perf_counter() - started
+        return merged
+
+    def drop_before(self, cutoff_ms: int) -> int:
+        """Remove whole partitions that end at or before ``cutoff_ms``; returns partitions dropped."""
+        self.flush()
+        dropped = set()
+        for kind in KIND_COLUMNS:
+            with self._file_lock():
+                current = self._refresh(kind)
+                old = [s for s in current if s.partition + self.partition_ms <= cutoff_ms]
+                if not old:
+                    continue
+                self._save_manifest(kind, [s for s in current if s not in old])
+            for seg in old:
+                shutil.rmtree(seg.path, ignore_errors=True)
+                dropped.add((kind, seg.partition))
+        self.partitions_dropped += len(dropped)
+        if dropped and self.on_flush is not None:
+            self.on_flush()
+        return len(dropped)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def _pieces(
+        self, kind: str, since_ms: int | None, until_ms: int | None, columns: List[str]
+    ) -> List[Tuple[int, Dict[str, np.ndarray]]]:
+        """(partition, column slices) per overlapping segment plus matching buffered rows, by partition."""
+        with self._lock:
+            segments = list(self._refresh(kind))
+            parts = list(self._buffers[kind])
+        out = []
+        for seg in segments:
+            if (since_ms is not None and seg.max_ts < since_ms) or (until_ms is not None and seg.min_ts >= until_ms):
+                continue
+            lo, hi = seg.bounds(since_ms, until_ms, self.index_stride)
+            if hi > lo:
+                out.append((seg.partition, {c: seg.column(c)[lo:hi] for c in columns}))
+        for part in parts:
+            keep = np.ones(len(part["ts"]), dtype=bool)
+            if since_ms is not None:
+                keep &= part["ts"] >= since_ms
+            if until_ms is not None:
+                keep &= part["ts"] < until_ms
+            if not keep.any():
+                continue
+            partition = part["ts"][keep] // self.partition_ms * self.partition_ms
+            for p in np.unique(partition).tolist():
+                rows = np.flatnonzero(keep)[partition == p]
+                out.append((p, {c: part[c][rows] for c in columns}))
+        out.sort(key=lambda item: item[0])
+        return out
+
+    @staticmethod
+    def _merge(pieces: List[Dict[str, np.ndarray]], columns: List[str]) -> Dict[str, np.ndarray]:
+        if len(pieces) == 1:
+            merged = pieces[0]
+        else:
+            merged = {c: np.concatenate([p[c] for p in pieces]) for c in columns}
+        ts = merged["ts"]
+        if len(ts) > 1 and (ts[1:] < ts[:-1]).any():
+            order = np.argsort(ts, kind="stable")
+            merged = {c: v[order] for c, v in merged.items()}
+        return merged
+
+    def iter_scan(
+        self,
+        kind: str,
+        since_ms: int | None = None,
+        until_ms: int | None = None,
+        columns: Iterable[str] | None = None,
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Columns of the rows with since <= ts < until, one dict of arrays per
+        partition, oldest first and sorted by ts. A partition held in a
+        single segment comes back as read-only views of the memory map.
+        """
+        columns = list(columns or KIND_COLUMNS[kind])
+        if "ts" not in columns:
+            columns.insert(0, "ts")
+        pieces = self._pieces(kind, since_ms, until_ms, columns)
+        start = 0
+        while start < len(pieces):
+            end = start
+            while end < len(pieces) and pieces[end][0] == pieces[start][0]:
+                end += 1
+            yield self._merge([p for _, p in pieces[start:end]], columns)
+            start = end
+
+    def scan(
+        self,
+        kind: str,
+        since_ms: int | None = None,
+        until_ms: int | None = None,
+        columns: Iterable[str] | None = None,
+    ) -> Dict[str, np.ndarray]:
+        """``iter_scan`` as one dict of arrays."""
+        columns = list(columns or KIND_COLUMNS[kind])
+        if "ts" not in columns:
+            columns.insert(0, "ts")
+        parts = list(self.iter_scan(kind, since_ms, until_ms, columns))
+        if not parts:
+            return {c: np.empty(0, dtype=KIND_COLUMNS[kind][c]) for c in columns}
+        return parts[0] if len(parts) == 1 else {c: np.concatenate([p[c] for p in parts]) for c in parts[0]}
+
+    def records(
+        self, kind: str, columns: Dict[str, np.ndarray], keys: Sequence[str] | None = None
+    ) -> List[Dict[str, Any]]:
+        """Scanned columns as the row dicts database.get_historical returns."""
+        keys = list(keys or RECORD_KEYS[kind])
+        lists = []
+        for key in keys:
+            if key == "ts":
+                lists.append(iso_ms(columns["ts"]))
+            elif key == "equipment_id":
+                lists.append(self.decode(columns["equipment_id"]).tolist())
+            else:
+                lists.append(_pylist(np.asarray(columns[key])))
+        return [dict(zip(keys, row)) for row in zip(*lists)]
+
+    def columns(
+        self, kind: str, columns: Dict[str, np.ndarray], keys: Sequence[str] | None = None
+    ) -> Dict[str, np.ndarray]:
+        """Scanned columns as database.get_historical_columns returns them: ids decoded, NaN for NULL."""
+        keys = list(keys or RECORD_KEYS[kind])
+        return {
+            key: self.decode(columns[key]) if key == "equipment_id" else np.asarray(columns[key])
+            for key in keys
+        }
+
+    # ------------------------------------------------------------------
+    # database.py entry points
+    # ------------------------------------------------------------------
+    def historical(
+        self,
+        cutoff_ms: int,
+        now_ms: int,
+        max_points: int | None = None,
+        method: str = "lttb",
+        columnar: bool = False,
+    ):
+        """
+        database.get_historical over the store: raw rows, LTTB-selected rows
+        or per-unit buckets; with ``columnar`` as get_historical_columns.
+        """
+        out = {}
+        for kind in KIND_COLUMNS:
+            columns = self.scan(kind, cutoff_ms)
+            keys = None
+            if max_points and method == "lttb":
+                columns = self._lttb(kind, columns, max_points)
+            elif max_points:
+                columns = self._buckets(kind, columns, cutoff_ms, now_ms, max_points)
+                keys = list(columns)
+            out[kind] = self.columns(kind, columns, keys) if columnar else self.records(kind, columns, keys)
+        return out
+
+    def _lttb(self, kind: str, columns: Dict[str, np.ndarray], max_points: int) -> Dict[str, np.ndarray]:
+        codes = columns["equipment_id"]
+        if not len(codes):
+            return columns
+        # health_score mirrors failure_probability, so it adds nothing to the shape
+        value_cols = [c for c in VALUE_COLUMNS[kind] if c != "health_score"]
+        order = np.lexsort((columns["ts"], codes))
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        keep = [order[:0]]
+        for lo, hi, budget in zip(starts.tolist(), ends.tolist(), split_points(max_points, len(starts))):
+            if not budget:
+                break
+            rows = order[lo:hi]
+            values = np.column_stack([np.asarray(columns[c])[rows] for c in value_cols])
+            keep.append(rows[lttb_multi(columns["ts"][rows].astype(np.float64), values, budget)])
+        picked = np.sort(np.concatenate(keep), kind="stable")
+        return {c: np.asarray(v)[picked] for c, v in columns.items()}
+
+    def _buckets(
+        self, kind: str, columns: Dict[str, np.ndarray], cutoff_ms: int, now_ms: int, max_points: int
+    ) -> Dict[str, np.ndarray]:
+        codes = columns["equipment_id"]
+        ts = columns["ts"]
+        result: Dict[str, np.ndarray] = {
+            "ts": ts[:0], "equipment_id": codes[:0], "count": np.empty(0, dtype=np.int64)
+        }
+        if not len(codes):
+            for c in VALUE_COLUMNS[kind]:
+                result[c] = result[f"{c}_min"] = result[f"{c}_max"] = np.empty(0)
+            return result
+        units = np.unique(codes)
+        buckets = max(1, max_points // len(units))
+        width = max(1, -(-(now_ms - cutoff_ms) // buckets))
+        key = codes.astype(np.int64) * (2**40) + (ts - cutoff_ms) // width
+        order = np.lexsort((ts, key))
+        sorted_key = key[order]
+        starts = np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]])
+        first = order[starts]
+        count = np.diff(np.r_[starts, len(order)])
+        # Ordered by each bucket's first ts, as SQLite's ORDER BY MIN(ts)
+        out_order = np.argsort(ts[first], kind="stable")
+        result = {
+            "ts": ts[first][out_order],
+            "equipment_id": codes[first][out_order],
+            "count": count[out_order].astype(np.int64),
+        }
+        for c in VALUE_COLUMNS[kind]:
+            values = np.asarray(columns[c])[order]
+            present = ~np.isnan(values)
+            n = np.add.reduceat(present, starts)
+            with np.errstate(invalid="ignore"):
+                mean = np.add.reduceat(np.where(present, values, 0.0), starts) / n
+                low = np.fmin.reduceat(values, starts)
+                high = np.fmax.reduceat(values, starts)
+            result[c] = mean[out_order]
+            result[f"{c}_min"] = low[out_order]
+            result[f"{c}_max"] = high[out_order]
+        return result
+
+    def iter_export_rows(self, cutoff_ms: int, chunk_rows: int = 5000, iso_ts: bool = True):
+        """database.iter_export_rows over the store: readings, then predictions, oldest first."""
+        for kind in ("readings", "predictions"):
+            value_cols = VALUE_COLUMNS[kind]
+            missing = [None] * (6 - len(value_cols))
+            for part in self.iter_scan(kind, cutoff_ms, columns=["ts", "equipment_id", *value_cols]):
+                for lo in range(0, len(part["ts"]), chunk_rows):
+                    ts = part["ts"][lo:lo + chunk_rows]
+                    lists = [
+                        iso_ms(ts) if iso_ts else ts.tolist(),
+                        self.decode(part["equipment_id"][lo:lo + chunk_rows]).tolist(),
+                    ]
+                    lists += [_pylist(np.asarray(part[c][lo:lo + chunk_rows])) for c in value_cols]
+                    head, tail = (EXPORT_TYPES[kind],), tuple(missing)
+                    yield [head + row + tail for row in zip(*lists)]
+
+    # ------------------------------------------------------------------
+    # Background flush and compaction
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name="segment-store", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5.0)
+            self._thread = None
+        self.flush()
+
+    def _loop(self) -> None:
+        next_compact = time.monotonic() + self.compact_interval
+        while not self._stop.wait(min(self.flush_seconds, self.compact_interval)):
+            try:
+                now = time.monotonic()
+                for kind in KIND_COLUMNS:
+                    with self._lock:
+                        due = bool(self._buffers[kind]) and now - self._buffer_since[kind] >= self.flush_seconds
+                    if due:
+                        self.flush(kind)
+                if now >= next_compact:
+                    next_compact = now + self.compact_interval
+                    self.compact()
+            except Exception:
+                self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            segments = {kind: list(self._refresh(kind)) for kind in KIND_COLUMNS}
+            return {
+                "segments": {kind: len(s) for kind, s in segments.items()},
+                "rows": {kind: sum(seg.rows for seg in s) for kind, s in segments.items()},
+                "partitions": {kind: len({seg.partition for seg in s}) for kind, s in segments.items()},
+                "buffered_rows": dict(self._buffered_rows),
+                "equipment": len(self._names),
+                "rows_appended": self.rows_appended,
+                "segments_written": self.segments_written,
+                "compactions": self.compactions,
+                "partitions_dropped": self.partitions_dropped,
+                "last_flush_ms": round(self.last_flush_seconds * 1000.0, 3),
+                "last_compact_ms": round(self.last_compact_seconds * 1000.0, 3),
+                "errors": self.errors,
+            }
+
+
+def rebuild_from_sqlite(store: SegmentStore, chunk_rows: int = 500_000) -> Dict[str, int]:
+    """Replace the store's contents with the readings and predictions tables; returns rows per kind."""
+    import database
+
+    with store._file_lock():
+        for kind in KIND_COLUMNS:
+            for seg in store._refresh(kind):
+                shutil.rmtree(seg.path, ignore_errors=True)
+            store._save_manifest(kind, [])
+    counts = {}
+    queries = {
+        "readings": f"SELECT ts, equipment_id, {', '.join(SENSOR_COLUMNS)} FROM sensor_readings",
+        "predictions": "SELECT id, ts, equipment_id, temperature, vibration, pressure, current, "
+                       "failure_probability, health_score FROM predictions",
+    }
+    for kind, sql in queries.items():
+        names = list(KIND_COLUMNS[kind])
+        counts[kind] = 0
+        with database.get_conn() as conn:
+            cur = conn.cursor()
+            cur.row_factory = None
+            cur.execute(sql)
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                store.append(kind, dict(zip(names, zip(*rows))))
+                counts[kind] += len(rows)
+            cur.close()
+        store.flush(kind)
+    store.compact()
+    return counts
+
+
+def create_store_from_env(root: str | None = None) -> SegmentStore | None:
+    """Build the segment store when HISTORY_BACKEND=segments, from SEGMENT_* settings (None otherwise)."""
+    if os.environ.get("HISTORY_BACKEND", "sqlite") != "segments":
+        return None
+    store = SegmentStore(
+        os.environ.get("SEGMENT_DIR", root or os.path.join("data", "segments")),
+        partition_ms=int(float(os.environ.get("SEGMENT_PARTITION_HOURS", "24")) * 3_600_000),
+        flush_rows=int(os.environ.get("SEGMENT_FLUSH_ROWS", "50000")),
+        flush_seconds=float(os.environ.get("SEGMENT_FLUSH_SECONDS", "1")),
+        compact_rows=int(os.environ.get("SEGMENT_COMPACT_ROWS", "1000000")),
+        compact_interval=float(os.environ.get("SEGMENT_COMPACT_INTERVAL", "60")),
+        index_stride=int(os.environ.get("SEGMENT_INDEX_STRIDE", "4096")),
+    )
+    atexit.register(store.stop)
+    return store
+
+
+if __name__ == "__main__":
+    # python segments.py [rebuild|compact|stats] [path/to/app.db] [segment dir]
+    import sys
+
+    import database
+
+    args = sys.argv[1:]
+    command = args.pop(0) if args and args[0] in ("rebuild", "compact", "stats") else "stats"
+    if args:
+        database.configure(args.pop(0))
+    store = SegmentStore(args[0] if args else os.path.join(os.path.dirname(database.DB_PATH), "segments"))
+    if command == "rebuild":
+        print(f"{store.root}: rebuilt {rebuild_from_sqlite(store)}")
+    elif command == "compact":
+        print(f"{store.root}: merged {store.compact()} segments")
+    print(json.dumps(store.stats(), indent=2))
@@ -0,0 +1,310 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+
+SENSOR_FIELDS = ("temperature", "vibration", "pressure", "current")
+
+# Nominal level and daily-cycle amplitude per sensor, as in generate_data
+_BASE = np.array([60.0, 2.0, 12.0, 110.0])
+_AMPLITUDE = np.array([5.0, 0.6, 1.0, 8.0])
+_CYCLE_DIVISOR = np.array([1.0, 2.0, 3.0, 1.5])
+_NOISE = np.array([0.8, 0.15, 0.25, 1.8])
+# Offset while a unit is anomalous: mean and spread per sensor
+_ANOMALY_MEAN = np.array([10.0, 1.5, -2.5, 15.0])
+_ANOMALY_STD = np.array([2.0, 0.3, 0.6, 3.0])
+# Failure logit weights per sensor deviation from nominal
+_RISK_WEIGHTS = np.array([0.08, 0.9, -0.12, 0.04])
+_BASE_LOGIT = -3.2
+
+_DAY_MS = 86_400_000
+# A shared simulator restarts its noise and anomaly state at every multiple
+# of this, which bounds how far back a newly started process catches up
+_SHARED_PERIOD_MS = 3_600_000
+
+
+class FleetSimulator:
+    """
+    Synthetic sensor state for a fleet of ``n_units``, advanced in lockstep.
+
+    Each unit keeps its own daily-cycle phase, baseline offset, AR(1) noise
+    and anomaly episode, so consecutive ticks continue one series instead of
+    restarting from a seed. ``advance`` moves every unit forward by ``n_ticks``
+    ticks of ``tick_seconds`` using NumPy arrays of shape (ticks, units);
+    ``iter_history`` streams a long history as such chunks without holding
+    it in memory. Anomalies start with a per-tick hazard so that about
+    ``anomaly_rate`` of all readings fall inside an episode.
+
+    ``on_advance``, when set, receives every chunk ``advance``, ``sync`` or
+    ``latest`` produces, in tick order, while the simulator lock is held.
+
+    With ``shared=True`` (a ``random_state`` is required) ticks fall on a
+    grid of ``tick_seconds`` since the epoch and each tick draws from its own
+    generator seeded by (``random_state``, tick number). Every process built
+    with the same seed then reports the same readings for the same tick,
+    whenever it started and however its ``sync`` calls batch the ticks. To
+    keep that true without replaying all history, the noise and anomaly state
+    restarts from its stationary distribution every ``_SHARED_PERIOD_MS``,
+    and a new simulator starts at the beginning of the current period.
+
+    Timestamps are epoch-ms ``datetime64[ms]`` in UTC.
+    """
+
+    def __init__(
+        self,
+        n_units: int = 15,
+        tick_seconds: float = 60.0,
+        start: Any = None,
+        anomaly_rate: float = 0.05,
+        mean_episode_ticks: int = 10,
+        noise_memory: float = 0.8,
+        random_state: int | None = None,
+        id_format: str = "EQ-{:03d}",
+        shared: bool = False,
+    ) -> None:
+        if shared and random_state is None:
+            raise ValueError("A shared simulator needs a random_state")
+        self.n_units = n_units
+        self.tick = np.timedelta64(int(round(tick_seconds * 1000)), "ms")
+        self.shared = shared
+        self._seed = random_state
+        self._tick_ms = int(self.tick / np.timedelta64(1, "ms"))
+        self._period_ticks = max(1, _SHARED_PERIOD_MS // self._tick_ms)
+        self.anomaly_rate = anomaly_rate
+        self.mean_episode_ticks = mean_episode_ticks
+        self.noise_memory = noise_memory
+        self.equipment_ids: List[str] = [id_format.format(i) for i in range(1, n_units + 1)]
+        self._index = {eid: i for i, eid in enumerate(self.equipment_ids)}
+        self._rng = np.random.default_rng(random_state)
+        self._lock = threading.Lock()
+
+        if start is None and shared:
+            # One tick before the current period, which the first sync replays
+            start = (self._period_start(int(time.time() * 1000) // self._tick_ms) - 1) * self._tick_ms
+        elif start is None:
+            # One tick back, so the first tick lands on the current time
+            start = time.time() * 1000 - tick_seconds * 1000
+        self.now = np.datetime64(int(start), "ms") if isinstance(start, (int, float)) else np.datetime64(start, "ms")
+
+        rng = self._rng
+        self._phase = rng.uniform(0.0, 2.0 * np.pi, n_units)
+        self._offset = rng.normal(0.0, 0.5, (n_units, 4)) * _NOISE
+        self._noise = np.zeros((n_units, 4))
+        self._episode_left = np.zeros(n_units, dtype=np.int64)
+        self._episode_shift = np.zeros((n_units, 4))
+        self._last: Dict[str, np.ndarray] = self._empty()
+        self.on_advance: Callable[[Dict[str, np.ndarray]], None] | None = None
+
+    def __len__(self) -> int:
+        return self.n_units
+
+    def _period_start(self, tick_number: int) -> int:
+        return tick_number - tick_number % self._period_ticks
+
+    def _reset_state(self, tick_number: int) -> None:
+        # Stationary AR(1) noise (the innovations keep its std at _NOISE), no episode
+        draw = np.random.default_rng([self._seed, tick_number, 1])
+        self._noise = draw.standard_normal((self.n_units, 4)) * _NOISE
+        self._episode_left[:] = 0
+        self._episode_shift[:] = 0.0
+
+    def _empty(self) -> Dict[str, np.ndarray]:
+        chunk: Dict[str, np.ndarray] = {"timestamp": np.empty((0,), dtype="datetime64[ms]")}
+        for name in SENSOR_FIELDS:
+            chunk[name] = np.empty((0, self.n_units))
+        chunk["anomaly"] = np.empty((0, self.n_units), dtype=bool)
+        chunk["failure"] = np.empty((0, self.n_units), dtype=np.int8)
+        return chunk
+
+    def advance(self, n_ticks: int = 1) -> Dict[str, np.ndarray]:
+        """
+        Move every unit forward ``n_ticks`` ticks and return the new readings.
+
+        The result maps "timestamp" to a (ticks,) datetime64 array and each
+        sensor, "anomaly" and "failure" to a (ticks, units) array.
+        """
+        with self._lock:
+            return self._advance(n_ticks)
+
+    def _advance(self, n_ticks: int) -> Dict[str, np.ndarray]:
+        rng = self._rng
+        n = self.n_units
+        timestamps = self.now + np.arange(1, n_ticks + 1) * self.tick
+        self.now = timestamps[-1] if n_ticks else self.now
+
+        # Deterministic part: daily cycle per unit, shape (ticks, units, sensors)
+        # Unwrapped angle so the slower (multi-day) cycles stay continuous
+        day_angle = 2.0 * np.pi * (timestamps.astype(np.int64) / _DAY_MS)
+        angle = day_angle[:, None] + self._phase[None, :]
+        signal = _BASE + self._offset + _AMPLITUDE * np.sin(angle[:, :, None] / _CYCLE_DIVISOR)
+
+        # Stateful part: AR(1) noise and anomaly episodes, one vector step per tick
+        rho = self.noise_memory
+        scale = _NOISE * np.sqrt(1.0 - rho * rho)
+        tick_numbers: List[int] = []
+        draws: List[np.random.Generator] = []
+        if self.shared:
+            # One generator per tick, so a tick's values do not depend on batching
+            tick_numbers = (timestamps.astype(np.int64) // self._tick_ms).tolist()
+            draws = [np.random.default_rng([self._seed, k]) for k in tick_numbers]
+            innovations = np.stack([d.standard_normal((n, 4)) for d in draws]) * scale
+            onset_draw = np.stack([d.uniform(size=n) for d in draws])
+            failure_draw = np.stack([d.uniform(size=n) for d in draws])
+        else:
+            innovations = rng.standard_normal((n_ticks, n, 4)) * scale
+            onset_draw = rng.uniform(size=(n_ticks, n))
+        hazard = self.anomaly_rate / max(1, self.mean_episode_ticks) / max(1e-9, 1.0 - self.anomaly_rate)
+        noise = np.empty((n_ticks, n, 4))
+        shift = np.empty((n_ticks, n, 4))
+        anomaly = np.empty((n_ticks, n), dtype=bool)
+        for k in range(n_ticks):
+            if self.shared and tick_numbers[k] % self._period_ticks == 0:
+                self._reset_state(tick_numbers[k])
+            draw = draws[k] if self.shared else rng
+            self._noise = rho * self._noise + innovations[k]
+            starting = (self._episode_left == 0) & (onset_draw[k] < hazard)
+            n_start = int(starting.sum())
+            if n_start:
+                self._episode_left[starting] = draw.geometric(1.0 / max(1, self.mean_episode_ticks), n_start)
+                self._episode_shift[starting] = draw.normal(_ANOMALY_MEAN, _ANOMALY_STD, (n_start, 4))
+            active = self._episode_left > 0
+            noise[k] = self._noise
+            shift[k] = self._episode_shift * active[:, None]
+            anomaly[k] = active
+            self._episode_left -= active
+
+        values = signal + noise + shift
+        logit = _BASE_LOGIT + ((values - _BASE) * _RISK_WEIGHTS).sum(axis=2) + 2.5 * anomaly
+        if not self.shared:
+            failure_draw = rng.uniform(size=(n_ticks, n))
+        failure = (failure_draw < 1.0 / (1.0 + np.exp(-logit))).astype(np.int8)
+
+        chunk: Dict[str, np.ndarray] = {"timestamp": timestamps}
+        for j, name in enumerate(SENSOR_FIELDS):
+            chunk[name] = values[:, :, j]
+        chunk["anomaly"] = anomaly
+        chunk["failure"] = failure
+        if n_ticks:
+            self._last = {key: arr[-1:] for key, arr in chunk.items()}
+            if self.on_advance is not None:
+                self.on_advance(chunk)
+        return chunk
+
+    def sync(self, now: Any = None, max_ticks: int = 1000) -> int:
+        """
+        Advance to wall-clock ``now`` (default: current time) and return the
+        number of ticks taken. A gap longer than ``max_ticks`` ticks is
+        skipped rather than simulated; a shared simulator skips only to the
+        start of the target's period and replays the rest of it.
+        """
+        if now is None:
+            now = time.time() * 1000
+        target = np.datetime64(int(now), "ms") if isinstance(now, (int, float)) else np.datetime64(now, "ms")
+        with self._lock:
+            due = int((target - self.now) // self.tick)
+            if due <= 0:
+                return 0
+            if due > max_ticks and self.shared:
+                now_tick = int(self.now.astype(np.int64)) // self._tick_ms
+                skip = self._period_start(now_tick + due) - 1 - now_tick
+                if skip > 0:
+                    self.now += skip * self.tick
+                    due -= skip
+            elif due > max_ticks:
+                self.now += (due - max_ticks) * self.tick
+                due = max_ticks
+            self._advance(due)
+            return due
+
+    def latest(self) -> Dict[str, np.ndarray]:
+        """The most recent tick as {"timestamp": (1,), sensor: (1, units), ...}, ticking once if none yet."""
+        with self._lock:
+            if not len(self._last["timestamp"]):
+                self._advance(1)
+            return self._last
+
+    def index(self, equipment_id: str) -> int:
+        """Column of ``equipment_id`` in the (ticks, units) arrays; raises KeyError if unknown."""
+        return self._index[equipment_id]
+
+    def iter_history(self, ticks: int, chunk_ticks: int = 1024) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Advance ``ticks`` ticks, yielding the readings ``chunk_ticks`` ticks at a
+        time so a long history (e.g. a year for 10k units) streams in bounded
+        memory.
+        """
+        remaining = ticks
+        while remaining > 0:
+            step = min(chunk_ticks, remaining)
+            yield self.advance(step)
+            remaining -= step
+
+
+def chunk_frame(chunk: Dict[str, np.ndarray], equipment_ids: List[str]) -> pd.DataFrame:
+    """Flatten an ``advance`` chunk to one row per (tick, unit), in the generate_data column layout."""
+    n_ticks = len(chunk["timestamp"])
+    n_units = len(equipment_ids)
+    frame = {
+        "timestamp": np.repeat(chunk["timestamp"], n_units),
+        "equipment_id": np.tile(np.asarray(equipment_ids, dtype=object), n_ticks),
+    }
+    for name in SENSOR_FIELDS:
+        frame[name] = chunk[name].ravel()
+    frame["failure"] = chunk["failure"].ravel().astype(int)
+    return pd.DataFrame(frame)
+
+
+def reading_rows(chunk: Dict[str, np.ndarray], equipment_ids: List[str]) -> Iterator[tuple]:
+    """(epoch_ms, temperature, vibration, pressure, current, equipment_id) tuples for database.write_readings."""
+    ts = chunk["timestamp"].astype(np.int64).tolist()
+    columns = [chunk[name].tolist() for name in SENSOR_FIELDS]
+    for k, t in enumerate(ts):
+        for u, eid in enumerate(equipment_ids):
+            yield (t, columns[0][k][u], columns[1][k][u], columns[2][k][u], columns[3][k][u], eid)
+
+
+def create_simulator_from_env() -> FleetSimulator:
+    """
+    Build the app's simulator from SIM_UNITS, SIM_TICK_SECONDS and SIM_SEED.
+
+    Unset SIM_SEED means fresh entropy per process. With a seed the simulator
+    is shared: every worker given the same seed reports the same readings
+    for each tick.
+    """
+    seed = os.environ.get("SIM_SEED")
+    return FleetSimulator(
+        n_units=int(os.environ.get("SIM_UNITS", "15")),
+        tick_seconds=float(os.environ.get("SIM_TICK_SECONDS", "10")),
+        random_state=int(seed) if seed else None,
+        shared=bool(seed),
+    )
+
+
+if __name__ == "__main__":
+    # Load generator: python simulator.py [units] [days] [path/to/app.db]
+    import sys
+
+    import database
+
+    args = sys.argv[1:]
+    units = int(args[0]) if args else 1000
+    days = float(args[1]) if len(args) > 1 else 7.0
+    if len(args) > 2:
+        database.configure(args[2])
+    database.init_db()
+
+    tick_seconds = 600.0
+    ticks = int(days * 86400 / tick_seconds)
+    sim = FleetSimulator(n_units=units, tick_seconds=tick_seconds, start=time.time() * 1000 - days * _DAY_MS)
+    started = time.perf_counter()
+    written = 0
+    for chunk in sim.iter_history(ticks, chunk_ticks=max(1, 50_000 // units)):
+        with database.get_conn() as conn:
+            database.write_readings(conn, reading_rows(chunk, sim.equipment_ids))
+        written += len(chunk["timestamp"]) * units
+    elapsed = time.perf_counter() - started
+    print(f"{database.DB_PATH}: wrote {written:,} readings for {units:,} units in {elapsed:.1f} s")
@@ -0,0 +1,223 @@
+import os
+import sys
+import threading
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+import database
+
+
+STATUS_NAMES = ("unknown", "healthy", "at_risk", "critical")
+_STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+
+
+def _status_codes(health: np.ndarray) -> np.ndarray:
+    # Same bands as database.health_status, vectorized
+    codes = np.full(health.shape, _STATUS_CODES["at_risk"], dtype=np.int8)
+    codes[health > database.HEALTHY_ABOVE] = _STATUS_CODES["healthy"]
+    codes[health < database.CRITICAL_BELOW] = _STATUS_CODES["critical"]
+    codes[np.isnan(health)] = _STATUS_CODES["unknown"]
+    return codes
+
+
+def _iso(ts_ms: np.ndarray) -> List[Any]:
+    text = np.datetime_as_string(ts_ms.astype("datetime64[ms]"), unit="ms") + "Z"
+    return [t if ms else None for t, ms in zip(text.tolist(), ts_ms.tolist())]
+
+
+def _floats(values: np.ndarray) -> List[Any]:
+    return [None if v != v else v for v in values.tolist()]
+
+
+class FleetState:
+    """
+    Latest reading, prediction and status band per equipment unit.
+
+    Units map to a slot in a set of parallel NumPy arrays (one column per
+    field) instead of a dict per unit, so a 100k-unit fleet costs a few MB
+    and fleet-wide views are array slices. Updates only move a unit forward
+    in time; older rows are ignored.
+    """
+
+    __slots__ = (
+        "_lock", "_index", "_ids", "_size", "reading_ts", "readings",
+        "prediction_ts", "failure_probability", "health_score", "status",
+        "_refresh_thread", "_refresh_stop",
+    )
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self._lock = threading.RLock()
+        self._index: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._size = 0
+        self.reading_ts = np.zeros(capacity, dtype=np.int64)  # epoch ms, 0 = none yet
+        self.readings = np.full((capacity, len(database.SENSOR_COLUMNS)), np.nan)
+        self.prediction_ts = np.zeros(capacity, dtype=np.int64)
+        self.failure_probability = np.full(capacity, np.nan)
+        self.health_score = np.full(capacity, np.nan)
+        self.status = np.zeros(capacity, dtype=np.int8)
+        self._refresh_thread: threading.Thread | None = None
+        self._refresh_stop = threading.Event()
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def _grow(self) -> None:
+        capacity = max(1, len(self.reading_ts)) * 2
+        for name in ("reading_ts", "readings", "prediction_ts", "failure_probability", "health_score", "status"):
+            old = getattr(self, name)
+            fill = 0 if old.dtype.kind in "iu" else np.nan
+            new = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def _slot(self, equipment_id: str) -> int:
+        slot = self._index.get(equipment_id)
+        if slot is None:
+            if self._size == len(self.reading_ts):
+                self._grow()
+            slot = self._size
+            self._index[equipment_id] = slot
+            self._ids.append(equipment_id)
+            self._size += 1
+        return slot
+
+    def update_reading(
+        self,
+        equipment_id: str,
+        ts: Any,
+        temperature: float,
+        vibration: float,
+        pressure: float,
+        current: float,
+    ) -> None:
+        ts_ms = database.to_epoch_ms(ts)
+        with self._lock:
+            slot = self._slot(equipment_id)
+            if ts_ms >= self.reading_ts[slot]:
+                self.reading_ts[slot] = ts_ms
+                self.readings[slot] = (temperature, vibration, pressure, current)
+
+    def update_predictions(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Apply prediction records (as stored by insert_predictions), oldest first."""
+        records = list(records)
+        if not records:
+            return
+        # A batch usually shares one timestamp, so convert each distinct value once
+        seen: Dict[Any, int] = {}
+        ts = np.fromiter(
+            (seen[t] if t in seen else seen.setdefault(t, database.to_epoch_ms(t)) for t in (r["timestamp"] for r in records)),
+            dtype=np.int64,
+            count=len(records),
+        )
+        sensors = np.array([[r[c] for c in database.SENSOR_COLUMNS] for r in records], dtype=np.float64)
+        prob = np.fromiter((r["failure_probability"] for r in records), dtype=np.float64, count=len(records))
+        health = np.fromiter((r["health_score"] for r in records), dtype=np.float64, count=len(records))
+        with self._lock:
+            slots = np.fromiter((self._slot(r["equipment_id"]) for r in records), dtype=np.intp, count=len(records))
+            newer = ts >= self.prediction_ts[slots]
+            s = slots[newer]
+            self.prediction_ts[s] = ts[newer]
+            self.failure_probability[s] = prob[newer]
+            self.health_score[s] = health[newer]
+            self.status[s] = _status_codes(health[newer])
+            newer_reading = ts >= self.reading_ts[slots]
+            r = slots[newer_reading]
+            self.reading_ts[r] = ts[newer_reading]
+            self.readings[r] = sensors[newer_reading]
+
+    def load_from_db(self) -> int:
+        """Seed from each unit's newest prediction and reading; returns units known."""
+        latest_predictions = database.get_latest_per_equipment(1, "predictions")
+        self.update_predictions(
+            dict(rows[0], timestamp=rows[0]["ts"]) for rows in latest_predictions.values() if rows
+        )
+        for eq_id, rows in database.get_latest_per_equipment(1, "readings").items():
+            if eq_id and rows:
+                r = rows[0]
+                self.update_reading(eq_id, r["ts"], r["temperature"], r["vibration"], r["pressure"], r["current"])
+        return len(self)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def get(self, equipment_id: str) -> Dict[str, Any] | None:
+        with self._lock:
+            slot = self._index.get(equipment_id)
+            if slot is None:
+                return None
+            return self._rows(slice(slot, slot + 1))[0]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Every unit's current state, in first-seen order."""
+        with self._lock:
+            return self._rows(slice(0, self._size))
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            binned = np.bincount(self.status[: self._size], minlength=len(STATUS_NAMES))
+        out = {name: int(binned[code]) for code, name in enumerate(STATUS_NAMES)}
+        out["total"] = self._size
+        return out
+
+    def _rows(self, sl: slice) -> List[Dict[str, Any]]:
+        columns: Dict[str, List[Any]] = {
+            "equipment_id": self._ids[sl],
+            "status": [STATUS_NAMES[c] for c in self.status[sl].tolist()],
+            "health_score": _floats(self.health_score[sl]),
+            "failure_probability": _floats(self.failure_probability[sl]),
+            "prediction_ts": _iso(self.prediction_ts[sl]),
+            "reading_ts": _iso(self.reading_ts[sl]),
+        }
+        for k, name in enumerate(database.SENSOR_COLUMNS):
+            columns[name] = _floats(self.readings[sl, k])
+        names = list(columns)
+        return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the column arrays plus the id index."""
+        arrays = sum(
+            getattr(self, n).nbytes
+            for n in ("reading_ts", "readings", "prediction_ts", "failure_probability", "health_score", "status")
+        )
+        index = sys.getsizeof(self._index) + sys.getsizeof(self._ids) + sum(sys.getsizeof(i) for i in self._ids)
+        return arrays + index
+
+    # ------------------------------------------------------------------
+    # Cross-worker refresh
+    # ------------------------------------------------------------------
+    def start_refresh(self, interval: float) -> None:
+        """
+        Re-read the newest rows from SQLite every ``interval`` seconds so
+        units ingested by other gunicorn workers show up here too.
+        """
+        if interval <= 0 or (self._refresh_thread is not None and self._refresh_thread.is_alive()):
+            return
+        self._refresh_stop.clear()
+
+        def loop() -> None:
+            while not self._refresh_stop.wait(interval):
+                try:
+                    self.load_from_db()
+                except Exception:
+                    pass
+
+        self._refresh_thread = threading.Thread(target=loop, name="fleet-state-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def stop_refresh(self) -> None:
+        self._refresh_stop.set()
+
+
+def create_state_from_env() -> FleetState:
+    state = FleetState()
+    try:
+        state.load_from_db()
+    except Exception:
+        pass
+    state.start_refresh(float(os.environ.get("FLEET_STATE_REFRESH", "30")))
+    return state
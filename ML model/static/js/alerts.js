@@ -1,5 +1,5 @@
 // alerts.js
-// Polls /api/alerts and manages alerts UI (panel + toasts)
+// Shows alerts from the live stream (or polls /api/alerts) and manages alerts UI (panel + toasts)
 
 (function () {
   const POLL_MS = 3000;
@@ -24,8 +24,8 @@
   }
 
   function alertId(alert) {
-    // Use equipment_id + timestamp + severity to identify uniqueness
-    return `${alert.equipment_id || 'NA'}_${alert.timestamp || ''}_${alert.severity || ''}`;
+    // An alert stays the same while it is open: key on when it opened, not the latest reading
+    return `${alert.equipment_id || 'NA'}_${alert.since || alert.timestamp || ''}_${alert.severity || ''}`;
   }
 
   function ensureToastContainer() {
@@ -121,24 +121,28 @@
     }
   }
 
+  const shown = new Set();
+
+  function showAlerts(container, data) {
+    const alerts = Array.isArray(data?.alerts) ? data.alerts : [];
+    const dismissed = getDismissed();
+    renderPanel(container, alerts, dismissed);
+
+    // Toast only for new critical alerts
+    alerts.forEach(a => {
+      const id = alertId(a);
+      if (a.severity === 'critical' && !shown.has(id) && !dismissed.has(id)) {
+        shown.add(id);
+        showToast(a);
+        playBeep();
+      }
+    });
+  }
+
   function startLoop(container) {
-    const shown = new Set();
     const loop = async () => {
       try {
-        const data = await fetchAlerts();
-        const alerts = Array.isArray(data?.alerts) ? data.alerts : [];
-        const dismissed = getDismissed();
-        renderPanel(container, alerts, dismissed);
-
-        // Toast only for new critical alerts
-        alerts.forEach(a => {
-          const id = alertId(a);
-          if (a.severity === 'critical' && !shown.has(id) && !dismissed.has(id)) {
-            shown.add(id);
-            showToast(a);
-            playBeep();
-          }
-        });
+        showAlerts(container, await fetchAlerts());
       } catch (e) {
         // console.error(e);
       } finally {
@@ -148,10 +152,16 @@
     loop();
   }
 
+  function startLive(container) {
+    // Pushed once per tick over /api/stream; poll if the stream is unavailable
+    if (!window.LiveStream) { startLoop(container); return; }
+    window.LiveStream.subscribe('alerts', (data) => showAlerts(container, data), () => startLoop(container));
+  }
+
   document.addEventListener('DOMContentLoaded', () => {
     const panel = document.getElementById('alertsPanel');
     if (!panel) return;
-    startLoop(panel);
+    startLive(panel);
   });
 })();
 
@@ -90,20 +90,24 @@
     return res.json();
   }
 
+  function showReading(charts, data) {
+    const ts = data.timestamp ? new Date(data.timestamp) : new Date();
+
+    if (charts.temperature)
+      pushPoint(charts.temperature, ts, Number(data.temperature));
+    if (charts.vibration)
+      pushPoint(charts.vibration, ts, Number(data.vibration));
+    // remove loading state
+    document.getElementById('temperatureChartContainer')?.classList.remove('chart-loading');
+    document.getElementById('vibrationChartContainer')?.classList.remove('chart-loading');
+  }
+
   function startLoop(charts) {
     const poll = async () => {
       try {
         const data = await fetchSensor();
-        const ts = data.timestamp ? new Date(data.timestamp) : new Date();
-
-        if (charts.temperature)
-          pushPoint(charts.temperature, ts, Number(data.temperature));
-        if (charts.vibration)
-          pushPoint(charts.vibration, ts, Number(data.vibration));
+        showReading(charts, data);
         document.dispatchEvent(new CustomEvent('connection-status', { detail: { ok: true } }));
-        // remove loading state
-        document.getElementById('temperatureChartContainer')?.classList.remove('chart-loading');
-        document.getElementById('vibrationChartContainer')?.classList.remove('chart-loading');
       } catch (e) {
         document.dispatchEvent(new CustomEvent('connection-status', { detail: { ok: false } }));
         // Fallback: synthesize a point so the UI stays active on static hosting
@@ -117,21 +121,27 @@
     poll();
   }
 
+  function startLive(charts) {
+    // Pushed once per tick over /api/stream; poll if the stream is unavailable
+    if (!window.LiveStream) { startLoop(charts); return; }
+    window.LiveStream.subscribe('sensor-data', (data) => showReading(charts, data), () => startLoop(charts));
+  }
+
   async function loadHistorical(days, charts) {
     try {
-      const res = await fetch(`/api/historical/${days}`);
-      if (!res.ok) return;
-      const data = await res.json();
+      // Ask for about two points per horizontal pixel; the server downsamples
+      const width = charts.temperature?.width || 600;
+      // Columnar (ts as epoch ms), packed into typed arrays when available
+      const data = await window.Columns.fetch(`/api/historical/${days}?max_points=${Math.round(width * 2)}`);
+      const readings = data.readings || { ts: [], temperature: [], vibration: [] };
+      const labels = Array.from(readings.ts, ms => {
+        const ts = new Date(ms);
+        return ts.toLocaleDateString() + ' ' + ts.toLocaleTimeString();
+      });
       const temp = charts.temperature;
       const vib = charts.vibration;
-      if (temp) { temp.data.labels = []; temp.data.datasets[0].data = []; }
-      if (vib) { vib.data.labels = []; vib.data.datasets[0].data = []; }
-      (data.readings || []).forEach(r => {
-        const ts = r.ts ? new Date(r.ts) : new Date();
-        const label = ts.toLocaleDateString() + ' ' + ts.toLocaleTimeString();
-        if (temp) { temp.data.labels.push(label); temp.data.datasets[0].data.push(Number(r.temperature)); }
-        if (vib) { vib.data.labels.push(label); vib.data.datasets[0].data.push(Number(r.vibration)); }
-      });
+      if (temp) { temp.data.labels = labels.slice(); temp.data.datasets[0].data = Array.from(readings.temperature); }
+      if (vib) { vib.data.labels = labels.slice(); vib.data.datasets[0].data = Array.from(readings.vibration); }
       temp?.update('none');
       vib?.update('none');
     } catch {}
@@ -155,7 +165,7 @@
     );
 
     const charts = { temperature: temperatureChart, vibration: vibrationChart };
-    startLoop(charts);
+    startLive(charts);
     loadHistorical(rangeDays, charts);
 
     document.addEventListener('chart-range-change', (e) => {
@@ -0,0 +1,35 @@
+// columns.js
+// Fetches columnar API responses: packed typed arrays when the server
+// offers them (application/x-packed-columns), columnar JSON otherwise
+
+(function () {
+  const PACKED = 'application/x-packed-columns';
+  const VIEWS = { float32: Float32Array, float64: Float64Array, int16: Int16Array, int32: Int32Array };
+
+  function unpack(buffer) {
+    const length = new DataView(buffer).getUint32(0, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, length)));
+    const base = 4 + length;
+    const out = { ...header.meta };
+    Object.entries(header.tables).forEach(([name, table]) => {
+      const columns = {};
+      table.columns.forEach(c => {
+        const values = new VIEWS[c.dtype](buffer, base + c.offset, c.length);
+        // Strings arrive as codes into the column's dictionary
+        columns[c.name] = c.dictionary ? Array.from(values, k => (k < 0 ? null : c.dictionary[k])) : values;
+      });
+      out[name] = columns;
+    });
+    return out;
+  }
+
+  async function fetchColumns(url) {
+    const sep = url.includes('?') ? '&' : '?';
+    const res = await fetch(`${url}${sep}layout=columns`, { headers: { 'Accept': `${PACKED}, application/json;q=0.9` } });
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    if ((res.headers.get('Content-Type') || '').startsWith(PACKED)) return unpack(await res.arrayBuffer());
+    return res.json();
+  }
+
+  window.Columns = { fetch: fetchColumns, unpack };
+})();
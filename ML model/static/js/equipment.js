@@ -1,5 +1,5 @@
 // equipment.js
-// Builds a dynamic equipment status table from /api/predictions
+// Builds a dynamic equipment status table from the live stream (or /api/predictions)
 
 (function () {
   const TEN_SECONDS = 10000;
@@ -145,16 +145,19 @@
     });
   }
 
+  function toItems(data) {
+    return (data?.predictions || []).map(p => ({
+      equipment_id: p.equipment_id,
+      health_score: Number(p.health_score),
+      failure_probability: Number(p.failure_probability)
+    }));
+  }
+
   function startLoop(container) {
     const poll = async () => {
       try {
         const data = await fetchPredictions();
-        const items = (data?.predictions || []).map(p => ({
-          equipment_id: p.equipment_id,
-          health_score: Number(p.health_score),
-          failure_probability: Number(p.failure_probability)
-        }));
-        renderTable(container, items);
+        renderTable(container, toItems(data));
       } catch (e) {
         // console.error(e);
       } finally {
@@ -164,10 +167,16 @@
     poll();
   }
 
+  function startLive(container) {
+    // Pushed once per tick over /api/stream; poll if the stream is unavailable
+    if (!window.LiveStream) { startLoop(container); return; }
+    window.LiveStream.subscribe('predictions', (data) => renderTable(container, toItems(data)), () => startLoop(container));
+  }
+
   document.addEventListener('DOMContentLoaded', () => {
     const container = document.getElementById('equipmentTable');
     if (!container) return;
-    startLoop(container);
+    startLive(container);
   });
 })();
 
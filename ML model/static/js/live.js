@@ -0,0 +1,58 @@
+// live.js
+// One shared EventSource on /api/stream for all dashboard widgets
+
+(function () {
+  const STREAM_URL = '/api/stream';
+  // Give up on the stream after this many failed connects without any event
+  const MAX_FAILURES = 3;
+
+  const handlers = {};
+  let source = null;
+  let failures = 0;
+  let unavailable = false;
+
+  function fallback() {
+    if (unavailable) return;
+    unavailable = true;
+    if (source) source.close();
+    source = null;
+    Object.values(handlers).forEach(list => list.forEach(h => h.onUnavailable && h.onUnavailable()));
+  }
+
+  function listen(event) {
+    source.addEventListener(event, (e) => {
+      failures = 0;
+      let data;
+      try { data = JSON.parse(e.data); } catch { return; }
+      document.dispatchEvent(new CustomEvent('connection-status', { detail: { ok: true } }));
+      (handlers[event] || []).forEach(h => h.onData(data));
+    });
+  }
+
+  function connect() {
+    if (source || unavailable) return;
+    if (!window.EventSource) { fallback(); return; }
+    source = new EventSource(STREAM_URL);
+    Object.keys(handlers).forEach(listen);
+    source.onerror = () => {
+      // The browser reconnects by itself (after the server's retry: hint)
+      // unless the server refused the stream outright
+      failures += 1;
+      document.dispatchEvent(new CustomEvent('connection-status', { detail: { ok: false } }));
+      if (source.readyState === EventSource.CLOSED || failures >= MAX_FAILURES) fallback();
+    };
+  }
+
+  // subscribe('predictions', onData, onUnavailable): onUnavailable is called
+  // once if the stream cannot be used, so the caller can go back to polling
+  function subscribe(event, onData, onUnavailable) {
+    if (unavailable) { if (onUnavailable) onUnavailable(); return; }
+    const isNew = !handlers[event];
+    (handlers[event] = handlers[event] || []).push({ onData, onUnavailable });
+    if (source && isNew) listen(event);
+    // Connect once every widget has registered during DOMContentLoaded
+    setTimeout(connect, 0);
+  }
+
+  window.LiveStream = { subscribe };
+})();
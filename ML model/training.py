@@ -0,0 +1,320 @@
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+import database
+from features import RollingFeatures, extended_columns, rolling_spec
+from predictive_model import (
+    FEATURE_COLUMNS,
+    TrainedModel,
+    compile_forest,
+    load_trained_model,
+    new_model_version,
+    save_trained_model,
+)
+
+
+# A reading is labeled as a failure when its unit has a failure record
+# (a maintenance_records row) within this many hours after it
+DEFAULT_HORIZON_HOURS = 24.0
+
+# Unit code in the high bits, epoch ms (< 2**42, i.e. before 2109) in the low bits
+_TS_BITS = 42
+
+
+class FailureLabeler:
+    """
+    Labels streamed readings from failure times per equipment.
+
+    All failure times are packed into one sorted int64 array keyed by
+    (unit, ts), so labeling a chunk is one ``searchsorted`` for the next
+    failure of the same unit at or after each reading.
+    """
+
+    def __init__(self, failure_times: Dict[str, np.ndarray], horizon_ms: int) -> None:
+        self.horizon_ms = int(horizon_ms)
+        self._codes = {unit: k for k, unit in enumerate(sorted(failure_times))}
+        keys = [
+            (np.int64(self._codes[unit]) << _TS_BITS) | np.asarray(times, dtype=np.int64)
+            for unit, times in failure_times.items()
+        ]
+        self._keys = np.sort(np.concatenate(keys)) if keys else np.empty(0, dtype=np.int64)
+
+    def __call__(self, ts: np.ndarray, equipment_ids: np.ndarray) -> np.ndarray:
+        y = np.zeros(len(ts), dtype=np.int8)
+        if not len(self._keys) or not len(ts):
+            return y
+        row_codes, uniques = pd.factorize(equipment_ids)
+        unit_codes = np.array([self._codes.get(u, -1) for u in uniques], dtype=np.int64)[row_codes]
+        known = unit_codes >= 0
+        keys = (unit_codes[known] << _TS_BITS) | ts[known]
+        nxt = np.searchsorted(self._keys, keys, side="left")
+        found = nxt < len(self._keys)
+        next_keys = self._keys[np.minimum(nxt, len(self._keys) - 1)]
+        same_unit = (next_keys >> _TS_BITS) == (keys >> _TS_BITS)
+        y[known] = found & same_unit & (next_keys - keys <= self.horizon_ms)
+        return y
+
+
+class StratifiedReservoir:
+    """
+    Bounded sample of a stream of labeled chunks, at most ``capacity`` rows
+    per class.
+
+    Each row draws an exponential key divided by its weight and each class
+    keeps the rows with the smallest keys (a bottom-k sketch). With equal
+    weights that is a uniform sample without replacement; with
+    ``half_life_ms`` a row's weight doubles every half-life closer to
+    ``now_ms``, so recent history dominates without a hard cut-off. Memory is
+    bounded by the capacity, not by the stream.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        half_life_ms: float | None = None,
+        now_ms: int | None = None,
+        random_state: int | None = None,
+        width: int = len(FEATURE_COLUMNS),
+    ) -> None:
+        self.capacity = capacity
+        self.half_life_ms = half_life_ms
+        self.now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        self._rng = np.random.default_rng(random_state)
+        self._keys = {c: np.empty(0) for c in (0, 1)}
+        self._X = {c: np.empty((0, width), dtype=np.float32) for c in (0, 1)}
+        self._ts = {c: np.empty(0, dtype=np.int64) for c in (0, 1)}
+        self.seen = {0: 0, 1: 0}
+
+    def add(self, X: np.ndarray, y: np.ndarray, ts: np.ndarray) -> None:
+        keys = self._rng.exponential(size=len(y))
+        if self.half_life_ms:
+            keys /= np.exp2((ts - self.now_ms) / self.half_life_ms)
+        for c in (0, 1):
+            rows = np.flatnonzero(y == c)
+            self.seen[c] += len(rows)
+            if len(self._keys[c]) >= self.capacity:
+                # Full: only rows that beat the current worst key can enter
+                rows = rows[keys[rows] < self._keys[c].max()]
+            if not len(rows):
+                continue
+            k = np.concatenate([self._keys[c], keys[rows]])
+            X_c = np.concatenate([self._X[c], X[rows]])
+            ts_c = np.concatenate([self._ts[c], ts[rows]])
+            if len(k) > self.capacity:
+                keep = np.argpartition(k, self.capacity - 1)[: self.capacity]
+                k, X_c, ts_c = k[keep], X_c[keep], ts_c[keep]
+            self._keys[c], self._X[c], self._ts[c] = k, X_c, ts_c
+
+    def sample(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(X, y, ts) of the sampled rows, oldest first."""
+        X = np.concatenate([self._X[0], self._X[1]])
+        y = np.concatenate([np.zeros(len(self._X[0]), np.int8), np.ones(len(self._X[1]), np.int8)])
+        ts = np.concatenate([self._ts[0], self._ts[1]])
+        order = np.argsort(ts, kind="stable")
+        return X[order], y[order], ts[order]
+
+
+def sample_history(
+    kind: str = "readings",
+    since_ms: int | None = None,
+    until_ms: int | None = None,
+    horizon_hours: float = DEFAULT_HORIZON_HOURS,
+    failure_actions: Iterable[str] | None = None,
+    max_rows_per_class: int = 250_000,
+    half_life_days: float | None = None,
+    chunk_rows: int = 100_000,
+    random_state: int | None = 42,
+    rolling: Dict[str, Any] | None = None,
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+    """
+    Stream labeled history out of SQLite into a stratified sample.
+
+    ``until_ms`` defaults to ``now - horizon``: later readings cannot be
+    labeled yet because their horizon has not passed. With ``rolling`` (a
+    ``features.rolling_spec``) readings stream in time order and each
+    passes through ``RollingFeatures`` before sampling, so X has the extended columns as
+    serving computes them; windows warm up from ``since_ms``. Returns
+    (X, y, report).
+    """
+    horizon_ms = int(horizon_hours * 3_600_000)
+    if until_ms is None:
+        until_ms = int(time.time() * 1000) - horizon_ms
+    labeler = FailureLabeler(database.get_maintenance_times(failure_actions), horizon_ms)
+    engine = RollingFeatures(**rolling) if rolling else None
+    reservoir = StratifiedReservoir(
+        max_rows_per_class,
+        half_life_ms=half_life_days * 86_400_000 if half_life_days else None,
+        now_ms=until_ms,
+        random_state=random_state,
+        width=len(engine.feature_columns) if engine is not None else len(FEATURE_COLUMNS),
+    )
+    started = time.perf_counter()
+    # Concurrent writers commit out of time order; the rolling windows need each unit's rows in order
+    rows = database.iter_sensor_arrays(kind, since_ms, until_ms, chunk_rows, ordered=engine is not None)
+    for ts, equipment_ids, X in rows:
+        if engine is not None:
+            X = engine.update(equipment_ids, X, ts).astype(np.float32)
+        reservoir.add(X, labeler(ts, equipment_ids), ts)
+    X, y, ts = reservoir.sample()
+    report = {
+        "source": kind,
+        "since_ms": since_ms,
+        "until_ms": until_ms,
+        "horizon_hours": horizon_hours,
+        "half_life_days": half_life_days,
+        "rolling": rolling,
+        "rows_seen": reservoir.seen[0] + reservoir.seen[1],
+        "positives_seen": reservoir.seen[1],
+        "rows_sampled": int(len(y)),
+        "positives_sampled": int(y.sum()),
+        "stream_seconds": round(time.perf_counter() - started, 3),
+    }
+    return X, y, report
+
+
+def _check_classes(y: np.ndarray) -> None:
+    if len(np.unique(y)) < 2:
+        raise ValueError("Sampled history needs both failure and non-failure readings")
+
+
+def _columns(rolling: Dict[str, Any] | None) -> list:
+    return extended_columns() if rolling else FEATURE_COLUMNS
+
+
+def _finish(clf, training: Dict[str, Any], save_path: str, rolling: Dict[str, Any] | None) -> TrainedModel:
+    training["n_estimators"] = len(clf.estimators_)
+    training["trained_at"] = datetime.now(timezone.utc).isoformat()
+    trained = TrainedModel(
+        model=clf,
+        feature_columns=_columns(rolling),
+        compiled=compile_forest(clf),
+        version=new_model_version(),
+        training=training,
+        rolling=rolling,
+    )
+    save_trained_model(trained, save_path)
+    return trained
+
+
+def train_from_history(
+    save_path: str = os.path.join("data", "model.pkl"),
+    n_estimators: int = 200,
+    max_depth: int | None = None,
+    random_state: int = 42,
+    rolling_window: int | None = None,
+    **sample_args: Any,
+) -> TrainedModel:
+    """
+    Train a new forest on a bounded sample of the stored history and save it.
+
+    ``sample_args`` go to ``sample_history`` (source table, time window,
+    horizon, per-class capacity, recency half-life). With ``rolling_window``
+    the model is trained on rolling features over that many readings. The
+    sampling report is stored in the artifact as ``TrainedModel.training``.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    rolling = rolling_spec(rolling_window) if rolling_window else None
+    X, y, report = sample_history(random_state=random_state, rolling=rolling, **sample_args)
+    _check_classes(y)
+    started = time.perf_counter()
+    clf = RandomForestClassifier(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        random_state=random_state,
+        n_jobs=-1,
+        class_weight="balanced_subsample",
+    )
+    clf.fit(pd.DataFrame(X, columns=_columns(rolling)), y)
+    report["fit_seconds"] = round(time.perf_counter() - started, 3)
+    report["updates"] = 0
+    return _finish(clf, report, save_path, rolling)
+
+
+def update_from_history(
+    path: str = os.path.join("data", "model.pkl"),
+    add_estimators: int = 50,
+    max_estimators: int | None = None,
+    **sample_args: Any,
+) -> TrainedModel:
+    """
+    Grow an existing forest with ``add_estimators`` trees fitted on history
+    recorded since it was last trained, instead of retraining on everything.
+
+    New rows start at the artifact's ``training["until_ms"]`` (all history
+    for models not trained from the database). With ``max_estimators`` the
+    oldest trees are dropped beyond that count, so the forest tracks recent
+    behaviour at a fixed size. Rolling features use the model's own
+    settings. Returns the existing model unchanged when there is no new
+    labeled history.
+    """
+    base = load_trained_model(path)
+    previous = dict(base.training or {})
+    sample_args.setdefault("since_ms", previous.get("until_ms"))
+    X, y, report = sample_history(rolling=base.rolling, **sample_args)
+    if not len(y):
+        return base
+    _check_classes(y)
+
+    clf = base.model
+    class_weight = clf.class_weight
+    started = time.perf_counter()
+    # Balanced presets would be computed per fit; pin this sample's weights
+    counts = np.bincount(y, minlength=2)
+    clf.set_params(
+        warm_start=True,
+        n_estimators=len(clf.estimators_) + add_estimators,
+        class_weight={c: len(y) / (2.0 * counts[c]) for c in (0, 1)} if class_weight else None,
+    )
+    clf.fit(pd.DataFrame(X, columns=_columns(base.rolling)), y)
+    clf.set_params(warm_start=False, class_weight=class_weight)
+    if max_estimators is not None and len(clf.estimators_) > max_estimators:
+        clf.estimators_ = clf.estimators_[-max_estimators:]
+        clf.n_estimators = max_estimators
+    report["fit_seconds"] = round(time.perf_counter() - started, 3)
+    report["updates"] = previous.get("updates", 0) + 1
+    report["rows_seen_total"] = previous.get("rows_seen_total", previous.get("rows_seen", 0)) + report["rows_seen"]
+    return _finish(clf, report, path, base.rolling)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the failure model from the stored history.")
+    parser.add_argument("--db", help="SQLite database (default: data/app.db)")
+    parser.add_argument("--model", default=os.path.join("data", "model.pkl"))
+    parser.add_argument("--source", choices=("readings", "predictions"), default="readings")
+    parser.add_argument("--days", type=float, help="only the last N days of history")
+    parser.add_argument("--horizon-hours", type=float, default=DEFAULT_HORIZON_HOURS)
+    parser.add_argument("--max-rows-per-class", type=int, default=250_000)
+    parser.add_argument("--half-life-days", type=float, help="favour recent readings in the sample")
+    parser.add_argument("--update", action="store_true", help="add trees for history since the last training")
+    parser.add_argument("--trees", type=int, default=None, help="trees to train (or add with --update)")
+    parser.add_argument("--max-estimators", type=int, help="with --update: drop the oldest trees beyond this")
+    parser.add_argument("--rolling-window", type=int, help="add rolling features over this many readings per unit")
+    args = parser.parse_args()
+
+    if args.db:
+        database.configure(args.db)
+    sample_args: Dict[str, Any] = {
+        "kind": args.source,
+        "horizon_hours": args.horizon_hours,
+        "max_rows_per_class": args.max_rows_per_class,
+        "half_life_days": args.half_life_days,
+    }
+    if args.days is not None:
+        sample_args["since_ms"] = int(time.time() * 1000 - args.days * 86_400_000)
+    if args.update:
+        result = update_from_history(
+            args.model, add_estimators=args.trees or 50, max_estimators=args.max_estimators, **sample_args
+        )
+    else:
+        result = train_from_history(
+            args.model, n_estimators=args.trees or 200, rolling_window=args.rolling_window, **sample_args
+        )
+    print(f"{args.model}: version {result.version}", result.training)
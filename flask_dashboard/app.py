@@ -1,9 +1,12 @@
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request, stream_with_context
 from typing import Any, Dict
 import os
+import sys
 import json
+import threading
 from datetime import datetime
 import importlib.util
+from contextlib import nullcontext
 
 app = Flask(__name__)
 
@@ -20,17 +23,45 @@ def add_cors_headers(response):
 
 
 # ------------------------------------------------------------
-# Load predictive_model dynamically from ML model/predictive_model.py
+# Load predictive_model and database dynamically from ML model/
 # ------------------------------------------------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-PRED_MODEL_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "ML model", "predictive_model.py"))
+ML_MODEL_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "ML model"))
+PRED_MODEL_PATH = os.path.join(ML_MODEL_DIR, "predictive_model.py")
 
-predictive_model = None
-if os.path.exists(PRED_MODEL_PATH):
-    spec = importlib.util.spec_from_file_location("predictive_model", PRED_MODEL_PATH)
-    if spec and spec.loader:
-        predictive_model = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(predictive_model)  # type: ignore[attr-defined]
+
+def _load_ml_module(name: str):
+    path = os.path.join(ML_MODEL_DIR, f"{name}.py")
+    if not os.path.exists(path):
+        return None
+    # Reuse a module already imported by a sibling (e.g. metrics via predictive_model)
+    loaded = sys.modules.get(name)
+    if loaded is not None and os.path.abspath(getattr(loaded, "__file__", "") or "") == path:
+        return loaded
+    # Sibling imports inside ML model/ (e.g. database -> downsample)
+    if ML_MODEL_DIR not in sys.path:
+        sys.path.append(ML_MODEL_DIR)
+    spec = importlib.util.spec_from_file_location(name, path)
+    if not (spec and spec.loader):
+        return None
+    module = importlib.util.module_from_spec(spec)
+    # dataclasses resolve annotations through sys.modules during exec
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)  # type: ignore[attr-defined]
+    return module
+
+
+predictive_model = _load_ml_module("predictive_model")
+
+# Fleet database written by the ML model app; KPIs come from its rollups
+FLEET_DB_PATH = os.environ.get("FLEET_DB_PATH", os.path.join(ML_MODEL_DIR, "data", "app.db"))
+fleet_db = None
+try:
+    fleet_db = _load_ml_module("database")
+    if fleet_db:
+        fleet_db.configure(FLEET_DB_PATH)
+except Exception:
+    fleet_db = None
 
 
 # ------------------------------------------------------------
@@ -39,19 +70,99 @@ if os.path.exists(PRED_MODEL_PATH):
 MODEL_FILE = os.path.join(BASE_DIR, "data", "model.pkl")
 os.makedirs(os.path.dirname(MODEL_FILE), exist_ok=True)
 
-TRAINED_MODEL = None
+# Loads (or trains) in a background thread so importing the app stays fast;
+# predictions use the fallback heuristic until the model is ready.
+MODEL_LOADER = None
 if predictive_model:
     try:
-        if os.path.exists(MODEL_FILE):
-            TRAINED_MODEL = predictive_model.load_trained_model(MODEL_FILE)
-        else:
-            TRAINED_MODEL = predictive_model.train_model(save_path=MODEL_FILE)
+        model_loader = _load_ml_module("model_loader")
+        if model_loader:
+            MODEL_LOADER = model_loader.create_loader_from_env(MODEL_FILE)
+            MODEL_LOADER.start()
     except Exception:
-        # As a fallback, try training in-memory
-        try:
-            TRAINED_MODEL = predictive_model.train_model(save_path=MODEL_FILE)
-        except Exception:
-            TRAINED_MODEL = None
+        MODEL_LOADER = None
+MODEL_WAIT_SECONDS = float(os.environ.get("MODEL_WAIT_SECONDS", "0.5"))
+
+# Stateful synthetic fleet for /api/sensor-data (continues between requests)
+SIMULATOR = None
+try:
+    simulator = _load_ml_module("simulator")
+    if simulator:
+        SIMULATOR = simulator.create_simulator_from_env()
+except Exception:
+    SIMULATOR = None
+
+
+# Concurrent single-reading predictions are micro-batched into one predict
+INFERENCE_EXECUTOR = None
+try:
+    inference = _load_ml_module("inference")
+    if inference:
+        INFERENCE_EXECUTOR = inference.create_executor_from_env()
+except Exception:
+    INFERENCE_EXECUTOR = None
+
+# Repeated readings skip the model (enabled by PREDICTION_CACHE_SIZE)
+PREDICTION_CACHE = None
+try:
+    prediction_cache = _load_ml_module("prediction_cache")
+    if prediction_cache:
+        PREDICTION_CACHE = prediction_cache.create_cache_from_env()
+except Exception:
+    PREDICTION_CACHE = None
+
+# Bulk scoring for /api/predictions/batch
+batch_scoring = None
+try:
+    batch_scoring = _load_ml_module("batch_scoring")
+except Exception:
+    batch_scoring = None
+BATCH_CHUNK_ROWS = int(os.environ.get("BATCH_CHUNK_ROWS", "10000"))
+BATCH_TOTALS: Dict[str, float] = {"requests": 0, "rows": 0, "errors": 0, "seconds": 0.0}
+# Batch requests finish on several threads at once; "+=" on a dict entry is not atomic
+BATCH_TOTALS_LOCK = threading.Lock()
+
+
+def _batch_totals() -> Dict[str, float]:
+    with BATCH_TOTALS_LOCK:
+        return dict(BATCH_TOTALS)
+
+
+# Alert rules with hysteresis over the fleet DB's latest predictions (ALERT_RULES)
+ALERT_ENGINE = None
+try:
+    alerts_module = _load_ml_module("alerts")
+    if alerts_module:
+        ALERT_ENGINE = alerts_module.create_engine_from_env()
+except Exception:
+    ALERT_ENGINE = None
+
+
+# ------------------------------------------------------------
+# Metrics: per-stage histograms and component stats on /metrics
+# ------------------------------------------------------------
+ml_metrics = None
+try:
+    ml_metrics = _load_ml_module("metrics")
+    if ml_metrics:
+        ml_metrics.instrument_app(app, ml_metrics.REGISTRY, ml_metrics.create_profiler_from_env())
+        if MODEL_LOADER:
+            ml_metrics.REGISTRY.add_collector("app_model", MODEL_LOADER.stats)
+        if fleet_db:
+            ml_metrics.REGISTRY.add_collector("app_db_connections", lambda: fleet_db.get_manager().stats())
+        ml_metrics.REGISTRY.add_collector("app_batch", _batch_totals)
+        if INFERENCE_EXECUTOR:
+            ml_metrics.REGISTRY.add_collector("app_inference", INFERENCE_EXECUTOR.stats)
+        if PREDICTION_CACHE:
+            ml_metrics.REGISTRY.add_collector("app_prediction_cache", PREDICTION_CACHE.stats)
+        if ALERT_ENGINE is not None:
+            ml_metrics.REGISTRY.add_collector("app_alerts", ALERT_ENGINE.stats)
+except Exception:
+    ml_metrics = None
+
+
+def _stage(name: str):
+    return ml_metrics.stage(name) if ml_metrics else nullcontext()
 
 
 # ------------------------------------------------------------
@@ -70,13 +181,26 @@ def _error(message: str, status: int = 500):
 # ------------------------------------------------------------
 @app.route("/")
 def dashboard():
-    # Sample KPI data (could be computed from DB in a real app)
+    # Sample KPI data, replaced by rollup counts when the fleet DB has data
     kpis = {
         "total": 120,
         "healthy": 95,
         "risk": 18,
         "critical": 7,
     }
+    if fleet_db and os.path.exists(FLEET_DB_PATH):
+        try:
+            with _stage("db_read"):
+                fleet = fleet_db.get_fleet_kpis()
+            if fleet["total"]:
+                kpis = {
+                    "total": fleet["total"],
+                    "healthy": fleet["healthy"],
+                    "risk": fleet["at_risk"],
+                    "critical": fleet["critical"],
+                }
+        except Exception:
+            pass
     return render_template("dashboard.html", **kpis)
 
 
@@ -85,15 +209,16 @@ def api_sensor_data():
     if request.method == "OPTIONS":
         return _ok({"ok": True})
     try:
-        if predictive_model:
-            df = predictive_model.generate_data(num_points=1, days=1)
-            row = df.iloc[0]
+        if SIMULATOR is not None:
+            with _stage("simulate"):
+                SIMULATOR.sync()
+                latest = SIMULATOR.latest()
             data = {
-                "timestamp": row["timestamp"].isoformat() if hasattr(row["timestamp"], "isoformat") else str(row["timestamp"]),
-                "temperature": float(row["temperature"]),
-                "vibration": float(row["vibration"]),
-                "pressure": float(row["pressure"]),
-                "current": float(row["current"]),
+                "timestamp": str(latest["timestamp"][0]),
+                "temperature": float(latest["temperature"][0, 0]),
+                "vibration": float(latest["vibration"][0, 0]),
+                "pressure": float(latest["pressure"][0, 0]),
+                "current": float(latest["current"][0, 0]),
             }
         else:
             # Fallback synthetic values
@@ -122,12 +247,18 @@ def api_predictions():
             "current": float(payload.get("current", 108.0)),
         }
 
-        if predictive_model and TRAINED_MODEL is not None:
-            import pandas as pd  # local import to avoid hard dependency in absence of module
-            X = pd.DataFrame([metrics])
-            pred_df = predictive_model.predict_failure(TRAINED_MODEL, X)
-            failure_prob = float(pred_df["failure_probability"].iloc[0])
-            health_score = float(pred_df["health_score"].iloc[0])
+        trained = MODEL_LOADER.get(MODEL_WAIT_SECONDS) if MODEL_LOADER else None
+        if predictive_model and trained is not None:
+            row = [[metrics[c] for c in predictive_model.FEATURE_COLUMNS]]
+            score = predictive_model.predict_failure_arrays
+            if INFERENCE_EXECUTOR is not None:
+                score = INFERENCE_EXECUTOR.predict
+            if PREDICTION_CACHE is not None:
+                proba, health = PREDICTION_CACHE.predict(trained, row, score)
+            else:
+                proba, health = score(trained, row)
+            failure_prob = float(proba[0])
+            health_score = float(health[0])
         else:
             # Fallback heuristic
             failure_prob = 0.2
@@ -139,17 +270,86 @@ def api_predictions():
             "failure_probability": failure_prob,
             "health_score": health_score,
             "status": status,
+            "model_ready": trained is not None,
         })
     except Exception as exc:
         return _error(str(exc), 400)
 
 
+@app.route("/api/predictions/batch", methods=["POST", "OPTIONS"])
+def api_predictions_batch():
+    """
+    Score many readings in one request.
+
+    The body is a JSON array, NDJSON or CSV (chosen by Content-Type or
+    ?format=json|ndjson|csv) of readings with the four sensor fields and
+    optionally equipment_id and timestamp. Results stream back as NDJSON, one
+    line per input row in order, then a {"summary": ...} line with rows/sec.
+    """
+    if request.method == "OPTIONS":
+        return _ok({"ok": True})
+    if batch_scoring is None:
+        return _error("Batch scoring unavailable", 503)
+    try:
+        fmt = batch_scoring.detect_format(request.mimetype, request.args.get("format"))
+        chunk_rows = max(1, min(request.args.get("chunk_rows", BATCH_CHUNK_ROWS, type=int), 100_000))
+    except ValueError as exc:
+        return _error(str(exc), 400)
+    trained = MODEL_LOADER.get(MODEL_WAIT_SECONDS) if MODEL_LOADER else None
+    if trained is None:
+        return _error("model not ready", 503)
+
+    scorer = batch_scoring.BatchScorer(trained, chunk_rows=chunk_rows)
+
+    def generate():
+        # Reads the upload as it scores, so memory is bounded by chunk_rows
+        yield from scorer.lines(batch_scoring.iter_records(request.stream, fmt))
+        stats = scorer.stats()
+        with BATCH_TOTALS_LOCK:
+            BATCH_TOTALS["requests"] += 1
+            BATCH_TOTALS["rows"] += stats["rows"]
+            BATCH_TOTALS["errors"] += stats["errors"]
+            BATCH_TOTALS["seconds"] += stats["seconds"]
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@app.get("/api/health")
+def api_health():
+    model = MODEL_LOADER.stats() if MODEL_LOADER else {"state": "unavailable", "ready": False}
+    return _ok({"status": "ok", "time": datetime.utcnow().isoformat(), "model": model})
+
+
 @app.route("/api/alerts", methods=["GET", "OPTIONS"])
 def api_alerts():
     if request.method == "OPTIONS":
         return _ok({"ok": True})
     try:
-        # Example: construct alerts. In production, derive from DB/model outputs
+        # Rules evaluated over each unit's latest prediction in the fleet DB;
+        # sample alerts until the ML model app has written predictions
+        if ALERT_ENGINE is not None and fleet_db and os.path.exists(FLEET_DB_PATH):
+            with _stage("db_read"):
+                latest = [rows[0] for rows in fleet_db.get_latest_per_equipment(1).values() if rows]
+            if latest:
+                with _stage("alerts"):
+                    ALERT_ENGINE.evaluate(
+                        [r["equipment_id"] for r in latest],
+                        {f: [r[f] for r in latest] for f in ALERT_ENGINE.fields},
+                        [r["ts"].rstrip("Z") for r in latest],
+                    )
+                    alerts = [
+                        {
+                            "id": k,
+                            "equipment": a["equipment_id"],
+                            "severity": a["severity"],
+                            "message": a["message"],
+                            "time": a["timestamp"],
+                            "since": a["since"],
+                            "rules": a["rules"],
+                        }
+                        for k, a in enumerate(ALERT_ENGINE.open_alerts(), start=1)
+                    ]
+                return _ok({"alerts": alerts})
         alerts = [
             {"id": 1, "equipment": "Transformer T-42", "severity": "critical", "message": "Overheat and high vibration detected", "time": datetime.utcnow().isoformat()},
             {"id": 2, "equipment": "Turbine G-7", "severity": "warning", "message": "Pressure drop noted", "time": datetime.utcnow().isoformat()},